@@ -62,6 +62,7 @@ from . import story
 from . import verbdefs
 from . import combat
 
+from .vocabulary import Vocabulary
 from .errors import ActionRefused, ParseError, LocationIntegrityError, TaleError, UnknownVerbException, NonSoulVerb
 from tale.races import UnarmedAttack
 from tale.skills.weapon_type import WeaponSkills, WeaponType
@@ -178,6 +179,7 @@ class MudObjRegistry:
     all_locations = WeakValueDictionary()   # type: WeakValueDictionary[int, Location]
     all_exits = WeakValueDictionary()       # type: WeakValueDictionary[int, Exit]
     all_remains = WeakValueDictionary()
+    dirty_locations = set()     # type: Set[int]  # vnums of the locations that changed since the world was saved
 
     @staticmethod
     def track_vnum(instance: Any, fix_clones: bool=False):
@@ -249,6 +251,30 @@ class MudObjRegistry:
             return objclass(*vargs, **kwargs)
 
 
+class _Aliases(set):
+    """The aliases of a mud object. Changing them tells the object, so the parser vocabulary that holds it is updated."""
+    def __init__(self, aliases: Iterable[str] = (), owner: Optional['MudObject'] = None) -> None:
+        super().__init__(aliases)
+        self.owner = owner
+
+    def __repr__(self) -> str:
+        return repr(set(self))
+
+
+def _notify_owner(method: Callable) -> Callable:
+    def changed(self: _Aliases, *args: Any) -> Any:
+        result = method(self, *args)
+        if self.owner is not None:
+            self.owner.names_changed()
+        return result
+    return changed
+
+
+for _method in ("add", "discard", "remove", "pop", "clear", "update", "difference_update", "intersection_update",
+                "symmetric_difference_update", "__ior__", "__iand__", "__isub__", "__ixor__"):
+    setattr(_Aliases, _method, _notify_owner(getattr(set, _method)))
+
+
 class MudObject:
     """
     Root class of all objects in the mud world
@@ -289,8 +315,8 @@ class MudObject:
         self.verbs = {}  # type: Dict[str, str]
         # register all periodical tagged methods
         self.story_data = {}  # type: Dict[Any, Any]   # not used by Tale itself, story can put custom data here. Use builtin types only.
-        self.visible = True  # can this object be seen by others?
-        self.hidden = False
+        self._visible = True  # can this object be seen by others?
+        self._hidden = False
         self.avatar = resources_utils.check_file_exists_in_resources(self.name.strip().replace(" ", "_").lower())
         self.init()
         if util.get_periodicals(self):
@@ -307,6 +333,17 @@ class MudObject:
         """
         pass
 
+    @property
+    def aliases(self) -> Set[str]:
+        return self.__dict__["aliases"]
+
+    @aliases.setter
+    def aliases(self, value: Iterable[str]) -> None:
+        # kept in the instance dict under its own name, so it's serialized like the other attributes.
+        # Only a set is watched for changes, other values are kept as they are.
+        self.__dict__["aliases"] = _Aliases(value, self) if isinstance(value, (set, frozenset)) else value
+        self.names_changed()
+
     @property
     def title(self) -> str:
         return (self._title + '[hidden]') if self.hidden else self._title
@@ -314,6 +351,28 @@ class MudObject:
     @title.setter
     def title(self, value: str) -> None:
         self._title = value
+        self.mark_dirty()
+        self.invalidate_look()
+
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, value: bool) -> None:
+        self._visible = value
+        self.mark_dirty()
+        self.invalidate_look()
+
+    @property
+    def hidden(self) -> bool:
+        return self._hidden
+
+    @hidden.setter
+    def hidden(self, value: bool) -> None:
+        self._hidden = value
+        self.mark_dirty()
+        self.invalidate_look()
 
     @property
     def description(self) -> str:
@@ -322,6 +381,8 @@ class MudObject:
     @description.setter
     def description(self, value: str) -> None:
         self._description = value
+        self.mark_dirty()
+        self.invalidate_look()
 
     @property
     def short_description(self) -> str:
@@ -330,6 +391,8 @@ class MudObject:
     @short_description.setter
     def short_description(self, value: str) -> None:
         self._short_description = value
+        self.mark_dirty()
+        self.invalidate_look()
 
     @property
     def extra_desc(self) -> Dict[str, str]:
@@ -346,6 +409,8 @@ class MudObject:
     def set_roleplay_prompt(self, prompt: str, description: str = '', timeout: int = -1) -> None:
         self._extradesc["roleplay_prompt"] = prompt
         self._extradesc["roleplay_description"] = description
+        self.mark_dirty()
+        self.invalidate_look()
         if timeout > 0:
             mud_context.driver.defer(timeout, self.clear_roleplay_prompt, owner=self)
 
@@ -361,6 +426,8 @@ class MudObject:
             del self._extradesc["roleplay_prompt"]
         if "roleplay_description" in self._extradesc:
             del self._extradesc["roleplay_description"]
+        self.mark_dirty()
+        self.invalidate_look()
 
     @extra_desc.setter
     def extra_desc(self, value: Dict[str, str]) -> None:
@@ -376,6 +443,7 @@ class MudObject:
         self._description = dedent(descr).strip() if descr else ""
         self._short_description = short_descr.strip() if short_descr else ""
         self._extradesc = {}   # maps keyword to description
+        self.names_changed()
 
     def _check_title(self, title: str) -> None:
         w = title.partition(" ")[0].lower()
@@ -390,6 +458,18 @@ class MudObject:
     def __repr__(self):
         return "<%s '%s' #%d @ 0x%x>" % (self.__class__.__name__, self.name, self.vnum, id(self))
 
+    def mark_dirty(self) -> None:
+        """The object changed, and needs to be saved with the world. Objects are saved with the location they're in."""
+        pass
+
+    def invalidate_look(self) -> None:
+        """The object changed in a way that shows when looking around in the location it's in."""
+        pass
+
+    def names_changed(self) -> None:
+        """The name or the aliases changed, the parser vocabulary that holds the object has to know the new ones."""
+        pass
+
     def destroy(self, ctx: Optional[util.Context]) -> None:
         """Common cleanup code that needs to be called when the object is destroyed"""
         mud_context.driver.remove_deferreds(self)
@@ -494,6 +574,20 @@ class Item(MudObject):
     def __contains__(self, item: 'Item') -> bool:
         raise ActionRefused("You can't look inside of that.")
 
+    def mark_dirty(self) -> None:
+        if self.contained_in:
+            self.contained_in.mark_dirty()
+
+    def invalidate_look(self) -> None:
+        if isinstance(self.contained_in, Location):
+            self.contained_in.invalidate_look()
+
+    def names_changed(self) -> None:
+        if isinstance(self.contained_in, Location):
+            self.contained_in.items_vocabulary.refresh(self)
+        elif isinstance(self.contained_in, Living):
+            self.contained_in.inventory_vocabulary.refresh(self)
+
     @property
     def location(self) -> Optional['Location']:
         if not self.contained_in:
@@ -695,6 +789,10 @@ class Location(MudObject):
         self.livings = set()  # type: Set[Living] # set of livings in this location
         self.items = set()    # type: Set[Item] # set of all items in the room
         self.exits = {}       # type: Dict[str, Exit] # dictionary of all exits: exit_direction -> Exit object with target & descr
+        self._livings_vocabulary = Vocabulary(self.livings)
+        self._items_vocabulary = Vocabulary(self.items)
+        self._look_version = 0
+        self._look_cache = {}  # type: Dict[Tuple[bool, Optional[Living], bool], List[str]]  # (short, excluded living, show exits) -> paragraphs
         super().__init__(name, descr=descr)
         self.name = name      # make sure we preserve the case; base object overwrites it in lowercase
         self.built = True     # has this location been built yet? If not, LLM will describe it.
@@ -720,9 +818,25 @@ class Location(MudObject):
         self.livings.clear()
         self.items.clear()
         self.exits.clear()
+        self.livings_vocabulary.clear()
+        self.items_vocabulary.clear()
+
+    def mark_dirty(self) -> None:
+        MudObjRegistry.dirty_locations.add(self.vnum)
+
+    def invalidate_look(self) -> None:
+        self._look_version += 1
+        self._look_cache.clear()
+
+    @property
+    def look_version(self) -> int:
+        """Changes every time something changes that can be seen when looking around in this location (see invalidate_look)."""
+        return self._look_version
 
     def add_exits(self, exits: Iterable['Exit']) -> None:
         """Adds every exit from the sequence as an exit to this room."""
+        self.mark_dirty()
+        self.invalidate_look()
         for exit in exits:
             exit.bind(self)
             # note: we're not simply adding it to the .exits dict here, because
@@ -796,7 +910,17 @@ class Location(MudObject):
         return (e.target for e in self.exits.values())
 
     def look(self, exclude_living: 'Living'=None, short: bool=False) -> Sequence[str]:
-        """returns a list of paragraph strings describing the surroundings, possibly excluding one living from the description list"""
+        """
+        returns a list of paragraph strings describing the surroundings, possibly excluding one living from the description list
+        The paragraphs are cached until something in the location changes (see look_version).
+        """
+        key = (short, exclude_living, bool(self.exits) and mud_context.config.show_exits_in_look)
+        paragraphs = self._look_cache.get(key)
+        if paragraphs is None:
+            paragraphs = self._look_cache[key] = self._render_look(exclude_living, short)
+        return list(paragraphs)
+
+    def _render_look(self, exclude_living: Optional['Living'], short: bool) -> List[str]:
         paragraphs = ["<location>[" + self.title + "]</>"]
         if short:
             if self.exits and mud_context.config.show_exits_in_look:
@@ -866,29 +990,52 @@ class Location(MudObject):
             result = [living for living in self.livings if name in living.aliases or living.title.lower() == name]
         return result[0] if result else None
 
+    @property
+    def livings_vocabulary(self) -> Vocabulary:
+        """The names and aliases of the livings in this location, for the parser."""
+        if self._livings_vocabulary.source is not self.livings:
+            self._livings_vocabulary = Vocabulary(self.livings)
+        return self._livings_vocabulary
+
+    @property
+    def items_vocabulary(self) -> Vocabulary:
+        """The names and aliases of the items in this location, for the parser."""
+        if self._items_vocabulary.source is not self.items:
+            self._items_vocabulary = Vocabulary(self.items)
+        return self._items_vocabulary
+
     def insert(self, obj: Union['Living', Item], actor: Optional['Living'] = None) -> None:
         """Add item to the contents of the location (either a Living or an Item)"""
         assert obj is not None
         if isinstance(obj, Living):
             self.livings.add(obj)
+            self.livings_vocabulary.add(obj)
         elif isinstance(obj, Item):
             self.items.add(obj)
+            self.items_vocabulary.add(obj)
         elif isinstance(obj, Wearable):
             self.items.add(obj)
+            self.items_vocabulary.add(obj)
         else:
             raise TypeError("can only add Living or Item")
         obj.location = self
+        self.mark_dirty()
+        self.invalidate_look()
 
     def remove(self, obj: Union['Living', Item], actor: Optional['Living']) -> None:
         """Remove obj from this location (either a Living or an Item)"""
         assert obj is not None
         if obj in self.livings:
             self.livings.remove(obj)    # type: ignore
+            self.livings_vocabulary.remove(obj)
         elif obj in self.items:
             self.items.remove(obj)      # type: ignore
+            self.items_vocabulary.remove(obj)
         else:
             return   # just ignore an object that wasn't present in the first place
         obj.location = None
+        self.mark_dirty()
+        self.invalidate_look()
 
     def handle_verb(self, parsed: ParseResult, actor: 'Living') -> bool:
         """
@@ -1093,6 +1240,7 @@ class Living(MudObject):
         self.money = 0.0  # the currency is determined by util.MoneyFormatter set in the driver
         self.default_verb = "examine"
         self.__inventory = set()   # type: Set[Item]
+        self.__inventory_vocabulary = Vocabulary(self.__inventory)
         self.previous_commandline = ""
         self._previous_parse = ParseResult("")
         self.teleported_from = None   # type: Optional[Location]   # used by teleport/return commands
@@ -1105,6 +1253,18 @@ class Living(MudObject):
 
         super().__init__(name, title=title, descr=descr, short_descr=short_descr)
 
+    def mark_dirty(self) -> None:
+        if self.location:
+            self.location.mark_dirty()
+
+    def invalidate_look(self) -> None:
+        if self.location:
+            self.location.invalidate_look()
+
+    def names_changed(self) -> None:
+        if self.location:
+            self.location.livings_vocabulary.refresh(self)
+
     def init_gender(self, gender: str) -> None:
         """(re)set gender attributes"""
         self.gender = gender
@@ -1130,6 +1290,13 @@ class Living(MudObject):
     def inventory(self) -> FrozenSet[Item]:
         return frozenset(self.__inventory)
 
+    @property
+    def inventory_vocabulary(self) -> Vocabulary:
+        """The names and aliases of the items in the inventory, for the parser."""
+        if self.__inventory_vocabulary.source is not self.__inventory:
+            self.__inventory_vocabulary = Vocabulary(self.__inventory)
+        return self.__inventory_vocabulary
+
     def insert(self, item: Union['Living', Item], actor: Optional['Living']) -> None:
         """Add an item to the inventory."""
         assert item is not None
@@ -1145,7 +1312,9 @@ class Living(MudObject):
                     raise ActionRefused("It's probably not a good idea to give things to %s." % self.title)
                 raise
         self.__inventory.add(item)
+        self.inventory_vocabulary.add(item)
         item.contained_in = self
+        self.mark_dirty()
 
     def remove(self, item: Union['Living', Item], actor: Optional['Living']) -> None:
         """remove an item from the inventory"""
@@ -1154,7 +1323,9 @@ class Living(MudObject):
             raise ActionRefused("You can't do that.")
         if actor is self or actor is not None and "wizard" in actor.privileges:
             self.__inventory.remove(item)
+            self.inventory_vocabulary.remove(item)
             item.contained_in = None
+            self.mark_dirty()
         else:
             raise ActionRefused("You can't take %s from %s." % (item.title, self.title))
 
@@ -1162,10 +1333,14 @@ class Living(MudObject):
         super().destroy(ctx)
         if self.location and self in self.location.livings:
             self.location.livings.remove(self)
+            self.location.livings_vocabulary.remove(self)
+            self.location.mark_dirty()
+            self.location.invalidate_look()
         self.location = _limbo
         for item in self.__inventory:
             item.destroy(ctx)
         self.__inventory.clear()
+        self.inventory_vocabulary.clear()
         # @todo: remove attack status, etc.
         self.soul = None   # type: ignore  # truly die ;-)
 
@@ -1802,6 +1977,7 @@ class Container(Item):
             raise ActionRefused("You can't do that.")
         self.__inventory.add(item)
         item.contained_in = self
+        self.mark_dirty()
 
     def remove(self, item: Union[Living, Item], actor: Optional[Living]) -> None:
         assert item is not None
@@ -1809,6 +1985,7 @@ class Container(Item):
             raise ActionRefused("You can't do that.")
         self.__inventory.remove(item)
         item.contained_in = None
+        self.mark_dirty()
 
 
 class Exit(MudObject):
@@ -1883,6 +2060,8 @@ class Exit(MudObject):
             if direction in location.exits:
                 raise LocationIntegrityError("exit already exists: '%s' in %s" % (direction, location), direction, self, location)
             location.exits[direction] = self
+        location.mark_dirty()
+        location.invalidate_look()
 
     def _bind_target(self, game_zones_module: ModuleType) -> None:
         """
@@ -2420,20 +2599,9 @@ class Soul:
             unparsed = unparsed[len(verb):].lstrip()
         include_flag = True
         collect_message = False
-        all_livings = {}  # livings in the room (including player) by name + aliases
-        all_items = {}  # all items in the room or player's inventory, by name + aliases
-        for living in player.location.livings:
-            all_livings[living.name] = living
-            for alias in living.aliases:
-                all_livings[alias] = living
-        for item in player.location.items:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
-        for item in player.inventory:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
+        all_livings = player.location.livings_vocabulary  # livings in the room (including player) by name + aliases
+        # all items in the room or player's inventory, by name + aliases. The inventory goes first.
+        item_vocabularies = (player.inventory_vocabulary, player.location.items_vocabulary)
         previous_word = None
         words_enumerator = enumerate(words)
         for index, word in words_enumerator:
@@ -2477,13 +2645,13 @@ class Soul:
             if word in verbdefs.BODY_PARTS:
                 if bodypart:
                     raise ParseError("You can't do that both %s and %s." % (verbdefs.BODY_PARTS[bodypart], verbdefs.BODY_PARTS[word]))
-                if (word not in all_items and word not in all_livings) or previous_word == "my":
+                if (self._find_item(word, item_vocabularies) is None and word not in all_livings) or previous_word == "my":
                     bodypart = word
                     arg_words.append(word)
                     continue
             if word in ("everyone", "everybody", "all"):
                 if include_flag:
-                    if not all_livings:
+                    if not player.location.livings:
                         raise ParseError("There is nobody here.")
                     # include every *living* thing visible, don't include items, and skip the player itself
                     for living in player.location.livings:
@@ -2511,8 +2679,8 @@ class Soul:
                 adverb = word
                 arg_words.append(word)
                 continue
-            if word in all_livings:
-                living = all_livings[word]
+            living = all_livings.get(word)
+            if living is not None:
                 if include_flag:
                     who_info[living].sequence = who_sequence
                     who_info[living].previous_word = previous_word
@@ -2524,8 +2692,8 @@ class Soul:
                 arg_words.append(word)
                 previous_word = None
                 continue
-            if word in all_items:
-                item = all_items[word]
+            item = self._find_item(word, item_vocabularies)
+            if item is not None:
                 if include_flag:
                     who_info[item].sequence = who_sequence
                     who_info[item].previous_word = previous_word
@@ -2551,7 +2719,7 @@ class Soul:
                         next(words_enumerator)
                         wordcount -= 1
                     continue
-            item_or_living, full_name, wordcount = self.check_name_with_spaces(words, index, all_livings, all_items, {})
+            item_or_living, full_name, wordcount = self.match_name(words, index, (all_livings,) + item_vocabularies)
             if item_or_living:
                 while wordcount > 1:
                     next(words_enumerator)
@@ -2576,11 +2744,9 @@ class Soul:
             if word not in self._skip_words:
                 # unrecognized word, check if it could be a person's name or an item. (prefix)
                 if not who_list:
-                    for name in all_livings:
-                        if name.startswith(word):
-                            raise ParseError("Perhaps you meant %s?" % name)
-                    for name in all_items:
-                        if name.startswith(word):
+                    for vocabulary in (all_livings,) + item_vocabularies:
+                        name = vocabulary.startswith(word)
+                        if name:
                             raise ParseError("Perhaps you meant %s?" % name)
                 if not external_verb:
                     if not verb:
@@ -2702,6 +2868,28 @@ class Soul:
             return False
         return True
 
+    @staticmethod
+    def _find_item(name: str, vocabularies: Sequence[Vocabulary]) -> Optional[Item]:
+        for vocabulary in vocabularies:
+            item = vocabulary.get(name)
+            if item is not None:
+                return item
+        return None
+
+    def match_name(self, words: Sequence[str], startindex: int, vocabularies: Sequence[Vocabulary]) \
+            -> Tuple[Optional[ParsedWhoType], str, int]:
+        """
+        Like check_name_with_spaces, but searches in vocabularies: the shortest name wins,
+        and of names with the same number of words, the one in the first vocabulary.
+        Costs a few lookups per word, however many objects the vocabularies have.
+        """
+        found = None, "", 0     # type: Tuple[Optional[ParsedWhoType], str, int]
+        for vocabulary in vocabularies:
+            match = vocabulary.match(words, startindex)
+            if match[0] is not None and (found[0] is None or match[2] < found[2]):
+                found = match
+        return found
+
     def check_name_with_spaces(self, words: Sequence[str], startindex: int, all_livings: Dict[str, Living],
                                all_items: Dict[str, Item], all_exits: Dict[str, Exit]) \
             -> Tuple[Optional[ParsedWhoType], str, int]:
@@ -0,0 +1,233 @@
+"""
+End-to-end latency benchmark. Plays scripted sessions against stories, with the LLM
+stand-in server as backend, so the results can be reproduced offline.
+
+Reports the command latency (from entering a command until the game asks for the next one)
+and how much later than planned the server ticks ran (tick overrun), as p50/p95/p99.
+
+Run the suite with:
+    python -m tale.benchmark [--stories anything dungeon prancingllama] [--cassette session.jsonl]
+                             [--prompt-latency 0.2] [--token-latency 0.02] [--script commands.txt] [--output results.json]
+                             [--seed 0]
+Record a cassette from a real backend while playing the sessions with --record --upstream http://localhost:5001
+
+Each story is played in its own process, on a copy of the story directory, because a
+story can only be loaded once per process and playing it changes the files in its directory.
+Every process seeds the random generator with the same seed, so the prompts (which contain
+randomly picked examples) are the same when the cassette is recorded and when it is replayed.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from . import charbuilder
+from .driver_if import IFDriver
+from .player import PlayerConnection, Player
+
+DEFAULT_STORIES = ["anything", "dungeon", "prancingllama"]
+DEFAULT_SCRIPT = ["look", "inventory", "exits", "say hello", "north", "look", "south", "east", "look", "west",
+                  "examine floor", "stats", "say is anybody here?", "look"]
+RESULT_MARKER = "BENCHMARK-RESULT "
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """ p50, p95, p99 and max of the samples (nearest rank), in milliseconds."""
+    if not samples:
+        return dict(p50=0.0, p95=0.0, p99=0.0, max=0.0)
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))] * 1000.0
+
+    return dict(p50=rank(0.50), p95=rank(0.95), p99=rank(0.99), max=ordered[-1] * 1000.0)
+
+
+class BenchmarkDriver(IFDriver):
+    """
+    Single player driver that plays a scripted session instead of reading input from a screen.
+    The real game loop runs in its own thread, like it does for the other i/o types.
+    """
+    def __init__(self, commands: Sequence[str], llm_url: str = "", command_timeout: float = 60.0) -> None:
+        super().__init__(screen_delay=0)
+        self.io_type = "headless"
+        self.script = list(commands)
+        self.command_timeout = command_timeout
+        self.command_latencies = []     # type: List[float]
+        self.tick_overruns = []     # type: List[float]
+        self.timeouts = 0
+        self._previous_tick = 0.0
+        if llm_url:
+            self.llm_util.io_util.url = llm_url
+            if self.llm_util.io_util.io_adapter:
+                self.llm_util.io_util.io_adapter.url = llm_url
+
+    def connect_player(self, player_io_type: str, line_delay: int) -> PlayerConnection:
+        from .tio.headless_io import HeadlessIo
+        connection = PlayerConnection()
+        connection.player = Player("<connecting_%d>" % id(connection), "n", race="elemental")
+        connection.io = HeadlessIo(connection)
+        connection.player.output_line_delay = line_delay
+        self.all_players[connection.player.name] = connection
+        return connection
+
+    def start_main_loop(self) -> None:
+        conn = self.connect_player(self.io_type, 0)
+        self.llm_util.connection = conn
+        self._enter_game(conn)
+        driver_thread = threading.Thread(name="driver", target=self._main_loop_wrapper, args=(conn,), daemon=True)
+        driver_thread.start()
+        if not conn.io.prompted.wait(self.command_timeout):
+            self.timeouts += 1
+        for command in self.script:
+            conn.io.prompted.clear()
+            start = time.perf_counter()
+            conn.player.store_input_line(command)
+            if conn.io.prompted.wait(self.command_timeout):
+                self.command_latencies.append(time.perf_counter() - start)
+            else:
+                self.timeouts += 1
+        self._stop_mainloop = True
+        driver_thread.join(self.story.config.server_tick_time + self.command_timeout)
+
+    def _enter_game(self, conn: PlayerConnection) -> None:
+        # skip the login and story building dialogs, the session starts in the start location
+        name_info = charbuilder.PlayerNaming()
+        name_info.name = "benchmark"
+        name_info.gender = "f"
+        name_info.stats.race = "human"
+        self._rename_player(conn.player, name_info)
+        conn.player.move(self.lookup_location(self.story.config.startlocation_player))
+        self.story.welcome(conn.player)
+        self.story.init_player(conn.player)
+        conn.player.look(short=False)
+
+    def _server_tick(self) -> None:
+        now = time.perf_counter()
+        if self._previous_tick:
+            self.tick_overruns.append(max(0.0, now - self._previous_tick - self.story.config.server_tick_time))
+        self._previous_tick = now
+        super()._server_tick()
+
+    def results(self) -> dict:
+        tick_time = self.story.config.server_tick_time
+        return dict(story=self.story.config.name,
+                    commands=len(self.command_latencies),
+                    timeouts=self.timeouts,
+                    command_latency=percentiles(self.command_latencies),
+                    ticks=len(self.tick_overruns),
+                    overrun_ticks=sum(1 for overrun in self.tick_overruns if overrun > tick_time / 10),
+                    tick_overrun=percentiles(self.tick_overruns))
+
+
+def run_story(story_path: str, commands: Sequence[str], llm_url: str, command_timeout: float, seed: int = 0) -> dict:
+    """ Play the session against the story, in this process."""
+    random.seed(seed)
+    driver = BenchmarkDriver(commands, llm_url, command_timeout)
+    driver.start(story_path)
+    return driver.results()
+
+
+def run_suite(stories: Sequence[str], stories_dir: str, commands: Sequence[str], *, cassette: str = "",
+              prompt_latency: float = 0.0, token_latency: float = 0.0, record: bool = False, upstream: str = "",
+              command_timeout: float = 60.0, seed: int = 0) -> List[dict]:
+    """ Play the session against each story, in a separate process, with a shared LLM stand-in server."""
+    from .llm.stand_in_server import Cassette, StandInServer
+    server = StandInServer(Cassette(cassette), record=record, upstream=upstream,
+                           prompt_latency=prompt_latency, token_latency=token_latency)
+    llm_url = server.start()
+    results = []
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(pathlib.Path(__file__).parent.parent), env.get("PYTHONPATH")]))
+    try:
+        for story in stories:
+            requests_before = dict(server.stats)
+            with tempfile.TemporaryDirectory() as workdir:
+                story_copy = os.path.join(workdir, story)
+                shutil.copytree(os.path.join(stories_dir, story), story_copy)
+                process = subprocess.run([sys.executable, "-m", "tale.benchmark", "--run-story", story_copy,
+                                          "--llm-url", llm_url, "--timeout", str(command_timeout), "--seed", str(seed),
+                                          "--commands", json.dumps(list(commands))],
+                                         env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            result = _parse_result(process.stdout)
+            if result is None:
+                result = dict(story=story, error=process.stderr.strip().splitlines()[-1:] or ["no result"])
+            result["llm"] = {key: server.stats[key] - requests_before[key] for key in server.stats}
+            results.append(result)
+    finally:
+        server.stop()
+    return results
+
+
+def _parse_result(stdout: str) -> Optional[dict]:
+    for line in stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    return None
+
+
+def format_results(results: Sequence[dict]) -> str:
+    lines = ["%-28s %8s %28s %28s %14s" % ("story", "commands", "latency p50/p95/p99 (ms)", "overrun p50/p95/p99 (ms)", "llm replay/miss")]
+    for result in results:
+        if "error" in result:
+            lines.append("%-28s failed: %s" % (result["story"], " ".join(result["error"])))
+            continue
+        latency, overrun = result["command_latency"], result["tick_overrun"]
+        lines.append("%-28s %8s %28s %28s %14s" % (
+            result["story"][:28],
+            "%d%s" % (result["commands"], " (%d timed out)" % result["timeouts"] if result["timeouts"] else ""),
+            "%.1f / %.1f / %.1f" % (latency["p50"], latency["p95"], latency["p99"]),
+            "%.1f / %.1f / %.1f" % (overrun["p50"], overrun["p95"], overrun["p99"]),
+            "%d / %d" % (result["llm"]["replayed"], result["llm"]["missed"])))
+    return "\n".join(lines)
+
+
+def run_from_cmdline(cmdline: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(description="Play scripted sessions against stories and report command latency and tick overrun.")
+    parser.add_argument("--stories", nargs="+", default=DEFAULT_STORIES, help="story directories to play")
+    parser.add_argument("--stories-dir", default="stories", help="directory that contains the stories")
+    parser.add_argument("--script", help="file with the commands to play, one per line (default: a short exploration)")
+    parser.add_argument("--repeat", type=int, default=1, help="play the script this many times")
+    parser.add_argument("--cassette", default="", help="JSONL file with recorded LLM answers")
+    parser.add_argument("--record", action="store_true", help="record the LLM answers from the upstream backend into the cassette")
+    parser.add_argument("--upstream", default="", help="url of the real LLM backend, when recording")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="seconds before the stand-in sends the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per token the stand-in sends")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a command to finish")
+    parser.add_argument("--output", help="write the results as json to this file")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random generator, use the same one when recording and replaying")
+    parser.add_argument("--run-story", help=argparse.SUPPRESS)
+    parser.add_argument("--llm-url", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--commands", help=argparse.SUPPRESS)
+    args = parser.parse_args(cmdline)
+    if args.run_story:
+        result = run_story(args.run_story, json.loads(args.commands), args.llm_url, args.timeout, args.seed)
+        print(RESULT_MARKER + json.dumps(result), flush=True)
+        return
+    commands = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as file:
+            commands = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    results = run_suite(args.stories, args.stories_dir, commands * args.repeat, cassette=args.cassette,
+                        prompt_latency=args.prompt_latency, token_latency=args.token_latency,
+                        record=args.record, upstream=args.upstream, command_timeout=args.timeout, seed=args.seed)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    run_from_cmdline(sys.argv[1:])
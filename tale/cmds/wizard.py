@@ -18,6 +18,9 @@ from types import ModuleType
 from typing import Generator, Optional
 
 from tale import load_items, parse_utils
+import tale.llm.llm_cache as llm_cache
+from tale.connection_pool import get_pool
+from tale.profiling import profiler
 from tale.llm.LivingNpc import LivingNpc
 from tale.llm.responses.WorldCreaturesResponse import WorldCreaturesResponse
 from tale.llm.responses.WorldItemsResponse import WorldItemsResponse
@@ -484,6 +487,34 @@ def do_server(player: Player, parsed: base.ParseResult, ctx: util.Context) -> No
     txt.append("  items:     %d" % len(list(base.MudObjRegistry.all_items.keys())))
     txt.append("  exits:     %d" % len(list(base.MudObjRegistry.all_exits.keys())))
     txt.append("  python:    %d" % len(gc.get_objects()))
+    scheduler_stats = driver.llm_util.io_util.scheduler.stats()
+    txt.append("LLM requests:   %d queued, %d in flight, %d sent, %d merged, %d failed" %
+               (scheduler_stats["queued"], scheduler_stats["in_flight"], scheduler_stats["submitted"], scheduler_stats["coalesced"], scheduler_stats["failed"]))
+    idle_stats = driver.llm_util.idle_actions.stats()
+    txt.append("NPC idle plans: %d requests in %d batches (largest %d), %d waiting" %
+               (idle_stats["requests"], idle_stats["batches"], idle_stats["largest_batch"], idle_stats["waiting"]))
+    prebuild_stats = driver.llm_util.location_prebuilder.stats()
+    txt.append("Prebuilt rooms: %d requested, %d used, %d wasted, %d cancelled" %
+               (prebuild_stats["requested"], prebuild_stats["used"], prebuild_stats["wasted"], prebuild_stats["cancelled"]))
+    prompt_cache_stats = driver.llm_util.io_util.prompt_cache_stats
+    if prompt_cache_stats:
+        totals = prompt_cache_stats.totals()
+        txt.append("Prompt cache:   %d of %d prompt tokens reused in %d requests" %
+                   (totals["saved_tokens"], totals["prompt_tokens"], totals["requests"]))
+    pool_stats = get_pool().stats()
+    txt.append("HTTP pool:      %d requests, %d connections opened" %
+               (pool_stats["total_requests"], sum(pool_stats["connections_opened"].values())))
+    txt.append("LLM cache:")
+    for kind, cache_stats in llm_cache.stats().items():
+        txt.append("  %-9s  %d in memory, %d stored, %d hits, %d misses, %d evicted" %
+                   (kind + ":", cache_stats["entries"], cache_stats["stored"], cache_stats["hits"], cache_stats["misses"], cache_stats["evictions"]))
+    browsers = [(conn.player.name, conn.io.output_stats.rates()) for conn in driver.all_players.values()
+                if conn.player and getattr(conn.io, "output_stats", None)]
+    if browsers:
+        txt.append("Browser output (before compression):")
+        for name, rates in browsers:
+            txt.append("  %-12s %.1f frames/sec, %.0f bytes/sec, %.1f lines per frame" %
+                       (name + ":", rates["frames_per_second"], rates["bytes_per_second"], rates["entries_per_frame"]))
     player.tell("\n".join(txt), format=False)
 
 
@@ -521,6 +552,42 @@ def do_pubsub(player: Player, parsed: base.ParseResult, ctx: util.Context) -> No
     player.tell("\n".join(txt), format=False)
 
 
+@wizcmd("profile")
+def do_profile(player: Player, parsed: base.ParseResult, ctx: util.Context) -> None:
+    """
+    Show where the server spends its time.
+    Usage: profile [tick|deferred|command|llm], profile reset, or profile export <file>.
+    The export is written to the file in the user data directory, in json format if the
+    file name ends in .json, otherwise in the Prometheus text format.
+    """
+    if parsed.args and parsed.args[0] == "reset":
+        profiler.reset()
+        player.tell("Profiling data cleared.")
+        return
+    if parsed.args and parsed.args[0] == "export":
+        words = parsed.unparsed.split(None, 1)
+        if len(words) < 2:
+            raise ActionRefused("Export to what file?")
+        filename = words[1]
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            raise ActionRefused("Give a file name without a directory.")
+        with ctx.driver.user_resources.open_write(filename, mimetype="text/plain") as out:
+            profiler.write(out, filename.endswith(".json"))
+        player.tell("Profiling data written to %s." % filename)
+        return
+    categories = parsed.args or profiler.categories()
+    player.tell("<bright>Profile</> (since %s)" % datetime.datetime.fromtimestamp(profiler.started).strftime("%Y-%m-%d %H:%M:%S"), end=True)
+    txt = ["<ul> name                           <dim>|</><ul>   count<dim>|</><ul> total s<dim>|</><ul>  avg ms<dim>|</><ul>  p95 ms<dim>|</><ul>  max ms</>"]
+    for category in categories:
+        txt.append("<bright>%s</>" % category)
+        for name, histogram in profiler.top(category, 15):
+            txt.append(" %-30.30s <dim>|</> %7d <dim>|</> %7.2f <dim>|</> %7.2f <dim>|</> %7.2f <dim>|</> %7.2f" %
+                       (name, histogram.count, histogram.total, histogram.average * 1000,
+                        histogram.quantile(0.95) * 1000, histogram.max * 1000))
+    txt.append("")
+    player.tell("\n".join(txt), format=False)
+
+
 @wizcmd("force")
 def do_force(player: Player, parsed: base.ParseResult, ctx: util.Context) -> None:
     """Force another living being into performing a given command."""
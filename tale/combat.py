@@ -101,6 +101,7 @@ class Combat():
             text_result, damage_to_defender = self._round(attacker, random_defender)   
             texts.append(text_result)
             random_defender.stats.hp -= damage_to_defender
+            random_defender.mark_dirty()
             if random_defender.stats.hp < 1:
                 texts.append(f'{random_defender.title} dies from their injuries.')
 
@@ -112,6 +113,7 @@ class Combat():
             texts.append(text_result)
 
             random_attacker.stats.hp -= damage_to_attacker
+            random_attacker.mark_dirty()
             if random_attacker.stats.hp < 1:
                 texts.append(f'{random_attacker.title} dies from their injuries.')
             
@@ -0,0 +1,112 @@
+"""
+Shared, long lived HTTP connections for the LLM and image generation backends.
+Keeps connections alive between requests, instead of paying for a new
+TCP connection on every request (or every poll of a streaming response).
+"""
+
+import asyncio
+import atexit
+import threading
+from collections import Counter
+from typing import Dict
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from tale.llm import llm_config
+
+
+class ConnectionPool():
+
+    def __init__(self, max_connections_per_host: int = 4, keep_alive: float = 60, connect_timeout: float = 10, read_timeout: float = 600) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = None  # type: requests.Session
+        self._async_sessions = {}  # type: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession]
+        self._lock = threading.Lock()
+        self.requests_per_host = Counter()  # type: Counter[str]
+
+    @property
+    def session(self) -> requests.Session:
+        """ The requests session, for synchronous requests. """
+        with self._lock:
+            if not self._session:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.max_connections_per_host)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        self.requests_per_host[urlsplit(url).netloc] += 1
+        return self.session.request(method, url, **kwargs)
+
+    def async_session(self) -> aiohttp.ClientSession:
+        """ The aiohttp session for the running event loop. Must be called from a coroutine. """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._async_sessions.get(loop)
+            if not session or session.closed:
+                connector = aiohttp.TCPConnector(limit_per_host=self.max_connections_per_host, keepalive_timeout=self.keep_alive)
+                timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+                session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+                self._async_sessions[loop] = session
+            return session
+
+    def count_async_request(self, url: str) -> None:
+        self.requests_per_host[urlsplit(url).netloc] += 1
+
+    def stats(self) -> dict:
+        """ Requests made per host, and the synchronous connections opened for them. """
+        opened = Counter()  # type: Counter[str]
+        if self._session:
+            for adapter in set(self._session.adapters.values()):
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[key]
+                    opened["%s:%s" % (pool.host, pool.port)] += pool.num_connections
+        return dict(requests=dict(self.requests_per_host),
+                    total_requests=sum(self.requests_per_host.values()),
+                    connections_opened=dict(opened),
+                    max_connections_per_host=self.max_connections_per_host)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session:
+                self._session.close()
+                self._session = None
+            sessions, self._async_sessions = self._async_sessions, {}
+        for loop, session in sessions.items():
+            if not loop.is_closed() and loop.is_running():
+                try:
+                    asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=1)
+                except Exception:
+                    pass
+
+
+_pool = None  # type: ConnectionPool
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """ The shared connection pool, configured by HTTP_POOL in llm_config.yaml """
+    global _pool
+    with _pool_lock:
+        if not _pool:
+            config = llm_config.params.get('HTTP_POOL', None) or {}
+            _pool = ConnectionPool(max_connections_per_host=config.get('MAX_CONNECTIONS_PER_HOST', 4),
+                                   keep_alive=config.get('KEEP_ALIVE', 60),
+                                   connect_timeout=config.get('CONNECT_TIMEOUT', 10),
+                                   read_timeout=config.get('READ_TIMEOUT', 600))
+            atexit.register(_pool.close)
+        return _pool
@@ -1,3 +1,12 @@
+from typing import Iterator, Tuple
+
+# the offsets of the neighboring cells, the same as parse_utils.coordinates_from_direction
+DIRECTION_OFFSETS = (('north', (0, 1, 0)),
+                     ('east', (1, 0, 0)),
+                     ('south', (0, -1, 0)),
+                     ('west', (-1, 0, 0)),
+                     ('up', (0, 0, 1)),
+                     ('down', (0, 0, -1)))  # type: Tuple[Tuple[str, Tuple[int, int, int]], ...]
 
 
 class Coord():
@@ -6,6 +15,7 @@ class Coord():
     y is north and south,
     z is up and down.
     """
+    __slots__ = ('x', 'y', 'z')
 
     def __init__(self, x:int = 0, y:int = 0, z:int = 0):
         self.x = x
@@ -44,6 +54,25 @@ class Coord():
 
     def __eq__(self, other):
         return self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self) -> int:
+        return hash((self.x, self.y, self.z))
+
+    def __iter__(self) -> Iterator[int]:
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __repr__(self) -> str:
+        return 'Coord(%r, %r, %r)' % (self.x, self.y, self.z)
+
+    def __getstate__(self) -> dict:
+        return {'x': self.x, 'y': self.y, 'z': self.z}
+
+    def __setstate__(self, state: dict) -> None:
+        self.x = state['x']
+        self.y = state['y']
+        self.z = state['z']
     
     def valid(self) -> bool:
         return self.z != 255
@@ -10,6 +10,7 @@ import datetime
 import heapq
 import importlib
 import inspect
+import itertools
 import os
 import pathlib
 import pkgutil
@@ -20,7 +21,7 @@ import time
 import typing
 from functools import total_ordering
 from types import ModuleType
-from typing import Sequence, Union, Tuple, Any, Dict, Callable, Iterable, Generator, Set, List, MutableSequence, Optional
+from typing import Sequence, Union, Tuple, Any, Dict, Callable, Iterable, Iterator, Generator, Set, List, MutableSequence, Optional
 
 import appdirs
 from tale.dungeon import DungeonEntrance
@@ -33,6 +34,7 @@ from tale.zone import Zone
 
 from . import __version__ as tale_version_str, _check_required_libraries
 from . import mud_context, errors, util, cmds, player, pubsub, charbuilder, lang, verbdefs, vfs, base
+from .profiling import profiler
 from .story import TickMethod, GameMode, MoneyType, StoryBase
 from .tio import DEFAULT_SCREEN_WIDTH
 from .races import playable_races
@@ -82,6 +84,12 @@ class Commands:
                 result.update(self.commands_per_priv[priv])
         return result
 
+    def has(self, verb: str, privileges: Iterable[str]) -> bool:
+        """Is the verb a command for these privileges? Like 'verb in get(privileges)' without merging the commands."""
+        if verb in self.commands_per_priv[""]:
+            return True
+        return any(verb in self.commands_per_priv.get(priv, ()) for priv in privileges)
+
     def adjust_available_commands(self, server_mode: GameMode) -> None:
         # disable commands flagged with the given game_mode
         # disable soul verbs flagged with override
@@ -150,6 +158,17 @@ class Deferred:
             return self.due_gametime < other.due_gametime   # deferreds must be sortable
         return NotImplemented
 
+    @property
+    def profile_name(self) -> str:
+        """owner type and action name, so the deferreds of all objects of a kind are profiled together"""
+        if isinstance(self.owner, str):
+            owner = self.owner
+        elif isinstance(self.owner, ModuleType):
+            owner = "module:" + self.owner.__name__
+        else:
+            owner = self.owner.__class__.__name__
+        return owner + "." + self.action
+
     def when_due(self, game_clock: util.GameDateTime, realtime: bool=False) -> datetime.timedelta:
         """
         In what time is this deferred due to occur? (timedelta)
@@ -197,6 +216,93 @@ class Deferred:
             del self.vargs
 
 
+class DeferredQueue:
+    """
+    The pending deferreds, ordered by due time (a heap).
+    Removed deferreds are only marked as removed (a tombstone) and skipped when they come up,
+    so removing them doesn't require rebuilding the heap. An index by owner makes removing
+    all deferreds of an owner proportional to the number of deferreds it has.
+    The heap is compacted when more than half of it consists of tombstones.
+    Not thread safe; the driver guards it with its deferreds_lock.
+    """
+    def __init__(self) -> None:
+        self._heap = []         # type: List[List[Any]]   # entries [due_gametime, sequence number, deferred or None]
+        self._entries = {}      # type: Dict[int, List[Any]]   # id(deferred) -> heap entry
+        self._by_owner = {}     # type: Dict[int, Dict[int, Deferred]]   # id(owner) -> {id(deferred): deferred}
+        self._counter = itertools.count()
+        self._tombstones = 0
+
+    def push(self, deferred: Deferred) -> None:
+        if id(deferred) in self._entries:
+            self.remove(deferred)
+        entry = [deferred.due_gametime, next(self._counter), deferred]
+        heapq.heappush(self._heap, entry)
+        self._entries[id(deferred)] = entry
+        self._by_owner.setdefault(id(deferred.owner), {})[id(deferred)] = deferred
+
+    def pop_due(self, now: datetime.datetime) -> List[Deferred]:
+        """Remove and return the deferreds that are due at the given game time, earliest first."""
+        due = []
+        while self._heap and (self._heap[0][2] is None or self._heap[0][0] <= now):
+            deferred = heapq.heappop(self._heap)[2]
+            if deferred is None:
+                self._tombstones -= 1
+            else:
+                self._unindex(deferred)
+                due.append(deferred)
+        return due
+
+    def remove(self, deferred: Deferred) -> bool:
+        entry = self._entries.get(id(deferred))
+        if entry is None:
+            return False
+        self._unindex(deferred)
+        self._bury(entry)
+        return True
+
+    def remove_owner(self, owner: Any) -> int:
+        """Remove all deferreds of the owner, returns how many were removed."""
+        owned = self._by_owner.pop(id(owner), {})
+        for deferred_id in owned:
+            self._bury(self._entries.pop(deferred_id))
+        return len(owned)
+
+    def clear(self) -> None:
+        self._heap = []
+        self._entries = {}
+        self._by_owner = {}
+        self._tombstones = 0
+
+    def _unindex(self, deferred: Deferred) -> None:
+        del self._entries[id(deferred)]
+        owned = self._by_owner[id(deferred.owner)]
+        del owned[id(deferred)]
+        if not owned:
+            del self._by_owner[id(deferred.owner)]
+
+    def _bury(self, entry: List[Any]) -> None:
+        entry[2] = None
+        self._tombstones += 1
+        if self._tombstones > len(self._heap) // 2:
+            self._heap = [live for live in self._heap if live[2] is not None]
+            heapq.heapify(self._heap)
+            self._tombstones = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __iter__(self) -> Iterator[Deferred]:
+        """The deferreds in no particular order."""
+        return iter([entry[2] for entry in self._entries.values()])
+
+    def __getitem__(self, index: int) -> Deferred:
+        """The deferreds ordered by due time. Sorts the queue, so not meant for frequent use."""
+        return [entry[2] for entry in sorted(self._entries.values())][index]
+
+
 class Driver(pubsub.Listener):
     """
     The Mud 'driver'.
@@ -205,7 +311,7 @@ class Driver(pubsub.Listener):
     """
     def __init__(self) -> None:
         self.unbound_exits = []    # type: List[base.Exit]
-        self.deferreds = []   # type: List[Deferred]  # heapq
+        self.deferreds = DeferredQueue()
         self.deferreds_lock = threading.Lock()
         self.server_started = datetime.datetime.now().replace(microsecond=0)
         self.server_loop_durations = collections.deque(maxlen=10)    # type: MutableSequence[float]
@@ -500,18 +606,19 @@ class Driver(pubsub.Listener):
         4) write buffered output
         5) verify validity and idle state of connected players
         6) remove idle wiretaps
+        The time spent in each of these is recorded by the profiler.
         """
+        tick_start = time.perf_counter()
         self.game_clock.add_realtime(datetime.timedelta(seconds=self.story.config.server_tick_time))
         ctx = util.Context(self, self.game_clock, self.story.config, None)
+        phase_start = time.perf_counter()
+        profiler.observe("tick", "clock", phase_start - tick_start)
 
-        due_deferreds = []
         with self.deferreds_lock:
-            while self.deferreds:
-                deferred = self.deferreds[0]
-                if deferred.due_gametime > self.game_clock.clock:
-                    break
-                due_deferreds.append(heapq.heappop(self.deferreds))
+            due_deferreds = self.deferreds.pop_due(self.game_clock.clock)
         for deferred in due_deferreds:
+            deferred_start = time.perf_counter()
+            profile_name = deferred.profile_name    # a deferred that has run for the last time forgets its owner
             try:
                 deferred(ctx=ctx)  # call the deferred and provide a context object
             except StoryCompleted:
@@ -520,9 +627,13 @@ class Driver(pubsub.Listener):
                 print("\n* Exception while executing deferred action {0}:".format(deferred), file=sys.stderr)
                 print("".join(util.format_traceback()), file=sys.stderr)
                 print("(Please report this problem)", file=sys.stderr)
+            finally:
+                profiler.observe("deferred", profile_name, time.perf_counter() - deferred_start)
         del due_deferreds
+        phase_start = self._profile_tick_phase("deferreds", phase_start)
 
         pubsub.sync()
+        phase_start = self._profile_tick_phase("pubsub", phase_start)
         for name, conn in list(self.all_players.items()):
             if conn.player and conn.io and conn.player.location:
                 self.disconnect_idling(conn)
@@ -530,6 +641,7 @@ class Driver(pubsub.Listener):
             else:
                 # disconnect corrupt player connection
                 self.disconnect_player(conn)
+        phase_start = self._profile_tick_phase("output", phase_start)
         # clean up idle wiretap topics
         topicinfo = pubsub.pending()
         for topicname in topicinfo:
@@ -537,6 +649,13 @@ class Driver(pubsub.Listener):
                 events, idle_time, subbers = topicinfo[topicname]
                 if events == 0 and not subbers and idle_time > 30:
                     pubsub.topic(topicname).destroy()
+        self._profile_tick_phase("wiretaps", phase_start)
+        profiler.observe("tick", "total", time.perf_counter() - tick_start)
+
+    def _profile_tick_phase(self, phase: str, phase_start: float) -> float:
+        now = time.perf_counter()
+        profiler.observe("tick", phase, now - phase_start)
+        return now
 
     def disconnect_idling(self, conn: player.PlayerConnection) -> None:
         raise NotImplementedError
@@ -547,6 +666,25 @@ class Driver(pubsub.Listener):
     def _process_player_command(self, cmd: str, conn: player.PlayerConnection) -> None:
         if not cmd:
             return
+        start = time.perf_counter()
+        try:
+            self._execute_player_command(cmd, conn)
+        finally:
+            profiler.observe("command", self._command_profile_name(cmd, conn.player), time.perf_counter() - start)
+
+    def _command_profile_name(self, cmd: str, player: player.Player) -> str:
+        # only known verbs get their own histogram, to keep the number of histograms in check
+        verb = cmd.partition(" ")[0]
+        if cmd[0] in cmds.abbreviations and not cmd[0].isalpha():
+            verb = cmd[0]
+        verb = cmds.abbreviations.get(verb, verb)
+        if self.commands.has(verb, player.privileges) or verb in verbdefs.VERBS:
+            return verb
+        if player.location and verb in player.location.exits:
+            return "(exit)"
+        return "(other)"
+
+    def _execute_player_command(self, cmd: str, conn: player.PlayerConnection) -> None:
         if cmd and cmd[0] in cmds.abbreviations and not cmd[0].isalpha():
             # insert a space to separate the first char such as ' or ?
             cmd = cmd[0] + " " + cmd[1:]
@@ -672,6 +810,9 @@ class Driver(pubsub.Listener):
             player.tell("\n")
         player.move(target_location, direction_names=[xt.name] + list(xt.aliases))
         player.look(evoke=evoke)
+        if isinstance(self.story, DynamicStory):
+            # get the next locations ready while the player looks around
+            self.llm_util.prebuild_locations(target_location)
 
     def lookup_location(self, location_name: str) -> base.Location:
         location = self.zones
@@ -818,7 +959,7 @@ class Driver(pubsub.Listener):
         if "ctx" in deferred.kwargs:
             raise errors.TaleError("you cannot enqueue a Deferred that already has a 'ctx' kwarg (serialization issues)")
         with self.deferreds_lock:
-            heapq.heappush(self.deferreds, deferred)
+            self.deferreds.push(deferred)
 
     def pubsub_event(self, topicname: pubsub.TopicNameType, event: Union[Callable, Tuple[player.PlayerConnection, str]]) -> None:
         if topicname == "driver-pending-actions":
@@ -840,8 +981,7 @@ class Driver(pubsub.Listener):
 
     def remove_deferreds(self, owner: str) -> None:
         with self.deferreds_lock:
-            self.deferreds = [d for d in self.deferreds if d.owner is not owner]
-            heapq.heapify(self.deferreds)
+            self.deferreds.remove_owner(owner)
 
     def register_periodicals(self, obj: Any) -> None:
         for func, period in util.get_periodicals(obj).items():
@@ -97,10 +97,15 @@ class IFDriver(driver.Driver):
         all_items = [i for i in base.MudObjRegistry.all_items.values() if i.contained_in]
         all_livings = [l for l in base.MudObjRegistry.all_livings.values() if l.location]
         all_exits = list(base.MudObjRegistry.all_exits.values())
-        savedata = serializer.serialize(self.story.config, player, all_items, all_livings, all_locations, all_exits,
-                                        self.deferreds, self.game_clock)
-        del all_locations, all_exits, all_items, all_livings
-        self.user_resources[util.storyname_to_filename(self.story.config.name) + ".savegame"] = savedata
+        game_state = serializer.game_state(self.story.config, player, all_items, all_livings, all_locations, all_exits,
+                                           list(self.deferreds), self.game_clock)
+        savedata = serializer.literal(game_state)
+        del all_locations, all_exits, all_items, all_livings, game_state
+        savegame_filename = util.storyname_to_filename(self.story.config.name) + ".savegame"
+        # write a new file and replace the savegame with it when it's complete, so a failure leaves the previous savegame intact
+        with self.user_resources.open_write(savegame_filename + ".tmp") as savefile:
+            serializer.dump(savedata, savefile)
+        self.user_resources.replace(savegame_filename + ".tmp", savegame_filename)
         player.tell("Game saved.")
         if self.story.config.display_gametime:
             player.tell("Game time: %s" % self.game_clock)
@@ -430,7 +435,7 @@ class IFDriver(driver.Driver):
 
             saved_deferreds = deserializer.recreate_classes(state.pop("deferreds"), objects_finder)
             assert all(isinstance(d, driver.Deferred) for d in saved_deferreds)
-            self.deferreds = []
+            self.deferreds.clear()
             for d in saved_deferreds:
                 self._enqueue_deferred(d)
 
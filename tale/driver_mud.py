@@ -19,6 +19,7 @@ from . import lang
 from . import pubsub
 from . import util
 from .player import PlayerConnection, Player
+from .player_utils import InputNotifier
 from .tio.mud_browser_io import TaleMudFastAPIApp
 
 
@@ -32,6 +33,7 @@ class MudDriver(driver.Driver):
         self.game_mode = GameMode.MUD
         self.restricted = restricted   # restricted mud mode? (no new players allowed)
         self.mud_accounts = None   # type: accounts.MudAccounts
+        self.input_notifier = InputNotifier()
 
     def start_main_loop(self):
         # Driver runs as main thread, FastAPI webserver runs in background thread
@@ -83,6 +85,7 @@ class MudDriver(driver.Driver):
         connect_name = "<connecting_%d>" % id(connection)  # unique temporary name
         new_player = Player(connect_name, "n", race="elemental", descr="This player is still connecting to the game.")
         connection.player = new_player
+        new_player.input_notifier = self.input_notifier
         from .tio.mud_browser_io import MudHttpIo
         connection.io = MudHttpIo(connection)
         self.all_players[new_player.name] = connection
@@ -93,9 +96,10 @@ class MudDriver(driver.Driver):
         if len(self.mud_accounts.all_accounts(having_privilege="wizard")) == 0:
             # there is no wizard, create a dialog to construct the initial admin user
             driver.topic_async_dialogs.send((connection, self._login_dialog_mud_create_admin(connection)))
-            return connection
-        # create the login dialog
-        driver.topic_async_dialogs.send((connection, self._login_dialog_mud(connection)))
+        else:
+            # create the login dialog
+            driver.topic_async_dialogs.send((connection, self._login_dialog_mud(connection)))
+        self.input_notifier.wake()   # start the dialog right away rather than at the next server tick
         return connection
 
     def disconnect_idling(self, conn: PlayerConnection) -> None:
@@ -333,19 +337,13 @@ class MudDriver(driver.Driver):
                 if conn not in self.waiting_for_input:
                     conn.write_input_prompt()
 
-            # server tick goes on a timer
-            wait_time = max(0.01, self.story.config.server_tick_time - loop_duration)
-            while wait_time > 0:
-                if any(conn.player.input_is_available.is_set() for conn in self.all_players.values()):
-                    # there was player input, abort the wait loop and deal with it
-                    break
-                sub_wait = min(0.1, wait_time)  # keep things responsive
-                time.sleep(sub_wait)
-                wait_time -= sub_wait
+            # server tick goes on a timer, player input wakes up the loop immediately
+            wait_time = max(0.01, previous_server_tick + self.story.config.server_tick_time - time.time())
+            players_with_input = self.input_notifier.wait(wait_time)
 
             loop_start = time.time()
             for conn in list(self.all_players.values()):
-                if conn.player.input_is_available.is_set():
+                if conn.player in players_with_input and conn.player.input_is_available.is_set():
                     conn.need_new_input_prompt = True
                     try:
                         if conn in self.waiting_for_input:
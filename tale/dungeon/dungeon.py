@@ -5,7 +5,10 @@ Dungeons can be attached to any story and provide procedurally generated
 levels with rooms, corridors, mobs, and loot.
 """
 
+import json
 import random
+from concurrent import futures
+from concurrent.futures import Future
 from typing import TYPE_CHECKING
 
 from stories.anything.npcs.npc_defs import RoamingMob
@@ -18,6 +21,9 @@ from tale.zone import Zone
 if TYPE_CHECKING:
     from tale.llm.dynamic_story import DynamicStory
 
+DESCRIBE_SLICE = 10     # rooms per LLM request
+DESCRIBE_ATTEMPTS = 3   # requests for a room before it gets its basic description
+
 
 class Dungeon:
     """
@@ -131,70 +137,97 @@ class Dungeon:
         return rooms
     
     def _describe_rooms(self, zone: Zone, layout: Layout, rooms: list):
-        """Generate descriptions for rooms using LLM."""
-        described_rooms = []
-        sliced_rooms = []
+        """
+        Generate descriptions for rooms using LLM.
+        The rooms are described in slices, and all slices are requested at the same time. The rooms of
+        a slice are placed as soon as it's done, but the slice with the entrance goes first, so the
+        entrance is the first location of the zone. Rooms that are missing from an answer are asked for
+        again (up to DESCRIBE_ATTEMPTS times in all), after that they get their basic description.
+        """
+        cells = list(layout.cells.values())
+        room_data = [json.loads(room_json) for room_json in rooms]
         
         # Check if we have llm_util available
         if not self.llm_util:
             # Fallback to basic descriptions if no LLM available
-            import json
-            for i, room_json in enumerate(rooms):
-                room_data = json.loads(room_json)
-                room_name = room_data.get("name", f"Room {i}")
-                
-                # Ensure unique names
-                name_counter = 1
-                unique_name = room_name
-                while zone.get_location(unique_name):
-                    unique_name = f"{room_name}({name_counter})"
-                    name_counter += 1
-                
-                location = Location(
-                    name=unique_name,
-                    descr=room_data.get("description", "A dungeon room.")
-                )
-                location.world_location = list(layout.cells.values())[i].coord
-                zone.add_location(location=location)
-                self.story.add_location(zone=zone.name, location=location, add_to_grid=False)
-                self._grid[location.world_location.as_tuple()] = location
+            for i, data in enumerate(room_data):
+                self._place_room(zone, cells[i], data.get("name", f"Room {i}"), data.get("description", "A dungeon room."))
             return
         
-        # Process rooms in batches of 10
-        for num in range(0, len(rooms), 10):
-            sliced_rooms.extend(rooms[num:num+10])
-            for i in range(3):
-                described_rooms_slice = self.llm_util.generate_dungeon_locations(
-                    zone_info=zone.get_info(), 
-                    locations=sliced_rooms, 
-                    depth=self.current_depth, 
-                    max_depth=self.max_depth
-                )
-                if described_rooms_slice.valid:
-                    described_rooms.extend(described_rooms_slice.location_descriptions)
-                    sliced_rooms = []
-                    break
+        slices = [list(range(num, min(num + DESCRIBE_SLICE, len(rooms)))) for num in range(0, len(rooms), DESCRIBE_SLICE)]
+        entrance = next((i for i, cell in enumerate(cells) if cell.is_dungeon_entrance or cell.is_entrance), 0)
+        slices.sort(key=lambda indices: entrance not in indices)
+        pending = dict()  # type: dict[Future, tuple[list[int], int]]
+        for indices in slices:
+            pending[self._request_rooms(zone, rooms, indices)] = (indices, 1)
         
-        if len(rooms) != len(described_rooms):
-            print(f'Rooms list not same length: {len(rooms)} vs {len(described_rooms)}')
-        
-        # Create location objects
-        for room in described_rooms:
-            i = 1
-            room_name = room.name
-            while zone.get_location(room_name):
-                # Ensure unique names
-                room_name = f'{room.name}({i})'
-                i += 1
-            
-            location = Location(name=room_name, descr=room.description)
-            location.world_location = list(layout.cells.values())[room.index].coord
-            zone.add_location(location=location)
-            self.story.add_location(zone=zone.name, location=location, add_to_grid=False)
-            self._grid[location.world_location.as_tuple()] = location
+        described_rooms = []
+        waiting = []  # rooms that are done before the entrance is
+        entrance_placed = False
+        while pending:
+            done, _ = futures.wait(list(pending), return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                indices, attempt = pending.pop(future)
+                described = self._described_rooms(future, indices)
+                missing = [i for i in indices if i not in described]
+                if missing and attempt < DESCRIBE_ATTEMPTS:
+                    pending[self._request_rooms(zone, rooms, missing)] = (missing, attempt + 1)
+                    missing = []
+                elif missing:
+                    print(f'No descriptions for dungeon rooms {missing} after {attempt} attempts')
+                described_rooms.extend(described.values())
+                done_rooms = [(i, room.name, room.description) for i, room in described.items()]
+                done_rooms += [(i, room_data[i].get("name", f"Room {i}"), room_data[i].get("description", "A dungeon room.")) for i in missing]
+                if not entrance_placed:
+                    waiting.extend(done_rooms)
+                    if entrance not in [room[0] for room in waiting]:
+                        continue
+                    entrance_placed = True
+                    done_rooms = sorted(waiting, key=lambda room: room[0] != entrance)
+                for i, name, description in done_rooms:
+                    self._place_room(zone, cells[i], name, description)
         
         return described_rooms
     
+    def _request_rooms(self, zone: Zone, rooms: list, indices: list) -> Future:
+        return self.llm_util.request_dungeon_locations(
+            zone_info=zone.get_info(),
+            locations=[rooms[i] for i in indices],
+            depth=self.current_depth,
+            max_depth=self.max_depth
+        )
+    
+    def _described_rooms(self, future: Future, indices: list) -> dict:
+        """The rooms in the answer that were asked for, by index. Anything else in the answer is left out."""
+        try:
+            response = future.result()
+        except Exception as exc:
+            print(f'Describing dungeon rooms failed: {exc}')
+            return dict()
+        described = dict()
+        for room in response.location_descriptions:
+            try:
+                index = int(room.index)
+            except (TypeError, ValueError):
+                continue
+            if index in indices and room.name:
+                described[index] = room
+        return described
+    
+    def _place_room(self, zone: Zone, cell, room_name: str, description: str) -> Location:
+        # Ensure unique names
+        name = room_name
+        i = 1
+        while zone.get_location(name):
+            name = f'{room_name}({i})'
+            i += 1
+        location = Location(name=name, descr=description)
+        location.world_location = cell.coord
+        zone.add_location(location=location)
+        self.story.add_location(zone=zone.name, location=location, add_to_grid=False)
+        self._grid[location.world_location.as_tuple()] = location
+        return location
+    
     def _connect_locations(self, layout: Layout) -> None:
         """Connect locations based on the layout."""
         connections = layout.connections
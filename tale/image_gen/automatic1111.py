@@ -1,9 +1,9 @@
 import os
-import requests
 import json
 
 import yaml
 
+from tale.connection_pool import get_pool
 from tale.image_gen.base_gen import ImageGeneratorBase
 
 class Automatic1111(ImageGeneratorBase):
@@ -47,7 +47,7 @@ class Automatic1111(ImageGeneratorBase):
             "override_settings": {},
             "override_settings_restore_afterwards": True
         }
-        response = requests.post(self.url, json=data)
+        response = get_pool().post(self.url, json=data)
         if response.status_code == 200:
             json_data = json.loads(response.content)
             return json_data['images'][0]
@@ -5,8 +5,8 @@ import os
 import random
 import time
 
-import requests
 import yaml
+from tale.connection_pool import get_pool
 from .base_gen import ImageGeneratorBase
 
 class ComfyUi(ImageGeneratorBase):
@@ -45,7 +45,7 @@ class ComfyUi(ImageGeneratorBase):
         workflow = self._set_image_size(workflow, width, height)
 
         p = {"prompt": workflow}
-        response = requests.post(self.url, json=p)
+        response = get_pool().post(self.url, json=p)
         if not response.status_code == 200:
             try:
                 error_data = response.json()
@@ -65,7 +65,7 @@ class ComfyUi(ImageGeneratorBase):
         return self.get_history(prompt_id)
         
     def get_history(self, prompt_id: str):
-        response = requests.get(f"http://{self.address}:{self.port}/history", data=prompt_id)
+        response = get_pool().get(f"http://{self.address}:{self.port}/history", data=prompt_id)
         if response.status_code == 200:
             history = json.loads(response.content)
             history = history[prompt_id]
@@ -83,13 +83,13 @@ class ComfyUi(ImageGeneratorBase):
     def get_image(self, filename, subfolder, folder_type):
         data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         headers = {"Content-Type": "image/png"}
-        response = requests.get(f"http://{self.address}:{self.port}/view", params=data, headers=headers, stream=True)
+        response = get_pool().get(f"http://{self.address}:{self.port}/view", params=data, headers=headers)
         if response.status_code == 200:
             return base64.b64encode(response.content).decode('utf-8')
         
     def poll_queue(self, prompt_id: str):    
         """ Return True if the prompt is not in the queue, False otherwise."""
-        response = requests.get(f"http://{self.address}:{self.port}/queue")
+        response = get_pool().get(f"http://{self.address}:{self.port}/queue")
         if response.status_code == 200:
             json_data = json.loads(response.content)
             for prompt in json_data['queue_pending']:
@@ -1,9 +1,15 @@
-from tale import load_items, wearable
+import time
+from typing import Optional
+
+from tale import load_items, mud_context, util, wearable
+from tale.base import MudObjRegistry
 from tale.items import generic
 from tale.llm.dynamic_story import DynamicStory
+from tale.llm import world_shards
 from tale.parse import parse_locations
 from tale.player import Player
 from tale.story import StoryConfig
+from tale.zone import Zone
 import tale.parse_utils as parse_utils
 import tale.llm.llm_cache as llm_cache
 
@@ -13,23 +19,40 @@ class JsonStory(DynamicStory):
         super(JsonStory, self).__init__()
         self.config = config
         self.path = path
+        self._zone_used = dict() # type: dict[str, float] # when a player was last in a loaded zone
         
     
     def init(self, driver) -> None:
         super(JsonStory, self).init(driver)
-        locs = {}
-        zones = []
-        world = parse_utils.load_json(self.path +'world.json')
-        for zone in world['zones'].values():
-            zones, exits = parse_locations.load_locations(zone)
-        if len(zones) < 1:
-            print("No zones found in story config")
-            return
-        for name in zones.keys():
-            zone = zones[name]
-            self.add_zone(zone)
-            for loc in zone.locations.values():
-                self.add_location(loc, name)
+        if self.config.lazy_zones and world_shards.has_shards(self.path):
+            # only the index is read, the zones are loaded when they're needed
+            index = world_shards.load_index(self.path)
+            world = dict(catalogue=index.get('catalogue', {}),
+                         world=dict(npcs=index.get('npcs', {}),
+                                    mob_spawners=index.get('mob_spawners', []),
+                                    item_spawners=index.get('item_spawners', [])))
+            self._unloaded_zones = dict(index.get('zones', {}))
+            for name, (zone_name, coord) in index.get('locations', {}).items():
+                self._unloaded_locations[name] = (zone_name, tuple(coord))
+                self._unloaded_grid[tuple(coord)] = zone_name
+            if self.config.zone_idle_time > 0:
+                interval = self.config.zone_idle_time / 2
+                driver.defer((interval, interval, interval), self.unload_idle_zones)
+        else:
+            zones = {}
+            world = world_shards.load_world(self.path)
+            for zone in world['zones'].values():
+                loaded_zones, exits = parse_locations.load_locations(zone)
+                zones.update(loaded_zones)
+            if len(zones) < 1:
+                print("No zones found in story config")
+                return
+            for name in zones.keys():
+                zone = zones[name]
+                self.add_zone(zone)
+                for loc in zone.locations.values():
+                    self.add_location(loc, name)
+            self.rebuild_location_index()
         if world.get('catalogue', None):
             if world['catalogue']['creatures']:
                 self._catalogue._creatures = world['catalogue']['creatures']
@@ -38,16 +61,21 @@ class JsonStory(DynamicStory):
             if world['catalogue'].get('wearables', None):
                 wearable.add_story_wearables(world['catalogue']['wearables'])
         if world.get('world', None):
-            if  world['world']['items']:
+            if world['world'].get('items', None):
                 # Keep this so that saved items in worlds will transfer to locations. But don't save them.
                 self._world.items = load_items.load_items(world['world']['items'].values(), self.locations)
-            if world['world']['npcs']:
+            if world['world'].get('npcs', None):
                 self._world.npcs = parse_utils.load_npcs(world['world']['npcs'].values(), locations=self.locations, world_items=self._catalogue._items)
-            if world['world'].get('spawners', None):
-                self._world.mob_spawners = parse_utils.load_mob_spawners(world['world']['spawners'], self.locations, self._catalogue._creatures, self._catalogue._items)
+            mob_spawners = world['world'].get('spawners', None) or world['world'].get('mob_spawners', None)
+            if mob_spawners:
+                self._world.mob_spawners = parse_utils.load_mob_spawners(mob_spawners, self.locations, self._catalogue._creatures, self._catalogue._items)
             if world['world'].get('item_spawners', None):
                 self._world.item_spawners = parse_utils.load_item_spawners(world['world']['item_spawners'], self._zones, self._catalogue._items)
 
+        if world_shards.has_shards(self.path):
+            self._shards.loaded(self.path, self)
+
+        llm_cache.open_store(self.path)
         llm_cache.load(parse_utils.load_json(self.path +'llm_cache.json'))
 
         # check if there are predefined items for the setting
@@ -57,6 +85,88 @@ class JsonStory(DynamicStory):
                 self._catalogue.add_item(item)
 
 
+    def load_zone(self, name: str) -> Zone:
+        """ Load a zone from its file, with its npcs and spawners."""
+        filename = self._unloaded_zones.pop(name)
+        shard = world_shards.load_zone(self._shards.directory or self.path, filename)
+        for location_name in shard['zone']['locations']:
+            entry = self._unloaded_locations.get(location_name['name'])
+            if entry and entry[0] == name:
+                del self._unloaded_locations[location_name['name']]
+                if self._unloaded_grid.get(entry[1]) == name:
+                    del self._unloaded_grid[entry[1]]
+        zone = parse_locations.load_locations(shard['zone'])[0][name]
+        self.add_zone(zone)
+        for location in zone.locations.values():
+            self.add_location(location, name)
+        self._world.npcs.update(parse_utils.load_npcs(shard.get('npcs', {}).values(), locations=self.locations, world_items=self._catalogue._items))
+        self._world.mob_spawners.extend(parse_utils.load_mob_spawners(shard.get('mob_spawners', []), self.locations, self._catalogue._creatures, self._catalogue._items))
+        self._world.item_spawners.extend(parse_utils.load_item_spawners(shard.get('item_spawners', []), self._zones, self._catalogue._items))
+        self._shards.clean(zone)
+        self._zone_used[name] = time.monotonic()
+        return zone
+
+    def unload_zone(self, name: str, ctx: Optional[util.Context] = None) -> bool:
+        """ Unload a zone that didn't change since it was saved, and has no players in it.
+        It will be loaded again from its file when it's needed. Returns True if the zone was unloaded."""
+        zone = self._zones.get(name)
+        if not zone or not self._can_unload(zone):
+            return False
+        locations = [location for location in zone.locations.values() if location]
+        livings = [living for location in locations for living in location.livings]
+        for npc_name, npc in list(self._world.npcs.items()):
+            if npc in livings:
+                del self._world.npcs[npc_name]
+        for living in livings:
+            living.destroy(ctx)
+        for spawner in [spawner for spawner in self._world.mob_spawners if spawner.location in locations]:
+            self._world.remove_mob_spawner(spawner)
+            mud_context.driver.remove_deferreds(spawner)
+        for spawner in [spawner for spawner in self._world.item_spawners if spawner.zone is zone]:
+            self._world.remove_item_spawner(spawner)
+            mud_context.driver.remove_deferreds(spawner)
+        for location in locations:
+            coord = location.world_location.as_tuple()
+            if self._world._locations.get(location.name) is location:
+                del self._world._locations[location.name]
+            if self._world._grid.get(coord) is location:
+                del self._world._grid[coord]
+            self._unloaded_locations.setdefault(location.name, (name, coord))
+            self._unloaded_grid.setdefault(coord, name)
+            location.destroy(ctx)
+        self._location_index.remove_zone(zone)
+        del self._zones[name]
+        self._zone_used.pop(name, None)
+        self._unloaded_zones[name] = world_shards.zone_filename(name)
+        return True
+
+    def unload_idle_zones(self, ctx: util.Context) -> None:
+        """ Periodically unloads the zones that no player has been in for a while."""
+        now = time.monotonic()
+        for name, zone in list(self._zones.items()):
+            if any(isinstance(living, Player) for location in zone.locations.values() if location for living in location.livings):
+                self._zone_used[name] = now
+            elif now - self._zone_used.get(name, now) >= self.config.zone_idle_time:
+                self.unload_zone(name, ctx)
+
+    def _can_unload(self, zone: Zone) -> bool:
+        if not self._shards.directory or zone.dirty:
+            return False
+        locations = [location for location in zone.locations.values() if location]
+        for location in locations:
+            if location.vnum in MudObjRegistry.dirty_locations:
+                return False
+            if any(isinstance(living, Player) for living in location.livings):
+                return False
+            if any(exit.target not in locations for exit in location.exits.values()):
+                return False    # exits to other zones would lead to a location that isn't there anymore
+        for other in self._zones.values():
+            if other is not zone:
+                for location in other.locations.values():
+                    if location and any(exit.target in locations for exit in location.exits.values()):
+                        return False
+        return True
+
     def welcome(self, player: Player) -> str:
         player.tell("<bright>Welcome to `%s'.</>" % self.config.name, end=True)
         player.tell("\n")
@@ -2,6 +2,7 @@ import random
 from tale.llm.character_card import CharacterCard
 from tale.llm.item_handling_result import ItemHandlingResult
 import tale.llm.llm_cache as llm_cache
+from tale.llm.npc_memory import NpcMemory
 from tale import lang, mud_context
 from tale.base import ContainingType, Living, ParseResult
 from tale.errors import LlmResponseException
@@ -10,7 +11,7 @@ from tale.llm.responses.FollowResponse import FollowResponse
 from tale.player import Player
 
 
-from typing import Sequence
+from typing import Callable, Sequence
 
 from tale.quest import Quest
 from tale.resources_utils import pad_text_for_avatar, unpad_text
@@ -31,6 +32,7 @@ class LivingNpc(Living):
         self.known_locations = dict()
         self._observed_events = [] # type: list[int] # These are hashed values of action the character has been notified of
         self._conversations = [] # type: list[str] # These are hashed values of conversations the character has involved in
+        self._memory = NpcMemory() # keeps the event history in prompts within budget, older events are summarized
         self.sentiments = {}
         self.action_history = [] # type: list[str]
         self.planned_actions = [] # type: list[str]
@@ -86,6 +88,7 @@ class LivingNpc(Living):
         # store even our own events.
         if actor is self or parsed.verb in self.verbs:
             return  # avoid reacting to ourselves, or reacting to verbs we already have a handler for
+        self.mark_dirty()   # the event goes in the memory
         greet = False
         targeted = False
         for alias in self.aliases:
@@ -131,7 +134,7 @@ class LivingNpc(Living):
             result = mud_context.driver.llm_util.request_follow(actor=actor,
                                                                 character_name=self.title, 
                                                                 character_card=self.character_card, 
-                                                                event_history=llm_cache.get_events(self._observed_events), 
+                                                                event_history=self._event_history('follow'), 
                                                                 location=self.location,
                                                                 asker_reason=parsed.args[0]) # type: FollowResponse
             if result:
@@ -159,7 +162,7 @@ class LivingNpc(Living):
         sentiment = None
         for i in range(3):
             response, item, sentiment = mud_context.driver.llm_util.generate_dialogue(
-                conversation=llm_cache.get_events(self._observed_events),
+                conversation=self._event_history('dialogue'),
                 character_card = self.character_card,
                 character_name = self.title,
                 target = actor.title,
@@ -194,7 +197,7 @@ class LivingNpc(Living):
                                             character_name=self.title,
                                             location=self.location,
                                             acting_character_name=actor.title if actor else '',
-                                            event_history=llm_cache.get_events(self._observed_events),
+                                            event_history=self._event_history('reaction'),
                                             sentiment=self.sentiments.get(actor.name, '') if actor else '')
         if action:
             self.action_history.append(action)
@@ -239,27 +242,53 @@ class LivingNpc(Living):
         self.known_locations[self.location.name] = f"description: {self.location.description}. " + ". ".join(self.location.look(exclude_living=self, short=True))
         super().move(target, actor, silent=silent, is_player=is_player, verb=verb, direction_names=direction_names)
 
-    def idle_action(self):
+    def idle_action(self, background: bool = False):
         """ Plan and perform idle actions. 
             Currently handles planning several actions in advance, and then performing them in reverse order.
+            With background, new actions are planned without blocking the server tick, and performed when they arrive.
+            The planning requests of all npcs in a tick are sent together, see IdleActionBatch.
         """
         if not self.planned_actions:
-            if self.action_history:
-                history_length = len(self.action_history)
-                previous_actions = self.action_history[-5:] if history_length > 4 else self.action_history[-history_length:]
-            else:
-                previous_actions = []
-            if self.autonomous:
-                actions = [self.autonomous_action()]
-            else: 
-                actions = mud_context.driver.llm_util.perform_idle_action(character_card=self.character_card,
+            if background:
+                mud_context.driver.llm_util.idle_actions.add(self)
+                return None
+            actions = self._plan_idle_actions()
+            if actions:
+                self.planned_actions.append(actions)
+        return self._perform_planned_action()
+
+    def _plan_idle_actions(self, callback: Callable[[list], None] = None):
+        """ Ask the LLM for new idle actions.
+            With a callback, the request is queued and a future is returned. The callback receives the actions in the server tick loop."""
+        if self.autonomous:
+            if callback:
+                return mud_context.driver.llm_util.free_form_action(character_card=self.character_card,
+                                            character_name=self.title,
+                                            location=self.location,
+                                            event_history=self._event_history('action'),
+                                            callback=lambda actions: callback([self._autonomous_actions_planned(actions)] if self.location else None))
+            return [self.autonomous_action()]
+        if self.action_history:
+            history_length = len(self.action_history)
+            previous_actions = self.action_history[-5:] if history_length > 4 else self.action_history[-history_length:]
+        else:
+            previous_actions = []
+        return mud_context.driver.llm_util.perform_idle_action(character_card=self.character_card,
                                                     character_name=self.title,
                                                     location=self.location,
                                                     last_action=previous_actions,
-                                                    event_history=llm_cache.get_events(self._observed_events),
-                                                    sentiments=self.sentiments)
-            if actions:
-                self.planned_actions.append(actions)
+                                                    event_history=self._event_history('idle'),
+                                                    sentiments=self.sentiments,
+                                                    callback=callback)
+
+    def _idle_actions_planned(self, actions: list) -> None:
+        """ Called in the server tick loop when background planning of idle actions is done."""
+        if actions and self.location:
+            self.planned_actions.append(actions)
+            self._perform_planned_action()
+
+    def _perform_planned_action(self):
+        self.mark_dirty()
         if len(self.planned_actions) > 0:
             action = self.planned_actions.pop(0)
             if isinstance(action, list):
@@ -274,7 +303,10 @@ class LivingNpc(Living):
         actions = mud_context.driver.llm_util.free_form_action(character_card=self.character_card,
                                             character_name=self.title,
                                             location=self.location,
-                                            event_history=llm_cache.get_events(self._observed_events)) # type: list
+                                            event_history=self._event_history('action')) # type: list
+        return self._autonomous_actions_planned(actions)
+
+    def _autonomous_actions_planned(self, actions: list) -> str:
         if not actions:
             return None
         
@@ -286,6 +318,7 @@ class LivingNpc(Living):
         return '\n'.join(defered_actions)
     
     def _parse_action(self, action: ActionResponse):
+        self.mark_dirty()
         defered_actions = []
         if action.goal:
             self.goal = action.goal
@@ -360,6 +393,20 @@ class LivingNpc(Living):
         self.location._notify_action_all(deferred_action, actor=self)
         self.deferred_actions.clear()
 
+    def _event_history(self, prompt_type: str) -> str:
+        """ The observed events for a prompt, within the token budget of the prompt type.
+            Starts folding older events into the summary when there are enough of them."""
+        if self._memory.needs_summary(self._observed_events):
+            self._memory.summarize(self._observed_events,
+                                   request_summary=lambda summary, events, callback: mud_context.driver.llm_util.summarize_memory(self.title, summary, events, callback=callback),
+                                   on_summarized=self._forget_events)
+        return self._memory.history(self._observed_events, prompt_type)
+
+    def _forget_events(self, amount: int) -> None:
+        """ The oldest events are in the summary now."""
+        del self._observed_events[:amount]
+        self.mark_dirty()
+
     def get_observed_events(self, amount: int) -> list:
         """ Returns the last amount of observed events as a list of strings"""
         return llm_cache.get_events(self._observed_events[-amount:])
@@ -395,7 +442,8 @@ class LivingNpc(Living):
                     sentiments=self.sentiments,
                     action_history=self.action_history,
                     planned_actions=self.planned_actions,
-                    goal=self.goal)
+                    goal=self.goal,
+                    summary=self._memory.summary)
 
     
     def load_memory(self, memory: dict):
@@ -405,5 +453,6 @@ class LivingNpc(Living):
         self.action_history = memory.get('action_history', [])
         self.planned_actions = memory.get('planned_actions', [])
         self.goal = memory.get('goal', None)
+        self._memory.summary = memory.get('summary', '')
 
         
\ No newline at end of file
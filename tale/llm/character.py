@@ -4,6 +4,8 @@ from copy import deepcopy
 from json import JSONDecodeError
 import json
 import random
+from concurrent.futures import Future
+from typing import Callable
 
 from tale import json_util, parse_utils
 from tale.base import Location
@@ -13,6 +15,7 @@ from tale.llm.contexts.ActionContext import ActionContext
 from tale.llm.contexts.CharacterContext import CharacterContext
 from tale.llm.contexts.FollowContext import FollowContext
 from tale.llm.llm_io import IoUtil
+from tale.llm.llm_scheduler import RequestPriority
 from tale.llm.contexts.DialogueContext import DialogueContext
 from tale.llm.responses.ActionResponse import ActionResponse
 from tale.llm.responses.FollowResponse import FollowResponse
@@ -39,6 +42,7 @@ class CharacterBuilding():
         self.character_template = llm_config.params['CHARACTER_TEMPLATE']
         self.request_follow_prompt = llm_config.params['REQUEST_FOLLOW_PROMPT']
         self.follow_template = llm_config.params['FOLLOW_TEMPLATE']
+        self.summarize_memory_prompt = llm_config.params['SUMMARIZE_MEMORY_PROMPT']
 
     def generate_dialogue(self,
                           context: DialogueContext,
@@ -58,7 +62,9 @@ class CharacterBuilding():
         request_body['grammar'] = self.json_grammar
         print(prompt)
         print(context.to_prompt_string())
-        response = self.io_util.synchronous_request(request_body, prompt=prompt, context=context.to_prompt_string())
+        # a player is waiting, so this goes ahead of any queued background requests
+        response = self.io_util.submit_request(request_body, prompt=prompt, context=context.to_prompt_string(), priority=RequestPriority.DIALOGUE,
+                                               slot_key=f'{context.speaker_name}:{context.target_name}').result()
         try:
             json_result = json_util.safe_load(response)
             text = json_result["response"]
@@ -96,7 +102,10 @@ class CharacterBuilding():
             print(f'Exception while parsing character {json_result}')
             return None
     
-    def perform_idle_action(self, character_name: str, location: Location, story_context: str, character_card: CharacterCard, sentiments: dict = {}, last_action: str = '', event_history: str = '') -> list:
+    def perform_idle_action(self, character_name: str, location: Location, story_context: str, character_card: CharacterCard, sentiments: dict = {}, last_action: str = '', event_history: str = '', callback: Callable[[list], None] = None) -> list:
+        """ Plan idle actions for a character.
+        If a callback is supplied, the request is queued as background work and the
+        callback receives the actions in the server tick loop. A future is returned instead of the actions."""
         characters = {}
         for living in location.livings:
             if living.visible and living.name != character_name.lower():
@@ -119,7 +128,10 @@ class CharacterBuilding():
         if self.backend == 'kobold_cpp':
             request_body['banned_tokens'] = ['You']
 
-        text = self.io_util.synchronous_request(request_body, prompt=prompt)
+        if callback:
+            return self.io_util.submit_request(request_body, prompt=prompt, priority=RequestPriority.BACKGROUND, slot_key=character_name,
+                                               callback=lambda text: callback(parse_utils.trim_response(text) if text else None))
+        text = self.io_util.synchronous_request(request_body, prompt=prompt, slot_key=character_name)
         return (parse_utils.trim_response(text)) if text else None
     
     def perform_travel_action(self, character_name: str, location: Location, locations: list, directions: list, character_card: CharacterCard):
@@ -149,10 +161,12 @@ class CharacterBuilding():
             history=event_history.replace('<break>', '\n'),
             sentiment=sentiment)
         request_body = deepcopy(self.default_body)
-        text = self.io_util.synchronous_request(request_body, prompt=prompt)
+        text = self.io_util.synchronous_request(request_body, prompt=prompt, slot_key=character_name)
         return parse_utils.trim_response(text) + "\n"
     
-    def free_form_action(self, action_context: ActionContext) -> list:
+    def free_form_action(self, action_context: ActionContext, callback: Callable[[list], None] = None) -> list:
+        """ If a callback is supplied, the request is queued as background work and the
+        callback receives the actions in the server tick loop. A future is returned instead of the actions."""
         prompt = self.pre_prompt
         prompt += self.free_form_action_prompt.format(
             context = '{context}',
@@ -162,9 +176,15 @@ class CharacterBuilding():
         request_body = deepcopy(self.default_body)
         if self.json_grammar_key:
             request_body[self.json_grammar_key] = self.json_grammar
-        text = ''
+        if callback:
+            return self.io_util.submit_request(request_body, prompt=prompt, context=action_context.to_prompt_string(),
+                                               priority=RequestPriority.BACKGROUND, slot_key=action_context.character_name,
+                                               callback=lambda text: callback(self._parse_actions(text)))
+        text = self.io_util.synchronous_request(request_body, prompt=prompt, context=action_context.to_prompt_string(), slot_key=action_context.character_name)
+        return self._parse_actions(text)
+
+    def _parse_actions(self, text: str) -> list:
         try :
-            text = self.io_util.synchronous_request(request_body, prompt=prompt, context=action_context.to_prompt_string())
             if not text:
                 return None
             response = json_util.safe_load(text)
@@ -190,8 +210,20 @@ class CharacterBuilding():
         request_body = deepcopy(self.default_body)
         if self.json_grammar_key:
             request_body[self.json_grammar_key] = self.json_grammar
-        text = self.io_util.synchronous_request(request_body, prompt=prompt)
+        text = self.io_util.synchronous_request(request_body, prompt=prompt, slot_key=follow_context.character_name)
         if not text:
             return None
         return FollowResponse(json_util.safe_load(text))
-        
+
+    def summarize_memory(self, character_name: str, summary: str, events: str, word_limit: int, callback: Callable[[str], None]) -> Future:
+        """ Fold older events into the summary of what a character remembers.
+        The request is queued as background work and the callback receives the new summary in the server tick loop."""
+        prompt = self.pre_prompt
+        prompt += self.summarize_memory_prompt.format(
+            character_name=character_name,
+            summary=summary if summary else 'none',
+            events=events,
+            word_limit=word_limit)
+        request_body = deepcopy(self.default_body)
+        return self.io_util.submit_request(request_body, prompt=prompt, priority=RequestPriority.BACKGROUND, slot_key=character_name,
+                                           callback=lambda text: callback(parse_utils.trim_response(text) if text else ''))
@@ -34,4 +34,5 @@ class ActionContext(BaseContext):
             examples.append(f'{{"goal":"", "thoughts":"I want to go there.", "action":"move", "target":{random.choice(list(exits))}, "text":""}}')
         if len(characters) > 0:
             examples.append(f'{{"goal":"", "thoughts":"", "action":"say", "target":{random.choice(characters)}, "text":""}}')
-        return f"Story context:{self.story_context}; Story type:{self.story_type}; Available actions: {actions}; Location: {self.location.name}, {self.location.description}; Available exits: {exits}; Self({self.character_name}): {self.character_card}; Present items: {items}; Present characters: {characters}; History:{self.event_history}; Example actions: {', '.join(examples)};"
\ No newline at end of file
+        # from the least to the most likely to change, so the backend can reuse the start of the previous prompt
+        return f"Story type:{self.story_type}; Available actions: {actions}; Self({self.character_name}): {self.character_card}; Story context:{self.story_context}; Location: {self.location.name}, {self.location.description}; Available exits: {exits}; Present items: {items}; Present characters: {characters}; History:{self.event_history}; Example actions: {', '.join(examples)};"
\ No newline at end of file
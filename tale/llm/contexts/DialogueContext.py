@@ -22,4 +22,5 @@ class DialogueContext(BaseContext):
 
 
     def to_prompt_string(self) -> str:
-        return f"Story context:{self.story_context}; Location:{self.location_description}; Self:{self.speaker_name}:{self.speaker_card}; Listener:{self.target_name}:{self.target_description};"
\ No newline at end of file
+        # from the least to the most likely to change, so the backend can reuse the start of the previous prompt
+        return f"Self:{self.speaker_name}:{self.speaker_card}; Listener:{self.target_name}:{self.target_description}; Story context:{self.story_context}; Location:{self.location_description};"
\ No newline at end of file
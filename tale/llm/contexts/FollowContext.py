@@ -15,4 +15,5 @@ class FollowContext(ActionContext):
         self.asker_reason = asker_reason # Added last in actual prompt
 
     def to_prompt_string(self) -> str:
-        return f"Story context:{self.story_context}; Story type:{self.story_type}; Location:{self.location.name}, {self.location.description}; Self({self.character_name}): {self.character_card}; Asker({self.asker_name}): {self.asker_card} ; History:{self.event_history};"
\ No newline at end of file
+        # from the least to the most likely to change, so the backend can reuse the start of the previous prompt
+        return f"Story type:{self.story_type}; Self({self.character_name}): {self.character_card}; Asker({self.asker_name}): {self.asker_card} ; Story context:{self.story_context}; Location:{self.location.name}, {self.location.description}; History:{self.event_history};"
\ No newline at end of file
@@ -2,31 +2,40 @@ import json
 import os
 import random
 import shutil
-from typing import List
-from tale import parse_utils
+from typing import Dict, Iterable, List, Optional, Tuple
+from tale import parse_utils, util
 from tale.base import Item, Living, Location
-from tale.coord import Coord
+from tale.coord import DIRECTION_OFFSETS
 from tale.day_cycle.day_cycle import DayCycle
 from tale.day_cycle.llm_day_cycle_listener import LlmDayCycleListener
 from tale.item_spawner import ItemSpawner
 from tale.llm.LivingNpc import LivingNpc
+from tale.llm.world_shards import WorldShards
 from tale.quest import Quest, QuestType
 from tale.mob_spawner import MobSpawner
 from tale.random_event import RandomEvent
+from tale.spatial import SpatialIndex
 from tale.story import GameMode, StoryBase
 
 from tale.story_context import StoryContext
-from tale.zone import Zone
+from tale.zone import LocationIndex, Zone
 import tale.llm.llm_cache as llm_cache
 
+AUTOSAVE_ZONES = 4   # the most zones an autosave writes, the others are written by the next ones
+
 class DynamicStory(StoryBase):
 
 
 
     def __init__(self) -> None:
         self._zones = dict() # type: dict[str, Zone]
+        self._location_index = LocationIndex()
         self._world = WorldInfo()
         self._catalogue = Catalogue()
+        self._shards = WorldShards()
+        self._unloaded_zones = dict() # type: dict[str, str] # zones that are on disk but not loaded, and their files
+        self._unloaded_locations = dict() # type: dict[str, tuple] # location name -> (zone name, coordinates), for the unloaded zones
+        self._unloaded_grid = dict() # type: dict[tuple, str] # coordinates -> zone name, for the unloaded zones
         if isinstance(self.config.context, str):
             self.config.context = StoryContext(self.config.context)
 
@@ -43,33 +52,50 @@ class DynamicStory(StoryBase):
         if isinstance(self.config.context, StoryContext):
             driver.register_periodicals(self.config.context)
 
+        if self.config.autosave_interval > 0:
+            interval = self.config.autosave_interval
+            driver.defer((interval, interval, interval), self.autosave)
+
     def get_zone(self, name: str) -> Zone:
         """ Find a zone by name."""
+        if name in self._unloaded_zones:
+            self.load_zone(name)
         return self._zones[name]
-    
+
+    def load_zone(self, name: str) -> Zone:
+        """ Load a zone that is on disk but wasn't loaded yet. Only stories that load their zones on demand
+        (see JsonStory) have zones on disk, so here the zone is already loaded. KeyError if there's no such zone."""
+        return self._zones[name]
+
     def add_zone(self, zone: Zone) -> bool:
-        if zone.name in self._zones:
+        if zone.name in self._zones or zone.name in self._unloaded_zones:
             return False
         self._zones[zone.name] = zone
+        self._location_index.add_zone(zone)
         return True
     
     def get_location(self, zone: str, name: str) -> Location:
         """ Find a location by name in a zone."""
-        return self._zones[zone].get_location(name)
+        return self.get_zone(zone).get_location(name)
     
     def find_location(self, name: str) -> Location:
         """ Find a location by name in any zone."""
-        for zone in self._zones.values():
-            location = zone.get_location(name)
-            if location:
-                return location
+        return self._lookup_location(name)[0]
     
     def find_zone(self, location: str) -> Zone:
         """ Find a zone by location name."""
-        for zone in self._zones.values():
-            if zone.get_location(location):
-                return zone
-        return None
+        return self._lookup_location(location)[1]
+
+    def _lookup_location(self, name: str) -> tuple:
+        found = self._location_index.get(name)
+        if found[0] is None and name in self._unloaded_locations:
+            self.load_zone(self._unloaded_locations[name][0])
+            found = self._location_index.get(name)
+        return found
+
+    def rebuild_location_index(self) -> None:
+        """ Rebuild the location lookup index from the zones."""
+        self._location_index.rebuild()
     
     def add_location(self, location: Location, zone: str = '', add_to_grid: bool = True) -> bool:
         """ Add a location to the story. 
@@ -80,21 +106,21 @@ class DynamicStory(StoryBase):
         if add_to_grid:
             self._world._grid[coord.as_tuple()] = location
         if zone:
-            return self._zones[zone].add_location(location)
+            return self.get_zone(zone).add_location(location)
         for zone in self._zones:
             return self._zones[zone].add_location(location)
 
     def races_for_zone(self, zone: str) -> List[str]:
-        return self._zones[zone].races
+        return self.get_zone(zone).races
    
     def items_for_zone(self, zone: str) -> List[str]:
-        return self._zones[zone].items
+        return self.get_zone(zone).items
 
     def zone_info(self, zone_name: str = '', location: str = '') -> dict:
         if not zone_name and location:
             zone = self.find_zone(location)
         else:
-            zone = self._zones[zone_name]
+            zone = self.get_zone(zone_name)
         return zone.get_info()
 
     def get_npc(self, npc: str) -> Living:
@@ -109,7 +135,7 @@ class DynamicStory(StoryBase):
         return self._world
     
     @property
-    def grid(self) -> dict:
+    def grid(self) -> SpatialIndex:
         return self._world._grid
     
     @property
@@ -119,27 +145,56 @@ class DynamicStory(StoryBase):
     def neighbors_for_location(self, location: Location) -> dict:
         """ Return a dict of neighboring locations for a given location."""
         neighbors = dict() # type: dict[str, Location]
-        for dir in ['north', 'east', 'south', 'west', 'up', 'down']:
-            dir_coord = parse_utils.coordinates_from_direction(location.world_location, dir)
-            coord = location.world_location.add(dir_coord)
-            neighbors[dir] = self._world._grid.get(coord.as_tuple(), None)
+        x, y, z = location.world_location
+        grid = self._world._grid
+        for dir, (dx, dy, dz) in DIRECTION_OFFSETS:
+            coord = (x + dx, y + dy, z + dz)
+            if coord not in grid and coord in self._unloaded_grid:
+                self.load_zone(self._unloaded_grid[coord])
+            neighbors[dir] = grid.get(coord, None)
         return neighbors
+
+    def locations_within(self, coord: tuple, radius: int) -> List[Tuple[tuple, Location]]:
+        """ The locations at most radius away from the coordinates, nearest first (see SpatialIndex.within).
+        Unloaded zones with locations in that range are loaded first."""
+        grid = self._world._grid
+        if self._unloaded_grid:
+            x, y, z = coord
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius + abs(dx), radius - abs(dx) + 1):
+                    for dz in range(-radius + abs(dx) + abs(dy), radius - abs(dx) - abs(dy) + 1):
+                        cell = (x + dx, y + dy, z + dz)
+                        if cell not in grid and cell in self._unloaded_grid:
+                            self.load_zone(self._unloaded_grid[cell])
+        return grid.within(coord, radius)
+
+    def zones_for(self, coords: Iterable[tuple]) -> Dict[tuple, Optional[Zone]]:
+        """ The zone of each of the coordinates: the zone of the location there, or else the first zone
+        that covers it (see Zone.contains). None for coordinates outside of every zone."""
+        grid = self._world._grid
+        zones = dict() # type: Dict[tuple, Optional[Zone]]
+        for coord in coords:
+            location = grid.get(coord)
+            zone = self._location_index.get(location.name)[1] if location else None
+            if zone is None:
+                zone = next((zone for zone in self._zones.values() if zone.contains(coord)), None)
+            zones[coord] = zone
+        return zones
     
     def save(self, save_name: str = '') -> None:
-        """ Save the story to disk."""
-        story = self.to_json()
-        
+        """ Save the story to disk. Only the parts of the world that changed since the last save are written,
+        unless it's saved under a new name."""
         save_path = os.path.join(os.getcwd(), '../', save_name) if save_name else './'
         if not os.path.exists(save_path):
             os.mkdir(save_path)
-        with open(os.path.join(save_path, 'world.json'), "w") as fp:
-            json.dump(story , fp, indent=4)
-
-        with open(os.path.join(save_path, 'story_config.json'), "w") as fp:
-            json.dump(parse_utils.save_story_config(self.config), fp, indent=4)
+        self._shards.save(self, save_path)
+        self._shards.write_file(os.path.join(save_path, 'story_config.json'), parse_utils.save_story_config(self.config))
 
-        with open(os.path.join(save_path, 'llm_cache.json'), "w") as fp:
-            json.dump(llm_cache.json_dump(), fp, indent=4)
+        if llm_cache.has_store():
+            llm_cache.flush(save_path)
+        else:
+            with open(os.path.join(save_path, 'llm_cache.json'), "w") as fp:
+                json.dump(llm_cache.json_dump(), fp)
 
         if save_name:
             resource_path = os.path.join(save_path, 'resources')
@@ -149,6 +204,14 @@ class DynamicStory(StoryBase):
             if os.path.exists(os.path.join(os.getcwd(), 'resources')):
                 shutil.copytree(os.path.join(os.getcwd(), 'resources'), resource_path, dirs_exist_ok=True)
 
+    def autosave(self, ctx: util.Context) -> None:
+        """ Periodic save of the world. Writes a few of the changed zones each time, so it takes about
+        the same time however big the world is."""
+        self._shards.save(self, './', max_zones=AUTOSAVE_ZONES)
+        self._shards.write_file('story_config.json', parse_utils.save_story_config(self.config))
+        if llm_cache.has_store():
+            llm_cache.flush('./')
+
     def to_json(self) -> dict:
         story = dict()
         story["story"] = dict()
@@ -161,7 +224,6 @@ class DynamicStory(StoryBase):
             story["zones"][zone.name] = zone.get_info()
             story["zones"][zone.name]["name"] = zone.name
             story["zones"][zone.name]["locations"] = parse_utils.save_locations(zone.locations.values())
-        print(story)
         return story
 
     
@@ -200,7 +262,7 @@ class WorldInfo():
         self._items = dict() # type: dict[str, Item]
         self._npcs  = dict() # type: dict[str, Living]
         self._locations = dict() # type: dict[str, Location]
-        self._grid = dict() # type: dict[Coord, Location]
+        self._grid = SpatialIndex() # type: SpatialIndex # coordinate tuples -> locations
         self._mob_spawners = [] # type: list[MobSpawner]
         self._item_spawners = [] # type: list[ItemSpawner]
 
@@ -0,0 +1,75 @@
+""" Batches the idle action planning of LLM npcs.
+The npcs that want new idle actions during a server tick are collected, and at the
+end of the tick all their requests are queued at once, so they run concurrently on
+the LLM scheduler instead of one after another. An npc that is still waiting for its
+actions is not queued again. """
+
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict
+
+from tale import pubsub
+
+if TYPE_CHECKING:
+    from tale.llm.LivingNpc import LivingNpc
+
+
+class IdleActionBatch():
+
+    def __init__(self) -> None:
+        self._queued = dict()   # type: Dict[int, LivingNpc] # npcs waiting for the end of the tick
+        self._waiting = dict()  # type: Dict[int, LivingNpc] # npcs with a request in flight
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+    def add(self, npc: 'LivingNpc') -> bool:
+        """ Queue the npc for idle action planning. Returns False if it's already queued or waiting."""
+        key = id(npc)
+        if key in self._queued or key in self._waiting:
+            return False
+        if not self._queued:
+            # flush when the driver runs the pending actions, after all deferreds of this tick
+            pubsub.topic("driver-pending-actions").send(self.flush)
+        self._queued[key] = npc
+        return True
+
+    def flush(self) -> int:
+        """ Send the requests of all queued npcs. Returns the number of requests sent."""
+        npcs, self._queued = self._queued, dict()
+        sent = 0
+        for key, npc in npcs.items():
+            self._waiting[key] = npc
+            try:
+                future = npc._plan_idle_actions(callback=lambda actions, npc=npc: self._planned(npc, actions))
+            except Exception as exc:
+                # don't keep the npc waiting for a request that was never sent, and don't drop the others
+                self._waiting.pop(key, None)
+                print(f'Failed to plan idle actions for {npc}: {exc}')
+                continue
+            sent += 1
+            if isinstance(future, Future):
+                future.add_done_callback(lambda done, key=key: self._failed(done, key))
+            else:
+                # planned right away, nothing to wait for
+                self._waiting.pop(key, None)
+        if sent:
+            self.batches += 1
+            self.requests += sent
+            self.largest_batch = max(self.largest_batch, sent)
+        return sent
+
+    def stats(self) -> dict:
+        return dict(queued=len(self._queued),
+                    waiting=len(self._waiting),
+                    batches=self.batches,
+                    requests=self.requests,
+                    largest_batch=self.largest_batch)
+
+    def _planned(self, npc: 'LivingNpc', actions: list) -> None:
+        self._waiting.pop(id(npc), None)
+        npc._idle_actions_planned(actions)
+
+    def _failed(self, future: Future, key: int) -> None:
+        # a failed request never calls back, so stop waiting for it here
+        if future.cancelled() or future.exception():
+            self._waiting.pop(key, None)
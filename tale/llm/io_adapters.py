@@ -1,15 +1,104 @@
 
 from abc import ABC, abstractmethod
 import asyncio
+import codecs
 import json
+import threading
 import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple
 
 import aiohttp
-import requests
 
+from tale.connection_pool import get_pool
 from tale.errors import LlmResponseException
 from tale.player import PlayerConnection
 
+_event_loop = None # type: asyncio.AbstractEventLoop
+_event_loop_lock = threading.Lock()
+
+def run_coroutine(coroutine) -> any:
+    """ Run a coroutine on a shared, long lived event loop and wait for the result.
+    Avoids setting up a new event loop (asyncio.run) for every request. """
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None or _event_loop.is_closed():
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name="llm-io-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop).result()
+
+def is_event_stream(response: aiohttp.ClientResponse) -> bool:
+    return response.headers.get('Content-Type', '').startswith('text/event-stream')
+
+async def iter_sse_data(response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """ Yield the data of each server sent event in the response, as soon as it arrives.
+    Lines (and multibyte characters) split over several chunks are put back together. """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    async for chunk in response.content.iter_any():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if line.startswith('data:'):
+                yield line[5:].strip()
+    buffer += decoder.decode(b'', final=True)
+    if buffer.startswith('data:'):
+        yield buffer[5:].strip()
+
+
+class SlotAffinity():
+    """ Pins conversations to the slots of a llama.cpp server, so a slot keeps the KV cache of
+    one conversation and only the new tokens are evaluated when it continues.
+    When all slots are taken, the conversation that was continued least recently loses its slot."""
+
+    def __init__(self, slots: int) -> None:
+        self.slots = slots
+        self._assigned = OrderedDict()  # type: OrderedDict[str, int]
+        self._lock = threading.Lock()
+
+    def slot(self, key: str) -> int:
+        with self._lock:
+            slot = self._assigned.pop(key, None)
+            if slot is None:
+                if len(self._assigned) < self.slots:
+                    slot = len(self._assigned)
+                else:
+                    _, slot = self._assigned.popitem(last=False)
+            self._assigned[key] = slot
+            return slot
+
+
+class PromptCacheStats():
+    """ Counts the prompt tokens that the backend didn't have to evaluate, per request type.
+    Uses the 'usage' and 'timings' that llama.cpp adds to its responses."""
+
+    def __init__(self) -> None:
+        self.requests = {}  # type: Dict[str, Dict[str, int]]
+        self._lock = threading.Lock()
+
+    def record(self, request_type: str, result: str) -> Optional[int]:
+        """ Returns the prompt tokens saved by the request, None if the response doesn't tell."""
+        try:
+            response = json.loads(result)
+            prompt_tokens = response['usage']['prompt_tokens']
+            timings = response['timings']
+            saved = timings['cache_n'] if 'cache_n' in timings else prompt_tokens - timings['prompt_n']
+        except (ValueError, KeyError, TypeError):
+            return None
+        with self._lock:
+            stats = self.requests.setdefault(request_type, dict(requests=0, prompt_tokens=0, saved_tokens=0))
+            stats['requests'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['saved_tokens'] += saved
+        print(f'Prompt cache: {request_type} saved {saved} of {prompt_tokens} prompt tokens')
+        return saved
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(requests=sum(stats['requests'] for stats in self.requests.values()),
+                        prompt_tokens=sum(stats['prompt_tokens'] for stats in self.requests.values()),
+                        saved_tokens=sum(stats['saved_tokens'] for stats in self.requests.values()))
+
 
 class AbstractIoAdapter(ABC):
 
@@ -34,7 +123,8 @@ class AbstractIoAdapter(ABC):
         pass
     
     @abstractmethod
-    def set_prompt(self, request_body: dict, prompt: str, context: str = '') -> dict:
+    def set_prompt(self, request_body: dict, prompt: str, context: str = '', slot_key: str = '') -> dict:
+        """ Put the prompt in the request body. Requests with the same slot_key continue the same conversation."""
         pass
 
 class KoboldCppAdapter(AbstractIoAdapter):
@@ -45,32 +135,47 @@ class KoboldCppAdapter(AbstractIoAdapter):
         self.place_context_in_memory = False
 
     def stream_request(self, headers: dict, request_body: dict, io: PlayerConnection = None, wait: bool = False) -> str:
-        result = asyncio.run(self._do_stream_request(self.url + self.stream_endpoint, headers, request_body))
-
+        success, text = run_coroutine(self._do_stream_request(self.url + self.stream_endpoint, headers, request_body, io=None if wait else io))
+        if not success:
+            return ''
+        if text is not None:
+            return text
         try:
-            if result:
-                return self._do_process_result(self.url + self.data_endpoint, io, wait)
+            # the backend doesn't stream events, so fetch the text as it is generated
+            return self._do_process_result(self.url + self.data_endpoint, io, wait)
         except LlmResponseException as exc:
             print("Error parsing response from backend - ", exc)
         return ''
 
-    async def _do_stream_request(self, url: str, headers: dict, request_body: dict,) -> bool:
-        """ Send request to stream endpoint async to not block the main thread"""
-        async with aiohttp.ClientSession() as session:
-            session.headers.update(headers)
-            async with session.post(url, data=json.dumps(request_body)) as response:
-                if response.status == 200:
-                    return True
-                else:
-                    print("Error occurred:", response.status)
+    async def _do_stream_request(self, url: str, headers: dict, request_body: dict, io: PlayerConnection = None) -> Tuple[bool, Optional[str]]:
+        """ Send request to stream endpoint async to not block the main thread.
+        Tokens are passed on to io as they arrive. Returns whether the request succeeded, and the
+        generated text, which is None if the response is not a stream of server sent events."""
+        pool = get_pool()
+        pool.count_async_request(url)
+        async with pool.async_session().post(url, headers=headers, data=json.dumps(request_body)) as response:
+            if response.status != 200:
+                print("Error occurred:", response.status)
+                return False, None
+            if not is_event_stream(response):
+                return True, None
+            text = ''
+            async for data in iter_sse_data(response):
+                token = json.loads(data).get('token', '')
+                if token:
+                    if io:
+                        io.output_no_newline(token, new_paragraph=False)
+                    text += token
+            return True, text
 
     def _do_process_result(self, url, io: PlayerConnection, wait: bool = False) -> str:
-        """ Process the result from the stream endpoint """
+        """ Poll the data endpoint for the text generated so far.
+        Only used when the backend doesn't support server sent events. """
         tries = 0
         old_text = ''
         while tries < 4:
             time.sleep(0.25)
-            data = requests.post(url)
+            data = get_pool().post(url)
             
             text = json.loads(data.text)['results'][0]['text']
 
@@ -87,7 +192,7 @@ class KoboldCppAdapter(AbstractIoAdapter):
         """ Parse the result from the stream endpoint """
         return json.loads(result)['results'][0]['text']
     
-    def set_prompt(self, request_body: dict, prompt: str, context: str = '') -> dict:
+    def set_prompt(self, request_body: dict, prompt: str, context: str = '', slot_key: str = '') -> dict:
         if self.system_start_prompt:
             prompt = self.system_start_prompt + prompt
         prompt = prompt.replace('[USER_START]', self.user_start_prompt)
@@ -104,39 +209,33 @@ class KoboldCppAdapter(AbstractIoAdapter):
     
 class LlamaCppAdapter(AbstractIoAdapter):
 
+    def __init__(self, url: str, stream_endpoint: str, user_start_prompt: str = '', user_end_prompt: str = '', system_start_prompt: str = '', prompt_end: str = '',
+                 cache_prompt: bool = False, slots: int = 0):
+        super().__init__(url, stream_endpoint, user_start_prompt, user_end_prompt, system_start_prompt, prompt_end)
+        self.cache_prompt = cache_prompt    # let the server reuse the KV cache of the common prompt prefix
+        self.slot_affinity = SlotAffinity(slots) if slots > 0 else None
+
     def stream_request(self, headers: dict, request_body: dict, io: PlayerConnection = None, wait: bool = False) -> str:
-        return asyncio.run(self._do_stream_request(self.url + self.stream_endpoint, headers, request_body, io = io))
+        return run_coroutine(self._do_stream_request(self.url + self.stream_endpoint, headers, request_body, io = io))
 
     async def _do_stream_request(self, url: str, headers: dict, request_body: dict, io: PlayerConnection) -> str:
         """ Send request to stream endpoint async to not block the main thread"""
         request_body['stream'] = True
         text = ''
-        async with aiohttp.ClientSession() as session:
-            session.headers.update(headers)
-            async with session.post(url, data=json.dumps(request_body)) as response:
-                if response.status != 200:
-                    print("Error occurred:", response.status)
-                    return False
-                async for chunk in response.content.iter_any():
-                    decoded = chunk.decode('utf-8')
-                    lines = decoded.split('\n')
-                    for line in lines:
-                        # Ignore empty lines
-                        if not line.strip():
-                            continue
-                        key, value = line.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        if key == 'data':
-                            data = json.loads(value)
-                            choice = data['choices'][0]['delta']
-                            content = choice.get('content', None)
-                            
-                            if content:
-                                io.output_no_newline(content, new_paragraph=False)
-                                text += content
-                    while len(lines) == 0:
-                        await asyncio.sleep(0.15)
+        pool = get_pool()
+        pool.count_async_request(url)
+        async with pool.async_session().post(url, headers=headers, data=json.dumps(request_body)) as response:
+            if response.status != 200:
+                print("Error occurred:", response.status)
+                return False
+            async for data in iter_sse_data(response):
+                if data == '[DONE]':
+                    break
+                choice = json.loads(data)['choices'][0]['delta']
+                content = choice.get('content', None)
+                if content:
+                    io.output_no_newline(content, new_paragraph=False)
+                    text += content
         return text
             
     def parse_result(self, result: str) -> str:
@@ -146,11 +245,15 @@ class LlamaCppAdapter(AbstractIoAdapter):
         except:
             raise LlmResponseException("Error parsing result from backend")
    
-    def set_prompt(self, request_body: dict, prompt: str, context: str = '') -> dict:
+    def set_prompt(self, request_body: dict, prompt: str, context: str = '', slot_key: str = '') -> dict:
         if self.system_start_prompt:
             prompt = self.system_start_prompt + prompt
         prompt = prompt.replace('[USER_START]', self.user_start_prompt)
         prompt = prompt + self.user_end_prompt
+        if self.cache_prompt:
+            request_body['cache_prompt'] = True
+            if self.slot_affinity and slot_key:
+                request_body['id_slot'] = self.slot_affinity.slot(slot_key)
         if context:
             prompt = prompt.replace('<context>{context}</context>', f'<context>{context}</context>')
             #request_body['messages'][0]['content'] = f'<context>{context}</context>'
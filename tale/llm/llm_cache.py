@@ -1,24 +1,231 @@
-""" This file stores various caches for LLM related things. """
+""" This file stores various caches for LLM related things.
+
+The caches are bounded in memory (LRU, with an optional size budget and a
+time to live per kind), and can be backed by an sqlite store on disk.
+With a store attached, new entries are written to disk as they are added,
+and entries evicted from memory are read back from disk on demand. """
 
 import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from tale.llm import llm_config
+
+STORE_FILE = 'llm_cache.db'
+
+
+class SqliteCacheStore():
+    """ Disk backed store for the caches. Entries are inserted one by one,
+    so saving never has to rewrite the whole cache. """
+
+    def __init__(self, path: str, commit_interval: int = 100) -> None:
+        self.path = path
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS cache "
+                                 "(kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, "
+                                 "PRIMARY KEY (kind, key))")
+        self._connection.commit()
+
+    def get(self, kind: str, key: int) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._connection.execute("SELECT value, created FROM cache WHERE kind=? AND key=?", (kind, str(key))).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, kind: str, key: int, value: str, created: float) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR IGNORE INTO cache (kind, key, value, created) VALUES (?, ?, ?, ?)",
+                                     (kind, str(key), value, created))
+            self._pending += 1
+            if self._pending >= self.commit_interval:
+                self._commit()
+
+    def delete(self, kind: str, key: int) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM cache WHERE kind=? AND key=?", (kind, str(key)))
+            self._pending += 1
+
+    def items(self, kind: str) -> Iterator[Tuple[int, str, float]]:
+        with self._lock:
+            rows = self._connection.execute("SELECT key, value, created FROM cache WHERE kind=?", (kind,)).fetchall()
+        for key, value, created in rows:
+            yield int(key), value, created
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache WHERE kind=?", (kind,)).fetchone()[0]
+
+    def commit(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        self._connection.commit()
+        self._pending = 0
+
+    def backup(self, path: str) -> None:
+        """ Copy the store to another file, eg. when saving the story under a new name. """
+        self.commit()
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._connection.backup(target)
+        finally:
+            target.close()
+
+    def close(self) -> None:
+        self.commit()
+        with self._lock:
+            self._connection.close()
+
+
+class CacheRegion():
+    """ Bounded in-memory cache for one kind of text (events, looks).
+    Least recently used entries are evicted when max_entries or max_bytes is exceeded,
+    and entries older than ttl seconds are dropped. A limit of 0 means unbounded.
+    With keep_unstored, entries are only evicted when the store can give them back,
+    for texts that can't be made again (npc memories). """
+
+    def __init__(self, kind: str, max_entries: int = 0, max_bytes: int = 0, ttl: float = 0, store: SqliteCacheStore = None,
+                 keep_unstored: bool = False) -> None:
+        self.kind = kind
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self.keep_unstored = keep_unstored
+        self._entries = OrderedDict()  # type: OrderedDict[int, Tuple[str, float]]
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: int, default: str = None) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.store:
+                entry = self.store.get(self.kind, key)
+                if entry is not None:
+                    self._insert(key, entry[0], entry[1])
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[1]):
+                self._remove(key)
+                if self.store:
+                    self.store.delete(self.kind, key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
 
-event_cache = {}
-look_cache = {}
+    def put(self, key: int, value: str, created: float = 0) -> None:
+        """ Adds an entry, unless one already exists for the key. """
+        with self._lock:
+            if key in self._entries:
+                return
+            created = created or time.time()
+            self._insert(key, value, created)
+            if self.store:
+                self.store.put(self.kind, key, value, created)
+
+    def __contains__(self, key: int) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.store:
+                entry = self.store.get(self.kind, key)
+            return entry is not None and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def values(self) -> list:
+        """ Values currently held in memory. """
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def clear(self) -> None:
+        """ Clears the entries held in memory. The store (if any) is left untouched. """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def to_json(self) -> dict:
+        with self._lock:
+            if self.store:
+                entries = {key: (value, created) for key, value, created in self.store.items(self.kind)}
+            else:
+                entries = dict(self._entries)
+        return {str(key): value for key, (value, created) in entries.items() if not self._expired(created)}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return dict(entries=len(self._entries),
+                    stored=self.store.count(self.kind) if self.store else len(self._entries),
+                    bytes=self._bytes,
+                    hits=self.hits,
+                    misses=self.misses,
+                    hit_ratio=self.hits / total if total else 0.0,
+                    evictions=self.evictions,
+                    expirations=self.expirations)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _insert(self, key: int, value: str, created: float) -> None:
+        self._entries[key] = (value, created)
+        self._bytes += len(value.encode('utf-8'))
+        if self.keep_unstored and not self.store:
+            return
+        while self._entries and ((self.max_entries and len(self._entries) > self.max_entries) or
+                                 (self.max_bytes and self._bytes > self.max_bytes)):
+            oldest = next(iter(self._entries))
+            if oldest == key:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: int) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value.encode('utf-8'))
+
+
+def _region_from_config(kind: str, config: dict, ttl_key: str, keep_unstored: bool = False) -> CacheRegion:
+    return CacheRegion(kind,
+                       max_entries=config.get('MAX_ENTRIES', 0),
+                       max_bytes=config.get('MAX_BYTES', 0),
+                       ttl=config.get(ttl_key, 0),
+                       keep_unstored=keep_unstored)
+
+
+cache_config = llm_config.params.get('LLM_CACHE', None) or {}  # type: dict
+event_cache = _region_from_config('events', cache_config, 'EVENT_TTL', keep_unstored=True)  # npc memories, evicted only with a store
+look_cache = _region_from_config('looks', cache_config, 'LOOK_TTL')
+_store = None  # type: SqliteCacheStore
 
 def generate_hash(item: str) -> int:
     """ Generates a hash for an item. """
     return int(hashlib.md5(item.encode('utf-8')).hexdigest(), 16)
 
 def cache_event(event: str, event_hash: int = -1) -> int:
-    """ Adds an event to the cache. 
+    """ Adds an event to the cache.
     Generates a hash if none supplied"""
     if not isinstance(event, str):
         print('cache_event received non-string look: ' + str(event) + ' of type ' + str(type(event)) + '. Converting to string.')
         event = str(event)
     if event_hash == -1:
         event_hash = generate_hash(event)
-    if event_cache.get(event_hash) == None:
-        event_cache[event_hash] = event
+    event_cache.put(event_hash, event)
     return event_hash
 
 def get_events(event_hashes: list[int]) -> str:
@@ -26,29 +233,62 @@ def get_events(event_hashes: list[int]) -> str:
     return "<break>".join([event_cache.get(event_hash, '') for event_hash in event_hashes])
 
 def cache_look(look: str, look_hash: int = -1) -> int:
-    """ Adds an event to the cache. 
+    """ Adds an event to the cache.
     Generates a hash if none supplied"""
     if not isinstance(look, str):
         print('cache_look received non-string look: ' + str(look) + ' of type ' + str(type(look)) + '. Converting to string.')
         look = str(look)
     if look_hash == -1:
         look_hash = generate_hash(look)
-    if look_cache.get(look_hash) == None:
-        look_cache[look_hash] = look
+    look_cache.put(look_hash, look)
     return look_hash
 
 def get_looks(look_hashes: list[int]) -> str:
     """ Gets an event from the cache. """
     return ", ".join([look_cache.get(look_hash, '') for look_hash in look_hashes])
 
+def open_store(directory: str) -> bool:
+    """ Attaches the disk store in the given directory, if enabled in the config.
+    Returns False if the caches are kept in memory only. """
+    global _store
+    if cache_config.get('STORE', '') != 'sqlite':
+        return False
+    close_store()
+    _store = SqliteCacheStore(os.path.join(directory, STORE_FILE))
+    event_cache.store = _store
+    look_cache.store = _store
+    return True
+
+def close_store() -> None:
+    global _store
+    if _store:
+        _store.close()
+    _store = None
+    event_cache.store = None
+    look_cache.store = None
+
+def has_store() -> bool:
+    return _store is not None
+
+def flush(directory: str) -> None:
+    """ Commits pending writes to the disk store. If the directory differs
+    from where the store lives, the store is copied there. """
+    _store.commit()
+    path = os.path.join(directory, STORE_FILE)
+    if os.path.realpath(path) != os.path.realpath(_store.path):
+        _store.backup(path)
+
 def load(cache_file: dict):
-    global event_cache, look_cache, tell_cache
     """ Loads the caches from disk. """
-    event_cache = cache_file.get("events", {})
-    look_cache = cache_file.get("looks", {})
+    for region, entries in ((event_cache, cache_file.get("events", {})), (look_cache, cache_file.get("looks", {}))):
+        region.clear()
+        for key, value in entries.items():
+            region.put(int(key), value)
 
 def json_dump() -> dict:
     """ Saves the caches to disk. """
-    return {"events":event_cache, "looks":look_cache}
-
+    return {"events":event_cache.to_json(), "looks":look_cache.to_json()}
 
+def stats() -> Dict[str, dict]:
+    """ Hit, miss and eviction counts for the caches. """
+    return {"events":event_cache.stats(), "looks":look_cache.stats()}
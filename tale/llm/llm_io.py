@@ -1,12 +1,19 @@
-import requests
+from concurrent.futures import Future
+from typing import Callable
 import json
+import sys
+from tale.connection_pool import get_pool
 from tale.errors import LlmResponseException
-from tale.llm.io_adapters import KoboldCppAdapter, LlamaCppAdapter
+from tale.llm.io_adapters import KoboldCppAdapter, LlamaCppAdapter, PromptCacheStats
+from tale.llm.llm_scheduler import LlmScheduler, RequestPriority
+from tale.profiling import profiler
 
 class IoUtil():
     """ Handles connection and data retrieval from backend """
 
     def __init__(self, config: dict = None, backend_config: dict = None):
+        self.scheduler = LlmScheduler(max_workers=(config or {}).get('MAX_CONCURRENT_REQUESTS', 2))
+        self.prompt_cache_stats = None # type: PromptCacheStats
         if not config:
             # for tests
             return 
@@ -19,7 +26,10 @@ class IoUtil():
             headers['Authorization'] = f"Bearer {backend_config['OPENAI_API_KEY']}"
             self.openai_json_format = json.loads(backend_config['OPENAI_JSON_FORMAT'])
             self.headers = headers
-            self.io_adapter = LlamaCppAdapter(self.url, backend_config['STREAM_ENDPOINT'], config.get('USER_START', ''), config.get('USER_END', ''), config.get('SYSTEM_START', ''), config.get('PROMPT_END', ''))
+            self.io_adapter = LlamaCppAdapter(self.url, backend_config['STREAM_ENDPOINT'], config.get('USER_START', ''), config.get('USER_END', ''), config.get('SYSTEM_START', ''), config.get('PROMPT_END', ''),
+                                              cache_prompt=backend_config.get('CACHE_PROMPT', False), slots=backend_config.get('SLOTS', 0))
+            if backend_config.get('MEASURE_PROMPT_CACHE', False):
+                self.prompt_cache_stats = PromptCacheStats()
         else:
             if 'API_PASSWORD' in backend_config and backend_config['API_PASSWORD']:
                 headers['Authorization'] = f"Bearer {backend_config['API_PASSWORD']}"
@@ -29,27 +39,54 @@ class IoUtil():
         self.stream = backend_config['STREAM']
 
 
-    def synchronous_request(self, request_body: dict, prompt: str, context: str = '') -> str:
-        """ Send request to backend and return the result """
+    def synchronous_request(self, request_body: dict, prompt: str, context: str = '', request_type: str = '', slot_key: str = '') -> str:
+        """ Send request to backend and return the result.
+        The request type, by default the name of the calling method, is used for profiling.
+        Requests of the same type and slot_key (an npc, or npc and the one it talks to) are continuations
+        of the same conversation, which the backend can keep cached. """
+        request_type = request_type or _caller_name()
+        with profiler.timer('llm', request_type):
+            return self._synchronous_request(request_body, prompt, context, request_type, slot_key)
+
+    def _synchronous_request(self, request_body: dict, prompt: str, context: str = '', request_type: str = '', slot_key: str = '') -> str:
         if request_body.get('grammar_string', None) and 'openai' in self.url:
             # TODO: temp fix for openai
             request_body.pop('grammar_string')
             request_body['response_format'] = self.openai_json_format
-        request_body = self.io_adapter.set_prompt(request_body, prompt, context)
-        response = requests.post(self.url + self.endpoint, headers=self.headers, data=json.dumps(request_body))
+        request_body = self.io_adapter.set_prompt(request_body, prompt, context, slot_key=f'{request_type}:{slot_key}' if slot_key else '')
+        response = get_pool().post(self.url + self.endpoint, headers=self.headers, data=json.dumps(request_body))
         if response.status_code == 200:
+            if self.prompt_cache_stats:
+                self.prompt_cache_stats.record(request_type, response.text)
             return self.io_adapter.parse_result(response.text)
         return ''
     
+    def submit_request(self, request_body: dict, prompt: str, context: str = '',
+                       priority: RequestPriority = RequestPriority.BACKGROUND, callback: Callable[[str], None] = None, slot_key: str = '') -> Future:
+        """ Queue a request on the scheduler and return a future for the result.
+        Identical requests that are in flight are only sent once.
+        If a callback is supplied, it is called with the result in the server tick loop. """
+        key = (json.dumps(request_body, sort_keys=True), prompt, context)
+        request_type = _caller_name()
+        return self.scheduler.submit(lambda: self.synchronous_request(request_body, prompt=prompt, context=context, request_type=request_type, slot_key=slot_key),
+                                     priority=priority, key=key, callback=callback)
+
     def asynchronous_request(self, request_body: dict, prompt: str, context: str = '') -> str:
         if self.backend != 'kobold_cpp':
-            return self.synchronous_request(request_body=request_body, prompt=prompt, context=context)
-        return self.stream_request(request_body, wait=True, prompt=prompt, context=context)
+            return self.synchronous_request(request_body=request_body, prompt=prompt, context=context, request_type=_caller_name())
+        return self.stream_request(request_body, wait=True, prompt=prompt, context=context, request_type=_caller_name())
 
-    def stream_request(self, request_body: dict, prompt: str, context: str = '', io = None, wait: bool = False) -> str:
+    def stream_request(self, request_body: dict, prompt: str, context: str = '', io = None, wait: bool = False, request_type: str = '') -> str:
+        request_type = request_type or _caller_name()
         if self.io_adapter:
-            request_body = self.io_adapter.set_prompt(request_body, prompt, context)
-            return self.io_adapter.stream_request(self.headers, request_body, io, wait)
+            with profiler.timer('llm', request_type):
+                request_body = self.io_adapter.set_prompt(request_body, prompt, context)
+                return self.io_adapter.stream_request(self.headers, request_body, io, wait)
         # fall back if no io adapter
-        return self.synchronous_request(request_body=request_body, prompt=prompt, context=context)
+        return self.synchronous_request(request_body=request_body, prompt=prompt, context=context, request_type=request_type)
+
+
+def _caller_name() -> str:
+    """ Name of the function that called the IoUtil method, which is the kind of LLM request."""
+    return sys._getframe(2).f_code.co_name
 
@@ -0,0 +1,101 @@
+""" Runs LLM requests on a bounded pool of worker threads, so that slow
+requests don't block the driver. Requests are handled by priority, and
+identical requests that are already in flight share a single backend call.
+Results can be handed back to the server tick loop through the
+'driver-pending-actions' pubsub topic. """
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from tale import pubsub
+
+
+class RequestPriority(IntEnum):
+    DIALOGUE = 0    # a player is waiting for the response
+    WORLD = 1       # world building
+    BACKGROUND = 2  # npc idle actions and such
+
+
+class LlmScheduler():
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self.max_workers = max(1, max_workers)
+        self._queue = queue.PriorityQueue()  # type: queue.PriorityQueue[Tuple[int, int, Hashable, Callable[[], Any], Future]]
+        self._in_flight = {}  # type: Dict[Hashable, Future]
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._workers = []  # type: list[threading.Thread]
+        self.submitted = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def submit(self, task: Callable[[], Any], priority: RequestPriority = RequestPriority.BACKGROUND,
+               key: Hashable = None, callback: Callable[[Any], None] = None) -> Future:
+        """ Queue a task and return a future for its result.
+        If a task with the same key is already queued or running, its future is returned instead.
+        The callback (if any) is called with the result in the server tick loop. """
+        with self._lock:
+            future = self._in_flight.get(key) if key is not None else None
+            if future:
+                self.coalesced += 1
+            else:
+                future = Future()
+                if key is not None:
+                    self._in_flight[key] = future
+                self._queue.put((int(priority), next(self._counter), key, task, future))
+                self.submitted += 1
+                self._start_worker()
+        if callback:
+            future.add_done_callback(lambda done: self._deliver(done, callback))
+        return future
+
+    def in_worker(self) -> bool:
+        """ Is this called from one of the worker threads? A worker that waits for another task could wait forever. """
+        return threading.current_thread() in self._workers
+
+    def join(self) -> None:
+        """ Block until all queued tasks are done. """
+        self._queue.join()
+
+    def stats(self) -> dict:
+        return dict(workers=len(self._workers),
+                    queued=self._queue.qsize(),
+                    in_flight=len(self._in_flight),
+                    submitted=self.submitted,
+                    coalesced=self.coalesced,
+                    failed=self.failed)
+
+    def _start_worker(self) -> None:
+        # workers are started lazily, up to max_workers
+        if len(self._workers) < min(self.max_workers, self.submitted):
+            worker = threading.Thread(target=self._work, name="llm-worker-%d" % len(self._workers), daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self) -> None:
+        while True:
+            _, _, key, task, future = self._queue.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(task())
+                except Exception as x:
+                    self.failed += 1
+                    future.set_exception(x)
+            with self._lock:
+                if key is not None and self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            self._queue.task_done()
+
+    def _deliver(self, future: Future, callback: Callable[[Any], None]) -> None:
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception:
+            print("Error in LLM request:", exception)
+            return
+        result = future.result()
+        pubsub.topic("driver-pending-actions").send(lambda: callback(result))
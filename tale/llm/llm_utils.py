@@ -1,8 +1,9 @@
 from copy import deepcopy
+from concurrent.futures import Future
 import json
 import os
 import sys
-from typing import Any, Tuple
+from typing import Any, Callable, Tuple
 import yaml
 from tale.base import Location, MudObject
 from tale.image_gen.base_gen import ImageGeneratorBase
@@ -15,7 +16,10 @@ from tale.llm.contexts.EvokeContext import EvokeContext
 from tale.llm.contexts.FollowContext import FollowContext
 from tale.llm.contexts.WorldGenerationContext import WorldGenerationContext
 from tale.llm.dynamic_story import DynamicStory
+from tale.llm.idle_actions import IdleActionBatch
 from tale.llm.llm_io import IoUtil
+from tale.llm.llm_scheduler import RequestPriority
+from tale.llm.location_prebuilder import LocationPrebuilder
 from tale.llm.contexts.DialogueContext import DialogueContext
 from tale.llm.quest_building import QuestBuilding
 from tale.llm.responses.ActionResponse import ActionResponse
@@ -78,11 +82,15 @@ class LlmUtil():
                                              io_util=self.io_util,
                                              backend=self.backend,
                                              json_grammar_key=json_grammar_key)
+        self.idle_actions = IdleActionBatch()
+        self.location_prebuilder = LocationPrebuilder(self._world_building.request_location,
+                                                      max_pending=llm_config.params.get('PREBUILD_LOCATIONS', 0))
 
-    def evoke(self, message: str, short_len: bool=False, rolling_prompt: str = '', alt_prompt: str = '', extra_context: str = '', skip_history: bool = True):
+    def evoke(self, message: str, short_len: bool=False, rolling_prompt: str = '', alt_prompt: str = '', extra_context: str = '', skip_history: bool = True, text_hash: int = -1):
         """Evoke a response from LLM. Async if stream is True, otherwise synchronous.
         Update the rolling prompt with the latest message.
-        Will put generated text in lm_cache.look_hashes, and reuse it if same hash is generated."""
+        Will put generated text in lm_cache.look_hashes, and reuse it if same hash is generated.
+        The hash of the message can be passed in as text_hash if the caller already knows it."""
         output_template = 'Original:[<it><rev> {message}</>] <bright><rev>Generated:</>{text}'
 
         if not message or str(message) == "\n":
@@ -90,7 +98,7 @@ class LlmUtil():
 
         rolling_prompt = self.update_memory(rolling_prompt, message)
 
-        text_hash_value = llm_cache.generate_hash(message + extra_context)
+        text_hash_value = text_hash if text_hash != -1 else llm_cache.generate_hash(message + extra_context)
 
         cached_look = llm_cache.get_looks([text_hash_value])
         if cached_look:
@@ -165,13 +173,15 @@ class LlmUtil():
                                                             story_type=self.__story_type,
                                                             world_info=self.__world_info,
                                                             world_mood=self.__story.config.world_mood)
+        prebuilt_result = self.location_prebuilder.take(location, exit_location_name, zone) if zone else ''
         location_result, spawner = self._world_building.build_location(location, 
                                                     exit_location_name, 
                                                     zone_info,
                                                     context=world_generation_context,
                                                     world_creatures=world_creatures if world_creatures else self.__story.catalogue._creatures,
                                                     world_items=world_items if world_items else self.__story.catalogue._items,
-                                                    neighbors=neighbors)
+                                                    neighbors=neighbors,
+                                                    prebuilt_result=prebuilt_result)
         
         # Maybe generate a dungeon entrance if conditions are met
         if zone and zone_info.get('dungeon_config') and not zone.dungeon and location_result.exits:
@@ -214,8 +224,14 @@ class LlmUtil():
         return location_result, spawner
                     
      
-    def perform_idle_action(self, character_name: str, location: Location, character_card: CharacterCard, sentiments: dict = {}, last_action: str = '', event_history: str = '') -> list:
-        return self._character.perform_idle_action(character_name, location, self.__story_context, character_card, sentiments, last_action, event_history=event_history)
+    def prebuild_locations(self, location: Location) -> int:
+        """ Start building the unbuilt neighbors of the location in the background."""
+        if not self.__story:
+            return 0
+        return self.location_prebuilder.prebuild(location, self.__story, self._get_world_context())
+
+    def perform_idle_action(self, character_name: str, location: Location, character_card: CharacterCard, sentiments: dict = {}, last_action: str = '', event_history: str = '', callback: Callable[[list], None] = None) -> list:
+        return self._character.perform_idle_action(character_name, location, self.__story_context, character_card, sentiments, last_action, event_history=event_history, callback=callback)
     
     def perform_travel_action(self, character_name: str, location: Location, locations: list, directions: list, character_card: CharacterCard):
         return self._character.perform_travel_action(character_name, location, locations, directions, character_card)
@@ -291,6 +307,19 @@ class LlmUtil():
                                                                                                     depth=depth,
                                                                                                     max_depth=max_depth))
     
+    def request_dungeon_locations(self, zone_info: dict, locations: list, depth: int, max_depth: int) -> Future:
+        """ Queue generate_dungeon_locations on the LLM scheduler, so the rooms of a dungeon level can be described
+            in several requests at the same time. The future has the LocationDescriptionResponse."""
+        task = lambda: self.generate_dungeon_locations(zone_info=zone_info, locations=locations, depth=depth, max_depth=max_depth)
+        if self.io_util.scheduler.in_worker():
+            future = Future()
+            try:
+                future.set_result(task())
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        return self.io_util.scheduler.submit(task, priority=RequestPriority.WORLD)
+    
     def generate_dungeon_entrance(self, location: Location, dungeon_config: dict) -> dict:
         """Generate a dungeon entrance that fits the location and dungeon config."""
         return self._world_building.generate_dungeon_entrance(location=location,
@@ -321,7 +350,7 @@ class LlmUtil():
                 target.avatar = image_name + '.jpg'
             return result
 
-    def free_form_action(self, location: Location, character_name: str,  character_card: CharacterCard, event_history: str = '') -> list:
+    def free_form_action(self, location: Location, character_name: str,  character_card: CharacterCard, event_history: str = '', callback: Callable[[list], None] = None) -> list:
         action_context = ActionContext(story_context=self.__story_context,
                                        story_type=self.__story_type,
                                        character_name=character_name,
@@ -329,7 +358,7 @@ class LlmUtil():
                                        event_history=event_history,
                                        location=location,
                                        actions=llm_config.params['ACTION_LIST'])
-        return self._character.free_form_action(action_context)
+        return self._character.free_form_action(action_context, callback=callback)
 
     def request_follow(self, actor: MudObject, character_name: str, character_card: CharacterCard, event_history: str, location: Location, asker_reason: str):
         return self._character.request_follow(FollowContext(story_context=self.__story_context,
@@ -342,6 +371,9 @@ class LlmUtil():
                                         asker_card=actor.short_description,
                                         asker_reason=asker_reason))
     
+    def summarize_memory(self, character_name: str, summary: str, events: str, callback: Callable[[str], None]) -> Future:
+        return self._character.summarize_memory(character_name, summary, events, word_limit=self.word_limit, callback=callback)
+
     def describe_day_cycle_transition(self, player: PlayerConnection, from_time: str, to_time: str) -> str:
         prompt = self.pre_prompt
         location = player.player.location
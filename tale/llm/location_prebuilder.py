@@ -0,0 +1,111 @@
+""" Speculatively generates the unbuilt locations next to where a player is,
+so that the location is usually ready by the time the player walks into it.
+Only the LLM request runs in the background; the result is parsed and added
+to the world when the player actually enters the location. """
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+from tale.base import Location
+from tale.llm.contexts.WorldGenerationContext import WorldGenerationContext
+from tale.llm.dynamic_story import DynamicStory
+from tale.zone import Zone
+
+
+class PrebuiltLocation():
+
+    def __init__(self, zone_name: str, future: Future) -> None:
+        self.zone_name = zone_name
+        self.future = future
+
+
+class LocationPrebuilder():
+
+    def __init__(self, request_location: Callable[[Location, str, dict, WorldGenerationContext], Future], max_pending: int = 2) -> None:
+        """ request_location queues the LLM request for a location, see WorldBuilding.request_location.
+        max_pending is the budget: the most speculative builds that are kept (queued, running or done)."""
+        self.request_location = request_location
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # type: OrderedDict[Tuple[str, str], PrebuiltLocation] # (location, exit location) -> build
+        self.requested = 0
+        self.used = 0
+        self.wasted = 0
+        self.cancelled = 0
+
+    def prebuild(self, location: Location, story: DynamicStory, context: WorldGenerationContext) -> int:
+        """ Queue builds for the unbuilt neighbors of the location. Returns the number of builds queued.
+        The oldest builds are dropped when the budget is exceeded."""
+        if self.max_pending < 1:
+            return 0
+        zone = story.find_zone(location.name)
+        if not zone:
+            return 0
+        queued = 0
+        for target in self._unbuilt_neighbors(location, story)[:self.max_pending]:
+            key = (target.name, location.name)
+            if key in self._pending:
+                self._pending.move_to_end(key)
+                continue
+            target_zone = self._zone_for(zone, location, target)
+            if not target_zone:
+                continue
+            while len(self._pending) >= self.max_pending:
+                self._drop(self._pending.popitem(last=False)[1])
+            future = self.request_location(target, location.name, target_zone.get_info(), context)
+            self._pending[key] = PrebuiltLocation(target_zone.name, future)
+            self.requested += 1
+            queued += 1
+        return queued
+
+    def take(self, location: Location, exit_location_name: str, zone: Zone) -> str:
+        """ The result of the speculative build of the location, if there is one for entering it
+        from exit_location_name in the zone. Waits for the build if it's still running. """
+        prebuilt = self._pending.pop((location.name, exit_location_name), None)
+        if not prebuilt:
+            return ''
+        if prebuilt.zone_name != zone.name:
+            self._drop(prebuilt)
+            return ''
+        try:
+            result = prebuilt.future.result()
+        except Exception:
+            result = ''
+        if result:
+            self.used += 1
+        else:
+            self.wasted += 1
+        return result
+
+    def clear(self) -> None:
+        while self._pending:
+            self._drop(self._pending.popitem(last=False)[1])
+
+    def stats(self) -> dict:
+        return dict(pending=len(self._pending),
+                    requested=self.requested,
+                    used=self.used,
+                    wasted=self.wasted,
+                    cancelled=self.cancelled)
+
+    def _drop(self, prebuilt: PrebuiltLocation) -> None:
+        if prebuilt.future.cancel():
+            self.cancelled += 1
+        else:
+            self.wasted += 1
+
+    def _unbuilt_neighbors(self, location: Location, story: DynamicStory) -> List[Location]:
+        neighbors = [exit.target for exit in location.exits.values()]
+        neighbors.extend(neighbor for _, neighbor in story.locations_within(location.world_location.as_tuple(), 1))
+        unbuilt = OrderedDict()  # type: OrderedDict[str, Location]
+        for neighbor in neighbors:
+            if neighbor and not neighbor.built and neighbor.name not in unbuilt:
+                unbuilt[neighbor.name] = neighbor
+        return list(unbuilt.values())
+
+    def _zone_for(self, zone: Zone, location: Location, target: Location) -> Zone:
+        # same as get_neighbor_or_generate_zone, but a new zone is never generated speculatively
+        direction = target.world_location.subtract(location.world_location)
+        if zone.on_edge(location.world_location, direction):
+            return zone.get_neighbor(direction)
+        return zone
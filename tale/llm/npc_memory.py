@@ -0,0 +1,78 @@
+""" Keeps the event history that LLM npcs put in their prompts within a token budget.
+The most recent events are used verbatim, older events are folded into a
+summary by the LLM, so the prompt stays the same size however long the npc lives. """
+
+from concurrent.futures import Future
+from typing import Callable, List
+
+import tale.llm.llm_cache as llm_cache
+from tale.llm import llm_config
+
+_config = llm_config.params.get('NPC_MEMORY', None) or {}
+RECENT_EVENTS = _config.get('RECENT_EVENTS', 8)     # never folded into the summary
+SUMMARIZE_AFTER = _config.get('SUMMARIZE_AFTER', 16)    # older events that are summarized at a time
+TOKEN_BUDGETS = _config.get('TOKEN_BUDGETS', {})    # tokens of history per prompt type
+DEFAULT_TOKEN_BUDGET = TOKEN_BUDGETS.get('default', 512)
+
+
+def estimate_tokens(text: str) -> int:
+    """ Rough token count, about four characters per token for english text with llama style tokenizers."""
+    return (len(text) + 3) // 4
+
+
+class NpcMemory():
+
+    def __init__(self) -> None:
+        self.summary = ''   # type: str
+        self._summarizing = False
+
+    def history(self, events: List[int], prompt_type: str = 'default') -> str:
+        """ The event history for a prompt, newest events first in line for the budget.
+        The summary is put in front if it still fits. Events are separated by <break>."""
+        budget = TOKEN_BUDGETS.get(prompt_type, DEFAULT_TOKEN_BUDGET)
+        used = 0
+        recent = []  # type: List[str]
+        for event_hash in reversed(events):
+            event = llm_cache.event_cache.get(event_hash, '')
+            if not event:
+                continue
+            tokens = estimate_tokens(event) + 1
+            if recent and used + tokens > budget:
+                break
+            recent.append(event)
+            used += tokens
+        recent.reverse()
+        if self.summary and used + estimate_tokens(self.summary) <= budget:
+            recent.insert(0, 'Earlier: ' + self.summary)
+        return '<break>'.join(recent)
+
+    def needs_summary(self, events: List[int]) -> bool:
+        return not self._summarizing and len(events) - RECENT_EVENTS >= SUMMARIZE_AFTER
+
+    def summarize(self, events: List[int], request_summary: Callable[[str, str, Callable[[str], None]], Future],
+                  on_summarized: Callable[[int], None]) -> None:
+        """ Fold the events that are older than the recent window into the summary.
+        request_summary(summary, events, callback) queues the LLM request, and the callback receives the new summary.
+        When it arrives, on_summarized is called with the number of (oldest) events that were folded in."""
+        amount = len(events) - RECENT_EVENTS
+        if amount < 1 or self._summarizing:
+            return
+        older = llm_cache.get_events(events[:amount]).replace('<break>', '\n')
+
+        def summarized(summary: str) -> None:
+            self._summarizing = False
+            if summary:
+                self.summary = summary.strip()
+                on_summarized(amount)
+
+        self._summarizing = True
+        future = request_summary(self.summary, older, summarized)
+        if isinstance(future, Future):
+            future.add_done_callback(self._failed)
+        else:
+            self._summarizing = False
+
+    def _failed(self, future: Future) -> None:
+        # a failed request never calls back, so allow another one
+        if future.cancelled() or future.exception():
+            self._summarizing = False
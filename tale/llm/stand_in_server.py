@@ -0,0 +1,290 @@
+"""
+A stand-in for the LLM backends, so the game can be run and benchmarked without a live
+KoboldCpp, llama.cpp or OpenAI compatible server.
+
+It speaks the parts of their protocols that IoUtil and the io adapters use: the KoboldCpp
+generate, stream (server sent events) and check endpoints, and the chat completions
+endpoint, with or without streaming.
+
+Responses are replayed from a cassette, a JSONL file with one recorded request per line.
+In record mode, requests are passed on to a real backend and the answers are added to the cassette.
+Prompt and per token latency can be added to replayed answers, to model a backend of a certain speed.
+
+Run it with:  python -m tale.llm.stand_in_server --cassette session.jsonl [--record --upstream http://localhost:5001]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from tale.connection_pool import get_pool
+
+KOBOLD_GENERATE = "/api/v1/generate"
+KOBOLD_STREAM = "/api/extra/generate/stream"
+KOBOLD_CHECK = "/api/extra/generate/check"
+CHAT_COMPLETIONS = "/v1/chat/completions"
+DEFAULT_RESPONSE = "..."
+
+_token_pattern = re.compile(r"\s*\S+|\s+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """ Split the text in word sized tokens, the leading whitespace stays with the word."""
+    return _token_pattern.findall(text)
+
+
+def request_prompt(body: dict) -> str:
+    """ The prompt of a KoboldCpp or chat completions request body."""
+    if "messages" in body:
+        return "\n".join(str(message.get("content", "")) for message in body["messages"])
+    return body.get("memory", "") + body.get("prompt", "")
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded backend answers, keyed by the prompt. A prompt that was recorded several times
+    is answered with each of its recorded responses in turn.
+    """
+    def __init__(self, path: str = "") -> None:
+        self.path = path
+        self.responses = defaultdict(list)   # type: Dict[str, List[str]]
+        self._next = defaultdict(int)   # type: Dict[str, int]
+        self._lock = threading.Lock()
+        if path:
+            self.load(path)
+
+    def load(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    key = entry.get("key") or prompt_key(entry.get("prompt", ""))
+                    self.responses[key].append(entry["response"])
+        except FileNotFoundError:
+            pass    # nothing recorded yet
+
+    def lookup(self, prompt: str) -> Optional[str]:
+        key = prompt_key(prompt)
+        with self._lock:
+            responses = self.responses.get(key)
+            if not responses:
+                return None
+            index = self._next[key]
+            self._next[key] = (index + 1) % len(responses)
+            return responses[index]
+
+    def record(self, prompt: str, response: str, request_type: str = "") -> None:
+        key = prompt_key(prompt)
+        with self._lock:
+            self.responses[key].append(response)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(dict(key=key, type=request_type, prompt=prompt, response=response)) + "\n")
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self.responses.values())
+
+
+class StandInServer:
+    """
+    The stand-in backend. Replays answers from the cassette, or records them from the upstream backend.
+    Unknown prompts are answered with the default response when replaying.
+    """
+    def __init__(self, cassette: Cassette, *, record: bool = False, upstream: str = "",
+                 prompt_latency: float = 0.0, token_latency: float = 0.0, default_response: str = DEFAULT_RESPONSE) -> None:
+        if record and not upstream:
+            raise ValueError("recording needs the url of the upstream backend")
+        self.cassette = cassette
+        self.record = record
+        self.upstream = upstream.rstrip("/")
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.default_response = default_response
+        self.stats = dict(requests=0, replayed=0, recorded=0, missed=0)
+        self._last_text = ""
+        self._slots = {}    # type: Dict[int, List[str]]
+        self._lock = threading.Lock()
+        self._server = None     # type: Optional[ThreadingHTTPServer]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """ Serve in a background thread. Port 0 picks a free port. Returns the url of the server."""
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        threading.Thread(name="llm-stand-in", target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def serve_forever(self, host: str, port: int) -> None:
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def answer(self, path: str, body: dict, headers: dict) -> str:
+        """ The text the backend generates for the request."""
+        prompt = request_prompt(body)
+        with self._lock:
+            self.stats["requests"] += 1
+        text = None if self.record else self.cassette.lookup(prompt)
+        if text is not None:
+            self._count("replayed")
+        elif self.record:
+            text = self._ask_upstream(path, body, headers)
+            self.cassette.record(prompt, text, request_type="chat" if path == CHAT_COMPLETIONS else "kobold")
+            self._count("recorded")
+        else:
+            text = self.default_response
+            self._count("missed")
+        self._last_text = text
+        return text
+
+    def prompt_timings(self, body: dict) -> Tuple[int, int]:
+        """ Prompt tokens, and the tokens a llama.cpp server could take from the KV cache of the slot."""
+        tokens = split_tokens(request_prompt(body))
+        cached = 0
+        slot = body.get("id_slot", -1)
+        if body.get("cache_prompt") and slot >= 0:
+            with self._lock:
+                previous, self._slots[slot] = self._slots.get(slot, []), tokens
+            for cached, (token, previous_token) in enumerate(zip(tokens, previous), start=1):
+                if token != previous_token:
+                    cached -= 1
+                    break
+        return len(tokens), cached
+
+    def _count(self, what: str) -> None:
+        with self._lock:
+            self.stats[what] += 1
+
+    def _ask_upstream(self, path: str, body: dict, headers: dict) -> str:
+        if path == KOBOLD_STREAM:
+            path = KOBOLD_GENERATE
+        body = dict(body)
+        body.pop("stream", None)
+        upstream_headers = {"Content-Type": "application/json"}
+        if headers.get("Authorization"):
+            upstream_headers["Authorization"] = headers["Authorization"]
+        response = get_pool().post(self.upstream + path, headers=upstream_headers, data=json.dumps(body))
+        response.raise_for_status()
+        result = response.json()
+        if path == CHAT_COMPLETIONS:
+            return result["choices"][0]["message"]["content"]
+        return result["results"][0]["text"]
+
+
+def _handler_class(server: StandInServer) -> type:
+
+    class StandInRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:
+            pass    # no logging for every request
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                self._send_json({"error": "invalid json"}, status=400)
+                return
+            if self.path == KOBOLD_CHECK:
+                self._send_json({"results": [{"text": server._last_text}]})
+                return
+            if self.path not in (KOBOLD_GENERATE, KOBOLD_STREAM, CHAT_COMPLETIONS):
+                self._send_json({"error": "unknown endpoint"}, status=404)
+                return
+            try:
+                text = server.answer(self.path, body, dict(self.headers))
+            except Exception as x:
+                self._send_json({"error": str(x)}, status=502)
+                return
+            tokens = split_tokens(text)
+            time.sleep(server.prompt_latency)
+            if self.path == KOBOLD_STREAM:
+                self._stream(("event: message\ndata: %s\n\n" % json.dumps({"token": token}) for token in tokens))
+            elif self.path == CHAT_COMPLETIONS and body.get("stream"):
+                events = ("data: %s\n\n" % json.dumps({"choices": [{"delta": {"content": token}}]}) for token in tokens)
+                self._stream(events, end="data: [DONE]\n\n")
+            else:
+                time.sleep(server.token_latency * len(tokens))
+                if self.path == CHAT_COMPLETIONS:
+                    prompt_tokens, cached = server.prompt_timings(body)
+                    self._send_json({"choices": [{"message": {"role": "assistant", "content": text}}],
+                                     "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens)},
+                                     "timings": {"prompt_n": prompt_tokens - cached, "cache_n": cached, "predicted_n": len(tokens)}})
+                else:
+                    self._send_json({"results": [{"text": text}]})
+
+        def _send_json(self, data: dict, status: int = 200) -> None:
+            payload = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, events, end: str = "") -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for event in events:
+                self.wfile.write(event.encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(server.token_latency)
+            if end:
+                self.wfile.write(end.encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return StandInRequestHandler
+
+
+def run_from_cmdline(cmdline: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stand-in LLM backend that records and replays KoboldCpp, llama.cpp and OpenAI sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--cassette", default="", help="JSONL file to replay from, or to record to")
+    parser.add_argument("--record", action="store_true", help="pass requests on to the upstream backend and record the answers")
+    parser.add_argument("--upstream", default="", help="url of the real backend, when recording")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--default-response", default=DEFAULT_RESPONSE, help="answer to prompts that are not in the cassette")
+    args = parser.parse_args(cmdline)
+    cassette = Cassette(args.cassette)
+    server = StandInServer(cassette, record=args.record, upstream=args.upstream, prompt_latency=args.prompt_latency,
+                           token_latency=args.token_latency, default_response=args.default_response)
+    print("LLM stand-in on http://%s:%d, %s, %d recorded answers" %
+          (args.host, args.port, "recording" if args.record else "replaying", len(cassette)))
+    try:
+        server.serve_forever(args.host, args.port)
+    except KeyboardInterrupt:
+        print(server.stats)
+
+
+if __name__ == "__main__":
+    run_from_cmdline()
@@ -1,4 +1,5 @@
 
+from concurrent.futures import Future
 from copy import deepcopy
 import json
 import random
@@ -12,6 +13,7 @@ from tale.llm.contexts.DungeonLocationsContext import DungeonLocationsContext
 from tale.llm.contexts.WorldGenerationContext import WorldGenerationContext
 from tale.llm.dynamic_story import DynamicStory
 from tale.llm.llm_io import IoUtil
+from tale.llm.llm_scheduler import RequestPriority
 from tale.llm.requests.generate_dungeon_config import GenerateDungeonConfig
 from tale.llm.requests.generate_zone import GenerateZone
 from tale.llm.requests.start_location import StartLocation
@@ -42,10 +44,37 @@ class WorldBuilding():
                        context: WorldGenerationContext,
                        world_items: dict = {}, 
                        world_creatures: dict = {},
-                       neighbors: dict = {}) -> Tuple[LocationResponse, MobSpawner]:
+                       neighbors: dict = {},
+                       prebuilt_result: str = '') -> Tuple[LocationResponse, MobSpawner]:
         """ Build 'up' a previously generated location.
+            If prebuilt_result is given, it's used instead of asking the LLM.
             Returns lists of new locations, exits, and npcs."""
         
+        result = prebuilt_result
+        if not result:
+            request_body, prompt = self._location_request(location, exit_location_name, zone_info)
+            result = self.io_util.synchronous_request(request_body, prompt=prompt, context=context.to_prompt_string())
+        try:
+            json_result = json_util.safe_load(result)
+            result = LocationResponse(json_result, location=location, exit_location_name=exit_location_name, world_items=world_items, world_creatures=world_creatures, neighbors=neighbors, item_types=self.item_types)
+            spawner = None
+            if result.npcs and world_creatures:
+                spawner = self._try_generate_spawner(location, result.npcs, world_creatures)
+            return result, spawner
+        except json.JSONDecodeError as exc:
+            print(exc)
+            return LocationResponse.empty(), None
+        except Exception as exc:
+            print(exc)
+            return LocationResponse.empty(), None
+
+    def request_location(self, location: Location, exit_location_name: str, zone_info: dict, context: WorldGenerationContext) -> Future:
+        """ Queue the LLM request for building a location as background work.
+            The result can be passed to build_location as prebuilt_result."""
+        request_body, prompt = self._location_request(location, exit_location_name, zone_info)
+        return self.io_util.submit_request(request_body, prompt=prompt, context=context.to_prompt_string(), priority=RequestPriority.BACKGROUND)
+
+    def _location_request(self, location: Location, exit_location_name: str, zone_info: dict) -> Tuple[dict, str]:
         spawn_prompt = ''
         spawn_chance = 0.35
         spawn = random.random() < spawn_chance
@@ -81,20 +110,7 @@ class WorldBuilding():
 
         request_body = deepcopy(self.default_body)
         request_body['grammar'] = self.json_grammar
-        result = self.io_util.synchronous_request(request_body, prompt=prompt, context=context.to_prompt_string())
-        try:
-            json_result = json_util.safe_load(result)
-            result = LocationResponse(json_result, location=location, exit_location_name=exit_location_name, world_items=world_items, world_creatures=world_creatures, neighbors=neighbors, item_types=self.item_types)
-            spawner = None
-            if result.npcs and world_creatures:
-                spawner = self._try_generate_spawner(location, result.npcs, world_creatures)
-            return result, spawner
-        except json.JSONDecodeError as exc:
-            print(exc)
-            return LocationResponse.empty(), None
-        except Exception as exc:
-            print(exc)
-            return LocationResponse.empty(), None
+        return request_body, prompt
       
     def get_neighbor_or_generate_zone(self, current_zone: Zone, current_location: Location, target_location: Location, story: DynamicStory) -> Zone:
         """ Check if the target location is on the edge of the current zone. If not, will return the current zone.
@@ -0,0 +1,207 @@
+"""
+Sharded on-disk layout for the worlds of dynamic stories.
+
+The world is stored in the 'world' directory of the story: an index file with the story name,
+the catalogue, the zones and where their locations are, and one file per zone with its locations,
+npcs and spawners. The index is enough to find any location, so zones can be loaded on demand.
+Locations and zones keep track of their changes (see MudObject.mark_dirty and Zone.dirty),
+so a save only rewrites the files of the zones that changed since the last save.
+Every file is written to a temporary file first and then moved in place, so an interrupted
+save never leaves a half written world behind.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict, List, Optional
+
+from tale import parse_utils
+from tale.base import Living, MudObjRegistry
+from tale.zone import Zone
+
+WORLD_DIR = 'world'
+INDEX_FILE = 'index.json'
+ZONES_DIR = 'zones'
+
+
+def zone_filename(zone_name: str) -> str:
+    """ A file name for the zone that is safe on every file system, and unique for the zone name."""
+    slug = re.sub(r'[^a-z0-9]+', '_', zone_name.lower()).strip('_')[:40]
+    digest = hashlib.sha1(zone_name.encode('utf-8')).hexdigest()[:8]
+    return '%s-%s.json' % (slug or 'zone', digest)
+
+
+def write_atomic(path: str, text: str) -> None:
+    """ Write the text to a temporary file, and replace the file with it."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as fp:
+        fp.write(text)
+    os.replace(temp_path, path)
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+
+def has_shards(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, WORLD_DIR, INDEX_FILE))
+
+
+def load_index(path: str) -> dict:
+    return parse_utils.load_json(os.path.join(path, WORLD_DIR, INDEX_FILE))
+
+
+def load_zone(path: str, filename: str) -> dict:
+    return parse_utils.load_json(os.path.join(path, WORLD_DIR, ZONES_DIR, filename))
+
+
+def load_world(path: str) -> dict:
+    """
+    Load the world of the story in the directory, in the layout of world.json.
+    Reads the sharded world if there is one, otherwise the world.json file.
+    """
+    if not has_shards(path):
+        return parse_utils.load_json(os.path.join(path, 'world.json'))
+    index = load_index(path)
+    world = dict(npcs=dict(index.get('npcs', {})),
+                 items=dict(),
+                 mob_spawners=list(index.get('mob_spawners', [])),
+                 item_spawners=list(index.get('item_spawners', [])))
+    zones = dict()
+    for zone_name, filename in index.get('zones', {}).items():
+        shard = load_zone(path, filename)
+        if not shard:
+            print(f"Zone file {filename} for zone {zone_name} not found")
+            continue
+        zones[zone_name] = shard['zone']
+        world['npcs'].update(shard.get('npcs', {}))
+        world['mob_spawners'].extend(shard.get('mob_spawners', []))
+        world['item_spawners'].extend(shard.get('item_spawners', []))
+    return dict(story=index.get('story', {}), zones=zones, world=world, catalogue=index.get('catalogue', {}))
+
+
+class WorldShards:
+    """
+    Writes the world of a DynamicStory as shards, and keeps track of what is on disk.
+    The directory that was saved to (or loaded from) last is the one that is kept up to date
+    incrementally. Saving to another directory writes a complete copy of the world.
+    """
+
+    def __init__(self) -> None:
+        self.directory = None   # type: Optional[str]
+        self._written = dict()  # type: Dict[str, str]  # digest of the last text written to the index and other small files
+
+    def loaded(self, path: str, story) -> None:
+        """ The world was just loaded from the shards in the directory, so nothing needs to be written."""
+        self.directory = os.path.abspath(path)
+        self._written.clear()
+        for zone in story._zones.values():
+            self.clean(zone)
+
+    def save(self, story, path: str, max_zones: int = 0) -> int:
+        """
+        Write the zones that changed, and the index if it changed. Returns the number of files written.
+        With max_zones, at most that many zones are written, the others stay dirty for the next save.
+        The first save to a directory always writes all zones.
+        """
+        path = os.path.abspath(path)
+        if self.directory is None:
+            self.directory = path
+            self._written.clear()
+        if path != self.directory:
+            written = self._write(story, path, list(story._zones.values()), track=False)
+            for filename in story._unloaded_zones.values():
+                shutil.copyfile(os.path.join(self.directory, WORLD_DIR, ZONES_DIR, filename),
+                                os.path.join(path, WORLD_DIR, ZONES_DIR, filename))
+            return written + len(story._unloaded_zones)
+        if not has_shards(path):
+            return self._write(story, path, list(story._zones.values()), track=True)
+        zones = self.dirty_zones(story)
+        if max_zones:
+            zones = zones[:max_zones]
+        return self._write(story, path, zones, track=True)
+
+    def write_file(self, path: str, data: dict) -> bool:
+        """ Write a small json file if its contents changed since it was last written. Returns True if it was written."""
+        text = dumps(data)
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        path = os.path.abspath(path)
+        if self._written.get(path) == digest and os.path.isfile(path):
+            return False
+        write_atomic(path, text)
+        self._written[path] = digest
+        return True
+
+    def dirty_zones(self, story) -> List[Zone]:
+        """ The zones with changes that are not saved yet, in the order of the story."""
+        dirty = {zone.name for zone in story._zones.values() if zone.dirty}
+        for vnum in list(MudObjRegistry.dirty_locations):
+            location = MudObjRegistry.all_locations.get(vnum)
+            zone = self._zone_of(story, location.name) if location else None
+            if zone:
+                dirty.add(zone.name)
+            else:
+                MudObjRegistry.dirty_locations.discard(vnum)   # not part of the world, it isn't saved
+        return [zone for zone in story._zones.values() if zone.name in dirty]
+
+    def _write(self, story, path: str, zones: List[Zone], track: bool) -> int:
+        world_path = os.path.join(path, WORLD_DIR)
+        os.makedirs(os.path.join(world_path, ZONES_DIR), exist_ok=True)
+        npcs = dict()   # type: Dict[Optional[str], List[Living]]
+        for npc in story._world.npcs.values():
+            zone = self._zone_of(story, npc.location.name) if npc.location else None
+            npcs.setdefault(zone.name if zone else None, []).append(npc)
+        mob_spawners = dict()   # type: Dict[Optional[str], List[dict]]
+        for spawner in story._world.mob_spawners:
+            zone = self._zone_of(story, spawner.location.name)
+            mob_spawners.setdefault(zone.name if zone else None, []).append(spawner.to_json())
+        item_spawners = dict()  # type: Dict[Optional[str], List[dict]]
+        for spawner in story._world.item_spawners:
+            zone_name = spawner.zone.name if spawner.zone.name in story._zones else None
+            item_spawners.setdefault(zone_name, []).append(spawner.to_json())
+        written = 0
+        for zone in zones:
+            zone_json = zone.get_info()
+            zone_json['name'] = zone.name
+            zone_json['locations'] = parse_utils.save_locations([location for location in zone.locations.values() if location])
+            shard = dict(zone=zone_json,
+                         npcs=parse_utils.save_npcs(npcs.get(zone.name, [])),
+                         mob_spawners=mob_spawners.get(zone.name, []),
+                         item_spawners=item_spawners.get(zone.name, []))
+            write_atomic(os.path.join(world_path, ZONES_DIR, zone_filename(zone.name)), dumps(shard))
+            written += 1
+            if track:
+                self.clean(zone)
+        zone_files = {name: zone_filename(name) for name in story._zones}
+        zone_files.update(story._unloaded_zones)
+        locations = dict(story._unloaded_locations)
+        for zone in story._zones.values():
+            for location in zone.locations.values():
+                if location:
+                    locations.setdefault(location.name, (zone.name, location.world_location.as_tuple()))
+        index = dict(story=dict(name=story.config.name),
+                     zones=zone_files,
+                     locations=locations,
+                     catalogue=story._catalogue.to_json(),
+                     npcs=parse_utils.save_npcs(npcs.get(None, [])),
+                     mob_spawners=mob_spawners.get(None, []),
+                     item_spawners=item_spawners.get(None, []))
+        index_path = os.path.join(world_path, INDEX_FILE)
+        if track:
+            written += self.write_file(index_path, index)
+        else:
+            write_atomic(index_path, dumps(index))
+            written += 1
+        return written
+
+    def clean(self, zone: Zone) -> None:
+        """ The zone is the same as its file on disk."""
+        zone.dirty = False
+        for location in zone.locations.values():
+            if location:
+                MudObjRegistry.dirty_locations.discard(location.vnum)
+
+    def _zone_of(self, story, location_name: str) -> Optional[Zone]:
+        return story._location_index.get(location_name)[1]
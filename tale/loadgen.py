@@ -0,0 +1,277 @@
+"""
+Headless load generator for the MUD driver. Connects many simulated players, without
+a web server, and lets them play a scripted or random mix of commands against the real
+MUD main loop, to find the scaling limits of a story before players do.
+
+Reports the tick duration and tick overrun distribution, the commands handled per second
+and the time the server spent on each of them, and the memory use of the server process over time.
+
+Run it with:
+    python -m tale.loadgen [--story stories/prancingllama] [--players 200] [--duration 60] [--rate 0.5]
+                           [--script commands.txt] [--no-evoke] [--prompt-latency 0.2] [--output report.json]
+
+The LLM requests go to the stand-in server (see tale.llm.stand_in_server), so no backend is needed.
+With --no-evoke, descriptions are not sent to the LLM at all.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Sequence, Tuple
+
+from . import base
+from . import charbuilder
+from .benchmark import percentiles
+from .driver_mud import LimboReaper, MudDriver
+from .player import PlayerConnection, Player
+
+# relative weights of the kinds of commands in the random mix
+COMMAND_MIX = {"movement": 30, "look": 25, "say": 15, "inventory": 10, "emote": 10, "combat": 5, "examine": 5}
+SAYINGS = ["hello", "anyone around?", "nice weather today", "where can I find something to eat?", "farewell"]
+EMOTES = ["smile", "nod", "wave", "shrug", "yawn"]
+
+
+def rss_bytes() -> int:
+    """ Resident memory of this process. Falls back to the peak resident memory where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SimulatedPlayer:
+    """ A connection that plays commands from a script, or picks them from the command mix."""
+    def __init__(self, conn: PlayerConnection, script: Sequence[str], rng: random.Random) -> None:
+        self.conn = conn
+        self.script = script
+        self.rng = rng
+        self.turn = 0
+        self.waiting = False     # a command was entered, and hasn't been handled yet
+        self.next_command = 0.0
+
+    def command(self) -> str:
+        if self.script:
+            command = self.script[self.turn % len(self.script)]
+        else:
+            command = self.random_command()
+        self.turn += 1
+        return command
+
+    def random_command(self) -> str:
+        player = self.conn.player
+        kind = self.rng.choices(list(COMMAND_MIX), weights=list(COMMAND_MIX.values()))[0]
+        others = [living for living in player.location.livings if living is not player] if player.location else []
+        if kind == "movement" and player.location and player.location.exits:
+            return self.rng.choice(sorted(player.location.exits))
+        if kind == "say":
+            return "say " + self.rng.choice(SAYINGS)
+        if kind == "inventory":
+            return "inventory"
+        if kind == "emote":
+            return self.rng.choice(EMOTES)
+        if kind == "combat" and others:
+            return "attack " + self.rng.choice(others).name
+        if kind == "examine" and others:
+            return "examine " + self.rng.choice(others).name
+        return "look"
+
+
+class LoadDriver(MudDriver):
+    """
+    Mud driver that connects simulated players directly, instead of running the web server
+    and login dialogs. The regular MUD main loop runs in its own thread.
+    """
+    def __init__(self, players: int, duration: float, *, rate: float = 0.5, script: Sequence[str] = (),
+                 llm_url: str = "", evoke: bool = True, sample_interval: float = 1.0, seed: int = 0) -> None:
+        super().__init__()
+        self.num_players = players
+        self.duration = duration
+        self.rate = rate    # commands per second, per player
+        self.script = list(script)
+        self.sample_interval = sample_interval
+        self.rng = random.Random(seed)
+        self.simulated = []     # type: List[SimulatedPlayer]
+        self.tick_durations = []    # type: List[float]
+        self.tick_overruns = []     # type: List[float]
+        self.command_durations = []     # type: List[float]
+        self.memory_samples = []    # type: List[Tuple[float, int, int]]  # seconds since start, rss, gc tracked objects
+        self.commands_sent = 0
+        self.commands_handled = 0
+        self.elapsed = 0.0
+        self._previous_tick = 0.0
+        if llm_url:
+            self.llm_util.io_util.url = llm_url
+            if self.llm_util.io_util.io_adapter:
+                self.llm_util.io_util.io_adapter.url = llm_url
+        if not evoke:
+            self.llm_util.evoke = self._no_evoke
+
+    def start_main_loop(self) -> None:
+        base._limbo.init_inventory([LimboReaper()])
+        start_location = self.lookup_location(self.story.config.startlocation_player)
+        for number in range(self.num_players):
+            self.simulated.append(SimulatedPlayer(self._connect_simulated_player(number, start_location), self.script, self.rng))
+        driver_thread = threading.Thread(name="driver", target=self._main_loop_wrapper, args=(None,), daemon=True)
+        driver_thread.start()
+        self._generate_load()
+        self._stop_mainloop = True
+        self.input_notifier.wake()
+        driver_thread.join(self.story.config.server_tick_time + 10)
+
+    def _connect_simulated_player(self, number: int, start_location: base.Location) -> PlayerConnection:
+        from .tio.headless_io import HeadlessIo
+        conn = PlayerConnection()
+        conn.player = Player("<connecting_%d>" % id(conn), "n", race="elemental")
+        conn.io = HeadlessIo(conn)
+        conn.player.output_line_delay = 0
+        conn.player.input_notifier = self.input_notifier
+        self.all_players[conn.player.name] = conn
+        name_info = charbuilder.PlayerNaming()
+        name_info.name = "load%d" % number
+        name_info.gender = self.rng.choice("mf")
+        name_info.stats.race = "human"
+        self._rename_player(conn.player, name_info)
+        conn.player.move(start_location, silent=True)
+        self.story.init_player(conn.player)
+        conn.io.prompted.set()
+        return conn
+
+    def _generate_load(self) -> None:
+        start = time.perf_counter()
+        next_sample = 0.0
+        for simulated in self.simulated:
+            simulated.next_command = self.rng.expovariate(self.rate)   # spread the players out
+        while True:
+            now = time.perf_counter() - start
+            if now >= self.duration:
+                break
+            if now >= next_sample:
+                self.memory_samples.append((now, rss_bytes(), len(gc.get_objects())))
+                next_sample += self.sample_interval
+            for simulated in self.simulated:
+                if not simulated.conn.io.prompted.is_set():
+                    continue
+                if simulated.waiting:
+                    simulated.waiting = False
+                    self.commands_handled += 1
+                if now >= simulated.next_command and simulated.conn.player.location:
+                    simulated.conn.io.prompted.clear()
+                    simulated.waiting = True
+                    simulated.conn.player.store_input_line(simulated.command())
+                    simulated.next_command = now + self.rng.expovariate(self.rate)
+                    self.commands_sent += 1
+            time.sleep(0.005)
+        self.elapsed = time.perf_counter() - start
+        self.memory_samples.append((self.elapsed, rss_bytes(), len(gc.get_objects())))
+
+    def _server_tick(self) -> None:
+        start = time.perf_counter()
+        if self._previous_tick:
+            self.tick_overruns.append(max(0.0, start - self._previous_tick - self.story.config.server_tick_time))
+        self._previous_tick = start
+        super()._server_tick()
+        self.tick_durations.append(time.perf_counter() - start)
+
+    def _server_loop_process_player_input(self, conn: PlayerConnection) -> None:
+        start = time.perf_counter()
+        super()._server_loop_process_player_input(conn)
+        self.command_durations.append(time.perf_counter() - start)
+
+    def _no_evoke(self, message: str, rolling_prompt: str = '', **kwargs) -> Tuple[str, str]:
+        return str(message), rolling_prompt
+
+    def report(self) -> dict:
+        tick_time = self.story.config.server_tick_time
+        first_rss, last_rss = self.memory_samples[0][1], self.memory_samples[-1][1]
+        return dict(story=self.story.config.name,
+                    players=len(self.simulated),
+                    seconds=round(self.elapsed, 2),
+                    commands_sent=self.commands_sent,
+                    commands_handled=self.commands_handled,
+                    commands_per_second=round(self.commands_handled / self.elapsed, 2) if self.elapsed else 0.0,
+                    command_duration=percentiles(self.command_durations),
+                    ticks=len(self.tick_durations),
+                    tick_duration=percentiles(self.tick_durations),
+                    tick_overrun=percentiles(self.tick_overruns),
+                    overrun_ticks=sum(1 for overrun in self.tick_overruns if overrun > tick_time / 10),
+                    memory_growth=last_rss - first_rss,
+                    memory=[dict(seconds=round(seconds, 2), rss=rss, objects=objects) for seconds, rss, objects in self.memory_samples])
+
+
+def format_report(report: dict) -> str:
+    command, tick, overrun = report["command_duration"], report["tick_duration"], report["tick_overrun"]
+    lines = [
+        "%s: %d players for %.0f seconds" % (report["story"], report["players"], report["seconds"]),
+        "Commands:      %d sent, %d handled, %.1f per second" % (report["commands_sent"], report["commands_handled"], report["commands_per_second"]),
+        "Command time:  p50 %.1f  p95 %.1f  p99 %.1f  max %.1f ms" % (command["p50"], command["p95"], command["p99"], command["max"]),
+        "Tick duration: p50 %.1f  p95 %.1f  p99 %.1f  max %.1f ms  (%d ticks)" % (tick["p50"], tick["p95"], tick["p99"], tick["max"], report["ticks"]),
+        "Tick overrun:  p50 %.1f  p95 %.1f  p99 %.1f  max %.1f ms  (%d ticks late)" % (overrun["p50"], overrun["p95"], overrun["p99"], overrun["max"], report["overrun_ticks"]),
+        "Memory:        %.1f Mb -> %.1f Mb (%+.1f Mb)" % (report["memory"][0]["rss"] / 1e6, report["memory"][-1]["rss"] / 1e6, report["memory_growth"] / 1e6),
+    ]
+    if "llm" in report:
+        lines.append("LLM stand-in:  %d requests, %d replayed, %d missed" % (report["llm"]["requests"], report["llm"]["replayed"], report["llm"]["missed"]))
+    return "\n".join(lines)
+
+
+def run_from_cmdline(cmdline: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(description="Simulate many players on the MUD driver and report tick durations, throughput and memory growth.")
+    parser.add_argument("--story", default="stories/prancingllama", help="story directory, must support mud mode")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    parser.add_argument("--rate", type=float, default=0.5, help="commands per second, per player")
+    parser.add_argument("--script", help="file with commands that every player plays in turn, one per line (default: a random mix)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random command mix")
+    parser.add_argument("--no-evoke", action="store_true", help="don't let the LLM rewrite descriptions")
+    parser.add_argument("--llm-url", default="", help="url of an LLM backend, instead of the built in stand-in server")
+    parser.add_argument("--cassette", default="", help="JSONL file with recorded LLM answers for the stand-in")
+    parser.add_argument("--prompt-latency", type=float, default=0.0, help="seconds before the stand-in sends the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per token the stand-in sends")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between memory samples")
+    parser.add_argument("--output", help="write the report as json to this file")
+    args = parser.parse_args(cmdline)
+    script = []     # type: List[str]
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as file:
+            script = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    server = None
+    llm_url = args.llm_url
+    if not llm_url:
+        from .llm.stand_in_server import Cassette, StandInServer
+        server = StandInServer(Cassette(args.cassette), prompt_latency=args.prompt_latency, token_latency=args.token_latency)
+        llm_url = server.start()
+    driver = LoadDriver(args.players, args.duration, rate=args.rate, script=script, llm_url=llm_url,
+                        evoke=not args.no_evoke, sample_interval=args.sample_interval, seed=args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        # play on a copy, playing a story changes the files in its directory
+        story_copy = os.path.join(workdir, os.path.basename(os.path.normpath(args.story)))
+        shutil.copytree(args.story, story_copy)
+        cwd = os.getcwd()
+        try:
+            driver.start(story_copy)
+        finally:
+            os.chdir(cwd)
+    report = driver.report()
+    if server:
+        report["llm"] = dict(server.stats)
+        server.stop()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    run_from_cmdline(sys.argv[1:])
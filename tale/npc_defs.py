@@ -20,7 +20,7 @@ class StationaryNpc(LivingNpc):
         player_in_location = any(name == living.name for name in player_names for living in self.location.livings)
         
         if player_in_location or self.location.get_wiretap() or self.get_wiretap():
-            self.idle_action()
+            self.idle_action(background=True)
 
 class StationaryMob(LivingNpc):
     
@@ -39,7 +39,7 @@ class StationaryMob(LivingNpc):
                 if isinstance(liv, Player):
                     self.start_attack(defender=liv)
         elif player_in_location or self.location.get_wiretap() or self.get_wiretap():
-            self.idle_action()
+            self.idle_action(background=True)
         
 class RoamingMob(StationaryMob):
     
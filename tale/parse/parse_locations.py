@@ -24,7 +24,8 @@ def load_locations(json_file: dict) -> Tuple[dict, list]:
         name = loc['name']
         location = location_from_json(loc)
         if loc.get('world_location', None):
-            location.world_location = Coord(loc['world_location'][0], loc['world_location'][1], loc['world_location'][2])
+            x, y, z = (int(value) for value in loc['world_location'][:3])   # generated worlds can have them as strings
+            location.world_location = Coord(x, y, z)
         locations[name] = location
         zone1.add_location(location)
         loc_exits = loc['exits']
@@ -10,6 +10,7 @@ from tale.items import generic
 from tale.llm.LivingNpc import LivingNpc
 from tale.load_items import load_item
 from tale.skills.magic import MagicType
+from tale.skills.skills import SkillType
 from tale.npc_defs import StationaryMob, StationaryNpc, Trader
 from tale.races import BodyType, UnarmedAttack
 from tale.mob_spawner import MobSpawner
@@ -190,6 +191,12 @@ def load_story_config(json_file: dict):
     config.epoch = json_file.get('epoch', config.epoch)
     config.day_night = json_file.get('day_night', config.day_night)
     config.random_events = json_file.get('random_events', config.random_events)
+    config.autosave_interval = json_file.get('autosave_interval', config.autosave_interval)
+    config.lazy_zones = json_file.get('lazy_zones', config.lazy_zones)
+    config.zone_idle_time = json_file.get('zone_idle_time', config.zone_idle_time)
+    config.web_output_delay = json_file.get('web_output_delay', config.web_output_delay)
+    config.web_output_batch = json_file.get('web_output_batch', config.web_output_batch)
+    config.web_compression = json_file.get('web_compression', config.web_compression)
     return config
 
 def save_story_config(config: StoryConfig) -> dict:
@@ -226,6 +233,12 @@ def save_story_config(config: StoryConfig) -> dict:
     json_file['epoch'] = 0 # TODO: fix later
     json_file['day_night'] = config.day_night
     json_file['random_events'] = config.random_events
+    json_file['autosave_interval'] = config.autosave_interval
+    json_file['lazy_zones'] = config.lazy_zones
+    json_file['zone_idle_time'] = config.zone_idle_time
+    json_file['web_output_delay'] = config.web_output_delay
+    json_file['web_output_batch'] = config.web_output_batch
+    json_file['web_compression'] = config.web_compression
     return json_file
 
 
@@ -588,7 +601,7 @@ def load_stats(json_stats: dict) -> Stats:
         json_skills = json_stats['skills'] # type: dict
         for skill in json_skills.keys():
             int_skill = int(skill)
-            stats.skills[WeaponType(int_skill)] = json
+            stats.skills[SkillType(int_skill)] = json_skills[skill]
     return stats
     
 def save_items(items: List[Item]) -> list[dict]:
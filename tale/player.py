@@ -9,7 +9,7 @@ import os
 import queue
 import time
 from threading import Event
-from typing import Sequence, Set, Tuple, Optional, Union
+from typing import Dict, Sequence, Set, Tuple, Optional, Union
 
 from . import base
 from . import lang
@@ -21,7 +21,8 @@ from .story import GameMode
 from .tio import DEFAULT_SCREEN_WIDTH, DEFAULT_SCREEN_INDENT
 from .tio.iobase import strip_text_styles, IoAdapterBase
 from .vfs import VirtualFileSystem, Resource
-from tale.player_utils import TextBuffer
+from tale.llm import llm_cache
+from tale.player_utils import InputNotifier, TextBuffer
 from tale.util import call_periodically
 
 
@@ -52,8 +53,10 @@ class Player(base.Living, pubsub.Listener):
         # call this function after deserialization.
         self._input = queue.Queue()   # type: queue.Queue[str]
         self.input_is_available = Event()
+        self.input_notifier = None  # type: Optional[InputNotifier]
         self.transcript = None   # type: Optional[IO[str]]
         self._output = TextBuffer()
+        self._look_hashes = {}   # type: Dict[int, Tuple[Tuple[int, bool, str], int]]  # location vnum -> (look version, short, title), look text hash
 
     def init_names(self, name: str, title: str, descr: str, short_descr: str) -> None:
         title = lang.capital(title or name)  # make sure the title of a player remains capitalized
@@ -67,13 +70,14 @@ class Player(base.Living, pubsub.Listener):
         self.screen_indent = indent
         self.screen_width = width
 
-    def tell(self, message: str, *, end: bool=False, format: bool=True, evoke: bool=False, short_len : bool=False, alt_prompt : str='', extra_context: str= '') -> base.Living:
+    def tell(self, message: str, *, end: bool=False, format: bool=True, evoke: bool=False, short_len : bool=False, alt_prompt : str='', extra_context: str= '', text_hash: int=-1) -> base.Living:
         """
         Sends a message to a player, meant to be printed on the screen.
         Message will be converted to str if required.
         If you want to output a paragraph separator, either set end=True or tell a single newline.
         If you provide format=False, this paragraph of text won't be formatted when it is outputted,
         and whitespace is untouched. Empty strings aren't outputted at all.
+        text_hash is the hash of the evoked text for the llm look cache, if it is already known.
         The player object is returned so you can chain calls.
         """
         if evoke:
@@ -83,7 +87,8 @@ class Player(base.Living, pubsub.Listener):
                                                                     short_len = short_len, 
                                                                     rolling_prompt = self.rolling_prompt, 
                                                                     alt_prompt = alt_prompt,
-                                                                    extra_context = extra_context)
+                                                                    extra_context = extra_context,
+                                                                    text_hash = text_hash)
             self.rolling_prompt = rolling_prompt
         else:
             msg = str(message)
@@ -128,10 +133,25 @@ class Player(base.Living, pubsub.Listener):
             self.known_locations.add(self.location)
             look_paragraphs = self.location.look(exclude_living=self, short=short)
             look_text = '\n'.join(look_paragraphs)
-            self.tell(look_text, end=True, evoke=evoke)
+            self.tell(look_text, end=True, evoke=evoke, text_hash=self._look_hash(look_text, short) if evoke else -1)
         else:
             self.tell("You see nothing.")
 
+    def _look_hash(self, look_text: str, short: bool) -> int:
+        """
+        The hash of the look text as evoke computes it, remembered until the location changes,
+        so looking around in a room that didn't change doesn't hash the text again.
+        """
+        key = (self.location.look_version, short, self.title)
+        known = self._look_hashes.get(self.location.vnum)
+        if known and known[0] == key:
+            return known[1]
+        if self.title in look_text:
+            look_text = look_text.replace(self.title, 'you')    # the same as tell does before evoking
+        text_hash = llm_cache.generate_hash(look_text)
+        self._look_hashes[self.location.vnum] = (key, text_hash)
+        return text_hash
+
     def move(self, target: base.ContainingType, actor: base.Living=None,
              *, silent: bool=False, is_player: bool=True, verb: str="move", direction_names: Sequence[str]=None) -> None:
         """
@@ -185,6 +205,8 @@ class Player(base.Living, pubsub.Listener):
             self.transcript.write("\n\n>> %s\n" % cmd)
         self.input_is_available.set()
         self.last_input_time = time.time()
+        if self.input_notifier:
+            self.input_notifier.notify(self)
         
     @property
     def idle_time(self) -> float:
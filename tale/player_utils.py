@@ -1,3 +1,4 @@
+import threading
 from typing import Any, Sequence, Tuple, IO, Optional, Set, List, Union
 
 class TextBuffer:
@@ -68,3 +69,35 @@ class TextBuffer:
         if clear:
             self.init()
         return paragraphs
+
+
+class InputNotifier:
+    """
+    Lets the driver loop sleep until a player enters input (or until a timeout),
+    instead of checking every connected player at short intervals.
+    """
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._ready = set()  # type: Set[Any]
+        self._woken = False
+
+    def notify(self, player: Any) -> None:
+        """Signal that the player has input available."""
+        with self._condition:
+            self._ready.add(player)
+            self._condition.notify()
+
+    def wake(self) -> None:
+        """Wake up the waiting loop without any player input, for instance when there's a new connection."""
+        with self._condition:
+            self._woken = True
+            self._condition.notify()
+
+    def wait(self, timeout: float) -> Set[Any]:
+        """Wait until there is player input or the timeout expires. Returns the players that have input."""
+        with self._condition:
+            if not self._ready and not self._woken:
+                self._condition.wait(timeout)
+            ready, self._ready = self._ready, set()
+            self._woken = False
+            return ready
@@ -0,0 +1,154 @@
+"""
+Lightweight timing instrumentation for the driver's hot paths.
+Durations are collected in fixed-bucket histograms, per category and name:
+
+  "tick"      the phases of the server tick (clock, deferreds, pubsub, output, wiretaps)
+  "deferred"  each deferred that was called, by owner and action name
+  "command"   each player command, by verb
+  "llm"       each LLM request, by request type
+
+Recording a duration is a dictionary lookup and a few additions, so it can stay on in production.
+The histograms can be shown with the !profile wizard command, and exported as json or
+in the Prometheus text format.
+"""
+
+import bisect
+import json
+import threading
+import time
+from typing import IO, Dict, List, Optional, Tuple
+
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Counts durations in the fixed BUCKETS (the last count is for anything above the last bucket)."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile (0..1): the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+    def to_json(self) -> dict:
+        return dict(count=self.count, total=self.total, max=self.max, buckets=list(self.counts))
+
+
+class Timer:
+    """Context manager that records the duration of its block in the profiler."""
+    __slots__ = ("profiler", "category", "name", "start")
+
+    def __init__(self, profiler: 'Profiler', category: str, name: str) -> None:
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.profiler.observe(self.category, self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.enabled = True
+        self.started = time.time()
+        self._histograms = {}   # type: Dict[Tuple[str, str], Histogram]
+        self._lock = threading.Lock()
+
+    def observe(self, category: str, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        key = (category, name)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(seconds)
+
+    def timer(self, category: str, name: str) -> Timer:
+        return Timer(self, category, name)
+
+    def histogram(self, category: str, name: str) -> Optional[Histogram]:
+        return self._histograms.get((category, name))
+
+    def categories(self) -> List[str]:
+        return sorted({category for category, _ in list(self._histograms)})
+
+    def top(self, category: str, amount: int = 10) -> List[Tuple[str, Histogram]]:
+        """The names in the category that took the most time in total."""
+        entries = [(name, histogram) for (cat, name), histogram in list(self._histograms.items()) if cat == category]
+        entries.sort(key=lambda entry: entry[1].total, reverse=True)
+        return entries[:amount]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+            self.started = time.time()
+
+    def to_json(self) -> dict:
+        result = dict(started=self.started, buckets=list(BUCKETS), histograms={})   # type: dict
+        for (category, name), histogram in sorted(list(self._histograms.items())):
+            result["histograms"].setdefault(category, {})[name] = histogram.to_json()
+        return result
+
+    def to_prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = ["# HELP tale_duration_seconds Duration of driver activities.",
+                 "# TYPE tale_duration_seconds histogram"]
+        for (category, name), histogram in sorted(list(self._histograms.items())):
+            labels = 'category="%s",name="%s"' % (_escape_label(category), _escape_label(name))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append('tale_duration_seconds_bucket{%s,le="%g"} %d' % (labels, bound, cumulative))
+            lines.append('tale_duration_seconds_bucket{%s,le="+Inf"} %d' % (labels, histogram.count))
+            lines.append('tale_duration_seconds_sum{%s} %f' % (labels, histogram.total))
+            lines.append('tale_duration_seconds_count{%s} %d' % (labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write the histograms to a file; json if the file name ends in .json, else the Prometheus text format."""
+        with open(path, "w") as out:
+            self.write(out, path.endswith(".json"))
+
+    def write(self, out: IO[str], as_json: bool) -> None:
+        """Write the histograms to a text stream, in json or in the Prometheus text format."""
+        if as_json:
+            json.dump(self.to_json(), out, indent=2)
+        else:
+            out.write(self.to_prometheus())
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+profiler = Profiler()
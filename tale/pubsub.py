@@ -63,6 +63,7 @@ class Topic:
         self.subscribers = set()  # type: Set[weakref.ReferenceType[Listener]]
         self.events = []  # type: List[Any]
         self.last_event = time.time()  # type: float
+        self.events_lock = threading.Lock()   # events may be sent from other threads, such as the llm workers
 
     @property
     def idle_time(self) -> float:
@@ -84,14 +85,16 @@ class Topic:
         self.subscribers.discard(weakref.ref(subscriber))
 
     def send(self, event: Any, synchronous: bool=False) -> Optional[List[Any]]:
-        self.events.append(event)
+        with self.events_lock:
+            self.events.append(event)
         self.last_event = time.time()
         if synchronous:
             return self.sync()
         return None
 
     def sync(self) -> List[Any]:
-        events, self.events = self.events, []
+        with self.events_lock:
+            events, self.events = self.events, []
         results = []
         for event in events:
             results.extend(self.__sync_event(event))
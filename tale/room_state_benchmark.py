@@ -0,0 +1,99 @@
+"""
+Benchmark of the room state that is sent to the browser with the output. Simulates a player in a busy
+room for a number of minutes: npcs come and go and items are dropped and taken while the player gets
+output, and every now and then the player walks to another room. Counts the bytes per minute of the
+room state when all of it is sent with every message, and when only the changes are sent (see RoomState).
+
+Run it with:  python -m tale.room_state_benchmark [--npcs 8] [--items 10] [--rate 2] [--changes 0.2] [--minutes 5]
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import Dict, Sequence
+
+from .base import Exit, Item, Living, Location
+from .tio.if_browser_io import RoomState
+
+
+def _room(number: int, npcs: int, items: int) -> Location:
+    location = Location("Room %d" % number, "A busy room.")
+    for direction in ("north", "east", "south", "west"):
+        location.add_exits([Exit(direction, Location("Outside %d %s" % (number, direction)), "A way out.")])
+    for index in range(npcs):
+        location.insert(Living("villager %d-%d" % (number, index), "f", race="human"), None)
+    for index in range(items):
+        location.insert(Item("thing %d-%d" % (number, index)), None)
+    return location
+
+
+def run_benchmark(npcs: int, items: int, rate: float, changes: float, move_every: float,
+                  minutes: float, seed: int = 0) -> Dict[str, float]:
+    """
+    Plays the simulation, and returns the bytes per minute of the room state in both ways of sending it.
+    rate is the number of messages per second, changes the chance that the room changed before a message,
+    and move_every the number of seconds between moves of the player to another room.
+    """
+    rnd = random.Random(seed)
+    player = Living("player", "f", race="human")
+    rooms = 1
+    location = _room(0, npcs, items)
+    location.insert(player, None)
+    deltas = RoomState()
+    messages = int(minutes * 60 * rate)
+    full_bytes = delta_bytes = updates = 0
+    for message in range(messages):
+        if message and int(message / rate / move_every) != int((message - 1) / rate / move_every):
+            location.remove(player, None)
+            location = _room(rooms, npcs, items)
+            location.insert(player, None)
+            rooms += 1
+        elif rnd.random() < changes:
+            livings = [living for living in location.livings if living is not player]
+            choice = rnd.randrange(4)
+            if choice == 0 or (choice == 1 and not livings):
+                location.insert(Living("wanderer %d" % message, "m", race="human"), None)
+            elif choice == 1:
+                location.remove(rnd.choice(livings), None)
+            elif choice == 2 or not location.items:
+                location.insert(Item("trinket %d" % message), None)
+            else:
+                location.remove(rnd.choice(list(location.items)), None)
+        full_bytes += len(json.dumps(RoomState().update(player, location)))
+        update = deltas.update(player, location)
+        if update:
+            delta_bytes += len(json.dumps(update))
+            updates += 1
+    return dict(messages=messages, updates=updates, rooms=rooms,
+                full_per_minute=full_bytes / minutes, delta_per_minute=delta_bytes / minutes)
+
+
+def format_results(result: Dict[str, float]) -> str:
+    lines = ["%d messages, %d room updates, %d rooms" % (result["messages"], result["updates"], result["rooms"]),
+             "%-10s %16s" % ("mode", "bytes/minute"),
+             "%-10s %16.0f" % ("full", result["full_per_minute"]),
+             "%-10s %16.0f" % ("delta", result["delta_per_minute"])]
+    if result["delta_per_minute"]:
+        lines.append("delta is %.1fx smaller" % (result["full_per_minute"] / result["delta_per_minute"]))
+    return "\n".join(lines)
+
+
+def run_from_cmdline(cmdline: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(description="Compare the bytes per minute of sending the full room state with every message, and sending only the changes.")
+    parser.add_argument("--npcs", type=int, default=8, help="npcs in every room")
+    parser.add_argument("--items", type=int, default=10, help="items in every room")
+    parser.add_argument("--rate", type=float, default=2.0, help="messages per second to the player")
+    parser.add_argument("--changes", type=float, default=0.2, help="chance that the room changed before a message")
+    parser.add_argument("--move-every", type=float, default=30.0, help="seconds between moves to another room")
+    parser.add_argument("--minutes", type=float, default=5.0, help="minutes to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random changes")
+    args = parser.parse_args(cmdline)
+    print(format_results(run_benchmark(args.npcs, args.items, args.rate, args.changes, args.move_every, args.minutes, args.seed)))
+
+
+if __name__ == "__main__":
+    run_from_cmdline(sys.argv[1:])
@@ -1,7 +1,12 @@
+import collections
+import collections.abc
 import datetime
+import enum
 import importlib
+import io
 import gzip
-from typing import Any, Tuple, List, Optional, Dict, Type, Sequence, Union
+import pickle
+from typing import Any, BinaryIO, Callable, Mapping, Tuple, List, Optional, Dict, Type, Sequence, Union
 
 from .base import Item, Location, Living, Exit, Door, MudObject, MudObjRegistry, Stats, _limbo
 from .story import StoryConfig, MoneyType, GameMode, TickMethod
@@ -42,43 +47,98 @@ def qual_baseclassname(obj: MudObject) -> str:
         raise ValueError("cannot determine Tale base class", obj)
 
 
+SAVEGAME_VERSION = 2    # version of the savegames that are written
+XOR_KEY = 0x5c    # please do not hack the save files
+_xor_table = bytes(b ^ XOR_KEY for b in range(256))
+_scalar_types = frozenset({str, int, float, bool, bytes, type(None)})
+
+
+class _XorWriter:
+    """File-like object that obfuscates everything written to it, before passing it on to the stream."""
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+
+    def write(self, data: bytes) -> int:
+        return self.stream.write(bytes(data).translate(_xor_table))
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class _LiteralUnpickler(pickle.Unpickler):
+    """
+    Only loads the literal tree of builtin containers and values that the savegames consist of.
+    Pickle protocol 5 stores those without referring to any global, so no global is allowed at all.
+    """
+    def find_class(self, module: str, name: str) -> Any:
+        raise pickle.UnpicklingError("savegame data refers to {}.{}, that is not allowed".format(module, name))
+
+
 class TaleSerializer:
-    xor_key = 0x5c    # please do not hack the save files
+    """
+    Serializes the game state to savegame data. Version 1 is a gzipped serpent text literal,
+    version 2 is the same literal tree as a gzipped pickle (protocol 5). Both are obfuscated.
+    """
+    xor_key = XOR_KEY
 
     def __init__(self):
-        serpent.register_class(Player, self.serialize_player)
-        serpent.register_class(ShopBehavior, self.serialize_shopbehavior)
-        serpent.register_class(Location, self.serialize_location)
-        serpent.register_class(Stats, self.serialize_stats)
-        serpent.register_class(Item, self.serialize_item)
-        serpent.register_class(Living, self.serialize_living)
-        serpent.register_class(Exit, self.serialize_exit)
-        serpent.register_class(Deferred, self.serialize_deferred)
+        # the objects that need special treatment, in order (subclasses first)
+        self.state_functions = [
+            (Player, self.player_state),
+            (ShopBehavior, self.shopbehavior_state),
+            (Location, self.location_state),
+            (Stats, self.stats_state),
+            (Item, self.item_state),
+            (Living, self.living_state),
+            (Exit, self.exit_state),
+            (Deferred, self.deferred_state)
+        ]   # type: List[Tuple[type, Callable[[Any], Dict[str, Any]]]]
+        for clazz, state_function in self.state_functions:
+            serpent.register_class(clazz, self._serpent_class_serializer(state_function))
         self.serializer = serpent.Serializer(indent=True, module_in_classname=True)
 
+    def _serpent_class_serializer(self, state_function: Callable[[Any], Dict[str, Any]]) -> Callable:
+        def serialize_class(obj: Any, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+            ser._serialize(state_function(obj), out, indentlevel)
+        return serialize_class
+
     def serialize(self, story: StoryConfig, player: Player, items: Sequence[Item], livings: Sequence[Living],
                   locations: Sequence[Location], exits: Sequence[Exit],
-                  deferreds: Sequence[Deferred], clock: GameDateTime):
+                  deferreds: Sequence[Deferred], clock: GameDateTime, version: int=SAVEGAME_VERSION) -> bytes:
+        data = self.game_state(story, player, items, livings, locations, exits, deferreds, clock)
+        if version == 1:
+            return self.obfuscate(self.serializer.serialize(data))
+        stream = io.BytesIO()
+        self.dump(self.literal(data), stream)
+        return stream.getvalue()
+
+    def game_state(self, story: StoryConfig, player: Player, items: Sequence[Item], livings: Sequence[Living],
+                   locations: Sequence[Location], exits: Sequence[Exit],
+                   deferreds: Sequence[Deferred], clock: GameDateTime) -> Dict[str, Any]:
+        """checks the consistency of the game objects, and returns everything that goes in the savegame"""
         # only serialize livings that are not the current player, and also not the dummy player used for new connections
         livings = [l for l in livings if l is not player and l.name != PlayerConnection.dummy_player_name]
         if _limbo not in locations:
             locations = list(locations)
             locations.append(_limbo)
-        if any(i not in items for i in player.inventory):
+        # identity sets, for the membership tests
+        item_ids, living_ids = {id(i) for i in items}, {id(l) for l in livings}
+        location_ids, exit_ids = {id(loc) for loc in locations}, {id(e) for e in exits}
+        if any(id(i) not in item_ids for i in player.inventory):
             raise ValueError("missing item (from player inventory)")
-        if any(i not in items for living in livings for i in living.inventory):
+        if any(id(i) not in item_ids for living in livings for i in living.inventory):
             raise ValueError("missing item (from living inventory)")
-        if any(i not in items for loc in locations for i in loc.items):
+        if any(id(i) not in item_ids for loc in locations for i in loc.items):
             raise ValueError("missing item (from locations)")
-        if any(l is not player and l not in livings for loc in locations for l in loc.livings):
+        if any(l is not player and id(l) not in living_ids for loc in locations for l in loc.livings):
             raise ValueError("missing living (from locations)")
-        if any(living.location is not None and living.location not in locations for living in livings):
+        if any(living.location is not None and id(living.location) not in location_ids for living in livings):
             raise ValueError("missing location (from livings)")
-        if player.location is not None and player.location not in locations:
+        if player.location is not None and id(player.location) not in location_ids:
             raise ValueError("missing location (from player)")
-        if any(e not in exits for loc in locations for e in loc.exits.values()):
+        if any(id(e) not in exit_ids for loc in locations for e in loc.exits.values()):
             raise ValueError("missing exit (from location)")
-        data = {
+        return {
             # "story_version": story.version,
             # "tale_version_required": story.requires_tale,
             "story_config": story,
@@ -90,12 +150,61 @@ class TaleSerializer:
             "deferreds": deferreds,
             "player": player,
         }
-        serialized = self.serializer.serialize(data)
-        return self.obfuscate(serialized)
+
+    def literal(self, obj: Any) -> Any:
+        """
+        Converts the object to a tree of builtin containers and values, the same tree that
+        loading the serpent (version 1) serialization of the object results in.
+        """
+        t = type(obj)
+        if t in _scalar_types:
+            return obj
+        literal = self.literal
+        if t is dict:
+            return {key if type(key) in _scalar_types else literal(key): value if type(value) in _scalar_types else literal(value)
+                    for key, value in obj.items()}
+        if t is list:
+            return [value if type(value) in _scalar_types else literal(value) for value in obj]
+        if t is tuple:
+            return tuple(value if type(value) in _scalar_types else literal(value) for value in obj)
+        if t is set or t is frozenset:
+            return {value if type(value) in _scalar_types else literal(value) for value in obj} if obj else ()
+        for clazz, state_function in self.state_functions:
+            if isinstance(obj, clazz):
+                return self.literal(state_function(obj))
+        if isinstance(obj, enum.Enum):
+            return self.literal(obj.value)
+        if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+            return obj.isoformat()
+        if isinstance(obj, datetime.timedelta):
+            return obj.total_seconds()
+        if isinstance(obj, collections.OrderedDict):
+            return {"__class__": "collections.OrderedDict", "items": [self.literal(item) for item in obj.items()]}
+        if isinstance(obj, Mapping):
+            return {self.literal(key): self.literal(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple, collections.deque, collections.abc.KeysView, collections.abc.ValuesView)):
+            return [self.literal(value) for value in obj]
+        if isinstance(obj, (set, frozenset)):
+            return {self.literal(value) for value in obj} if obj else ()
+        if isinstance(obj, (int, float, str)):
+            return obj
+        if getattr(type(obj), "__getstate__", None) is not getattr(object, "__getstate__", None):
+            state = obj.__getstate__()
+        else:
+            state = vars(obj)
+        state = dict(state)
+        state.setdefault("__class__", qual_classname(obj))
+        return self.literal(state)
+
+    def dump(self, literal: Any, stream: BinaryIO) -> None:
+        """writes the literal tree as version 2 savegame data to the stream, without first building it in memory"""
+        stream.write(b"TALESAVE2")
+        with gzip.GzipFile(fileobj=_XorWriter(stream), mode="wb", compresslevel=6, mtime=0) as compressed:
+            pickle.Pickler(compressed, protocol=5).dump(literal)
 
     def obfuscate(self, data: bytes) -> bytes:
         data = gzip.compress(data)
-        return b"TALESAVE1" + bytes(b ^ self.xor_key for b in data)
+        return b"TALESAVE1" + data.translate(_xor_table)
 
     def add_basic_properties(self, state: Dict[str, Any], obj: MudObject) -> None:
         state["__class__"] = qual_classname(obj)
@@ -104,6 +213,8 @@ class TaleSerializer:
         state["descr"] = obj.description
         state["short_descr"] = obj.short_description
         state["extra_desc"] = obj.extra_desc
+        state["visible"] = obj.visible
+        state["hidden"] = obj.hidden
 
     def add_inventory_property(self, state: Dict[str, Any], obj: MudObject) -> None:
         try:
@@ -113,13 +224,13 @@ class TaleSerializer:
         else:
             state["inventory"] = {mudobj_ref(m) for m in inv}
 
-    def serialize_shopbehavior(self, obj: ShopBehavior, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def shopbehavior_state(self, obj: ShopBehavior) -> Dict[str, Any]:
         state = dict(vars(obj))
         state["__class__"] = qual_classname(obj)
         state["forsale"] = {mudobj_ref(i) for i in state["forsale"]}
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_deferred(self, obj: Deferred, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def deferred_state(self, obj: Deferred) -> Dict[str, Any]:
         state = dict(vars(obj))
         state["__class__"] = qual_classname(obj)
         if not isinstance(state["owner"], str):
@@ -128,9 +239,9 @@ class TaleSerializer:
             except Exception:
                 # owner is not a regular mudobj
                 state["owner"] = "class:" + qual_classname(state["owner"])
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_stats(self, obj: Stats, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def stats_state(self, obj: Stats) -> Dict[str, Any]:
         state = {
             "__class__": qual_classname(obj),
             "race": obj.race,
@@ -144,13 +255,13 @@ class TaleSerializer:
             "alignment": obj.alignment
             # the other attributes are re-initialized from the races table
         }
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_player(self, obj: Player, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def player_state(self, obj: Player) -> Dict[str, Any]:
         state = dict(vars(obj))
         # remove stuff we don't want to serialize at all
         unserialized_attrs = {"subjective", "possessive", "objective", "teleported_from", "soul",
-                              "input_is_available", "transcript", "last_input_time", "previous_commandline"}
+                              "input_is_available", "input_notifier", "transcript", "last_input_time", "previous_commandline"}
         skipped_attrs = set()
         for name in list(state):
             if name.startswith("_"):
@@ -169,9 +280,9 @@ class TaleSerializer:
         state["location"] = mudobj_ref(state["location"])
         state["inventory"] = {mudobj_ref(thing) for thing in obj.inventory}
         state["following"] = mudobj_ref(state["following"])
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_item(self, obj: Item, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def item_state(self, obj: Item) -> Dict[str, Any]:
         if obj.contained_in and obj not in obj.contained_in:
             raise TaleError("item {} containment inconsistency".format(obj))
         state = dict(vars(obj))
@@ -183,9 +294,9 @@ class TaleSerializer:
                 del state[name]
         self.add_basic_properties(state, obj)  # basic properties
         self.add_inventory_property(state, obj)  # inventory (of Container subtype)
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_living(self, obj: Living, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def living_state(self, obj: Living) -> Dict[str, Any]:
         if obj.location and obj.location is not _limbo and obj not in obj.location:
             raise TaleError("living {} location inconsistency".format(obj))
         state = dict(vars(obj))
@@ -206,9 +317,9 @@ class TaleSerializer:
         state["location"] = mudobj_ref(state["location"])
         state["inventory"] = {mudobj_ref(thing) for thing in obj.inventory}
         state["following"] = mudobj_ref(state["following"])
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_exit(self, obj: Exit, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def exit_state(self, obj: Exit) -> Dict[str, Any]:
         state = dict(vars(obj))
         # remove stuff we don't want to serialize at all
         for name in list(state):
@@ -219,9 +330,9 @@ class TaleSerializer:
         if "linked_door" in state:
             # it's probably a Door, and linked_door referes to another door (cyclic)
             state["linked_door"] = mudobj_ref(state["linked_door"])
-        ser._serialize(state, out, indentlevel)
+        return state
 
-    def serialize_location(self, obj: Location, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
+    def location_state(self, obj: Location) -> Dict[str, Any]:
         state = dict(vars(obj))
         # remove stuff we don't want to serialize at all
         for name in list(state):
@@ -232,17 +343,22 @@ class TaleSerializer:
         state["livings"] = {mudobj_ref(l) for l in state["livings"]}
         state["items"] = {mudobj_ref(i) for i in state["items"]}
         state["exits"] = {mudobj_ref(e) for e in state["exits"].values()}
-        ser._serialize(state, out, indentlevel)
+        return state
 
 
 class TaleDeserializer:
-    def deserialize(self, data):
+    def deserialize(self, data: bytes) -> Any:
+        if data.startswith(b"TALESAVE2"):
+            try:
+                return _LiteralUnpickler(io.BytesIO(self.deobfuscate(data))).load()
+            except (pickle.UnpicklingError, EOFError) as x:
+                raise ValueError("invalid savegame data: " + str(x)) from x
         return serpent.loads(self.deobfuscate(data))
 
     def deobfuscate(self, data: bytes) -> bytes:
-        if not data.startswith(b"TALESAVE1"):
+        if not data.startswith((b"TALESAVE1", b"TALESAVE2")):
             return data
-        return gzip.decompress(bytes(b ^ TaleSerializer.xor_key for b in data[9:]))
+        return gzip.decompress(data[9:].translate(_xor_table))
 
     def recreate_classes(self, literal, existing_object_lookup):
         t = type(literal)
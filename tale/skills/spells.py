@@ -25,6 +25,7 @@ def cast_heal(caster: Living, target: Living, level: int = 1) -> None:
         return
 
     target.stats.replenish_hp(5 * level)
+    target.mark_dirty()
     caster.tell("You cast a healing spell that heals %s for %d hit points" % (target.name, 5 * level), evoke=True)
     caster.tell_others("%s casts a healing spell on %s" % (caster.name, target.name), evoke=True)
 
@@ -45,6 +46,7 @@ def cast_bolt(caster: Living, target: Living, level: int = 1) -> None:
 
     hp = random.randint(1, level)
     target.stats.hp -= hp
+    target.mark_dirty()
     caster.tell("You cast an energy bolt that hits %s for %d damage" % (target.name, hp), evoke=True)
     caster.tell_others("%s casts an energy bolt that hits %s for %d damage" % (caster.name, target.name, hp), evoke=True)
 
@@ -65,6 +67,7 @@ def cast_drain(caster: Living, target: Living, level: int = 1) -> None:
     points = random.randint(1, level)
     target.stats.action_points -= points
     target.stats.magic_points -= points
+    target.mark_dirty()
 
     caster.stats.magic_points += points
 
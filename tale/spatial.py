@@ -0,0 +1,180 @@
+"""
+Spatial index over the world grid: the cells (coordinate tuples) that have a location.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import Location
+
+CHUNK_BITS = 4      # chunks are 16x16x16 cells
+CHUNK_SIZE = 1 << CHUNK_BITS
+
+Cell = Tuple[int, int, int]
+
+
+def _chunk_key(cell: Cell) -> Cell:
+    return cell[0] >> CHUNK_BITS, cell[1] >> CHUNK_BITS, cell[2] >> CHUNK_BITS
+
+
+def _axis_distance(value: int, low: int, high: int) -> int:
+    if value < low:
+        return low - value
+    if value > high:
+        return value - high
+    return 0
+
+
+class SpatialIndex(MutableMapping):
+    """
+    Maps the cells of the world grid to the locations in them, like a dict with coordinate tuples as keys.
+    The cells are also kept per chunk, so the queries over an area (range, nearest, box) only
+    look at the chunks that overlap the area instead of at every cell in the world.
+    Distances are manhattan distances, the same as Coord.distance.
+    """
+
+    def __init__(self, cells: Iterable[Tuple[Cell, Location]] = ()) -> None:
+        self._cells = dict()    # type: Dict[Cell, Location]
+        self._chunks = dict()   # type: Dict[Cell, Dict[Cell, Location]]
+        for cell, location in cells:
+            self[cell] = location
+
+    def __getitem__(self, cell: Cell) -> Location:
+        return self._cells[cell]
+
+    def get(self, cell: Cell, default: Location = None) -> Optional[Location]:
+        return self._cells.get(cell, default)
+
+    def __contains__(self, cell) -> bool:
+        return cell in self._cells
+
+    def __setitem__(self, cell: Cell, location: Location) -> None:
+        cell = tuple(cell)
+        self._cells[cell] = location
+        key = _chunk_key(cell)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = dict()
+        chunk[cell] = location
+
+    def __delitem__(self, cell: Cell) -> None:
+        del self._cells[cell]
+        key = _chunk_key(cell)
+        chunk = self._chunks[key]
+        del chunk[cell]
+        if not chunk:
+            del self._chunks[key]
+
+    def __iter__(self) -> Iterator[Cell]:
+        return iter(self._cells)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def keys(self):
+        return self._cells.keys()
+
+    def values(self):
+        return self._cells.values()
+
+    def items(self):
+        return self._cells.items()
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._chunks.clear()
+
+    def within(self, center: Cell, radius: int) -> List[Tuple[Cell, Location]]:
+        """ All the cells with a location at most radius away from the center, nearest first."""
+        cx, cy, cz = center
+        found = []
+        for cells in self._chunks_near(center, radius):
+            for cell, location in cells.items():
+                distance = abs(cell[0] - cx) + abs(cell[1] - cy) + abs(cell[2] - cz)
+                if distance <= radius:
+                    found.append((distance, cell, location))
+        found.sort(key=lambda entry: entry[0])
+        return [(cell, location) for _, cell, location in found]
+
+    def in_box(self, low: Cell, high: Cell) -> Dict[Cell, Location]:
+        """ The cells with a location in the box from low to high (both inclusive), eg. to draw a map."""
+        found = dict()   # type: Dict[Cell, Location]
+        low_key, high_key = _chunk_key(low), _chunk_key(high)
+        for key, cells in self._chunks.items():
+            if all(low_key[axis] <= key[axis] <= high_key[axis] for axis in range(3)):
+                for cell, location in cells.items():
+                    if low[0] <= cell[0] <= high[0] and low[1] <= cell[1] <= high[1] and low[2] <= cell[2] <= high[2]:
+                        found[cell] = location
+        return found
+
+    def nearest(self, center: Cell, predicate: Callable[[Location], bool] = None,
+                max_distance: int = -1) -> Tuple[Optional[Cell], Optional[Location]]:
+        """
+        The nearest cell with a location for which the predicate is true (any location if there's no predicate).
+        Chunks are visited nearest first, and the search stops when the next chunk is further away than
+        the best match. Returns (None, None) if there's no match within max_distance (-1 is no limit).
+        """
+        cx, cy, cz = center
+        best_cell, best_location, best_distance = None, None, max_distance
+        for chunk_distance, key in sorted((self._chunk_distance(key, center), key) for key in self._chunks):
+            if best_distance >= 0 and chunk_distance > best_distance:
+                break
+            for cell, location in self._chunks[key].items():
+                distance = abs(cell[0] - cx) + abs(cell[1] - cy) + abs(cell[2] - cz)
+                if (best_distance < 0 or distance < best_distance or (distance == best_distance and best_cell is None)) \
+                        and (predicate is None or predicate(location)):
+                    best_cell, best_location, best_distance = cell, location, distance
+        return best_cell, best_location
+
+    def nearest_unbuilt(self, center: Cell, max_distance: int = -1) -> Tuple[Optional[Cell], Optional[Location]]:
+        """ The nearest location that hasn't been built (described by the LLM) yet."""
+        return self.nearest(center, lambda location: not location.built, max_distance)
+
+    def nearest_free(self, center: Cell, max_distance: int, same_level: bool = True) -> Optional[Cell]:
+        """
+        The nearest cell without a location, at most max_distance away. None if all those cells are taken.
+        With same_level, only cells at the same height as the center are considered.
+        """
+        cx, cy, cz = center
+        for distance in range(max_distance + 1):
+            for cell in self._ring(cx, cy, cz, distance, same_level):
+                if cell not in self._cells:
+                    return cell
+        return None
+
+    def _ring(self, cx: int, cy: int, cz: int, distance: int, same_level: bool) -> Iterator[Cell]:
+        # the cells at exactly this manhattan distance from the center
+        if distance == 0:
+            yield cx, cy, cz
+            return
+        for dz in ((0,) if same_level else range(-distance, distance + 1)):
+            rest = distance - abs(dz)
+            for dx in range(-rest, rest + 1):
+                dy = rest - abs(dx)
+                yield cx + dx, cy + dy, cz + dz
+                if dy:
+                    yield cx + dx, cy - dy, cz + dz
+
+    def _chunks_near(self, center: Cell, radius: int) -> Iterator[Dict[Cell, Location]]:
+        low_key = _chunk_key((center[0] - radius, center[1] - radius, center[2] - radius))
+        high_key = _chunk_key((center[0] + radius, center[1] + radius, center[2] + radius))
+        chunk_count = (high_key[0] - low_key[0] + 1) * (high_key[1] - low_key[1] + 1) * (high_key[2] - low_key[2] + 1)
+        if chunk_count > len(self._chunks):
+            # a large radius in a small world: go through the chunks there are
+            for key, cells in self._chunks.items():
+                if self._chunk_distance(key, center) <= radius:
+                    yield cells
+            return
+        for x in range(low_key[0], high_key[0] + 1):
+            for y in range(low_key[1], high_key[1] + 1):
+                for z in range(low_key[2], high_key[2] + 1):
+                    cells = self._chunks.get((x, y, z))
+                    if cells and self._chunk_distance((x, y, z), center) <= radius:
+                        yield cells
+
+    def _chunk_distance(self, key: Cell, center: Cell) -> int:
+        # the smallest distance from the center to any cell in the chunk
+        return sum(_axis_distance(center[axis], key[axis] << CHUNK_BITS, ((key[axis] + 1) << CHUNK_BITS) - 1) for axis in range(3))
@@ -0,0 +1,136 @@
+"""
+Startup benchmark for large json worlds. Generates a world of the given size in the sharded
+layout, and measures how long loading the story takes and how much memory it uses, once with
+all zones loaded at startup and once with lazy zone loading.
+
+Run it with:  python -m tale.startup_benchmark [--zones 200] [--locations 50] [--npcs 5]
+
+Each measurement is done in its own process, so the memory use of one doesn't include the other.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Sequence
+
+from . import parse_utils, util
+from .base import Exit, Location
+from .coord import Coord
+from .loadgen import rss_bytes
+from .story import StoryConfig
+from .zone import Zone
+
+RESULT_MARKER = "STARTUP-RESULT "
+
+
+def _driver():
+    from .driver_if import IFDriver
+    driver = IFDriver(screen_delay=0, gui=False, web=False)
+    driver.game_clock = util.GameDateTime(datetime.datetime(year=2023, month=1, day=1), 1)
+    return driver
+
+
+def generate_world(directory: str, zones: int, locations: int, npcs: int) -> None:
+    """ Write a story config and a sharded world with the given number of zones, locations per zone and npcs per zone."""
+    from .llm.dynamic_story import DynamicStory
+    _driver()
+    config = StoryConfig()
+    config.name = "Startup benchmark"
+    config.type = "a fantasy story"
+    config.startlocation_player = "Zone 0 room 0"
+    story = DynamicStory()
+    story.config = config
+    for zone_number in range(zones):
+        zone = Zone("Zone %d" % zone_number, "A generated zone.")
+        story.add_zone(zone)
+        previous = None
+        for number in range(locations):
+            location = Location("Zone %d room %d" % (zone_number, number), "A generated room, number %d of the zone." % number)
+            location.world_location = Coord(number, zone_number, 0)
+            story.add_location(location, zone.name)
+            if previous:
+                Exit.connect(previous, [location.name, "east"], "There's another room to the east.", "",
+                             location, [previous.name, "west"], "There's another room to the west.", "")
+            previous = location
+        npc_json = [dict(name="Villager %d-%d" % (zone_number, number), type="Npc", race="human", gender="f", age=30,
+                         descr="A generated villager.", short_descr="a villager", personality="calm", occupation="farmer",
+                         location="Zone %d room %d" % (zone_number, number % locations))
+                    for number in range(npcs)]
+        story.world.npcs.update(parse_utils.load_npcs(npc_json, locations=story.locations))
+    story._shards.save(story, directory)
+    with open(os.path.join(directory, "story_config.json"), "w") as fp:
+        json.dump(parse_utils.save_story_config(config), fp)
+
+
+def measure_startup(directory: str, lazy: bool) -> Dict[str, float]:
+    """ Load the story in the directory in this process, and measure the time and memory it takes."""
+    from .json_story import JsonStory
+    driver = _driver()
+    config = parse_utils.load_story_config(parse_utils.load_json(os.path.join(directory, "story_config.json")))
+    config.lazy_zones = lazy
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    story = JsonStory(directory + os.sep, config)
+    story.init(driver)
+    startup = time.perf_counter() - start
+    gc.collect()
+    memory = rss_bytes() - rss_before
+    last_zone = max(int(name.split()[1]) for name in list(story._zones) + list(story._unloaded_zones))
+    start = time.perf_counter()
+    story.find_location("Zone %d room 0" % last_zone)
+    first_lookup = time.perf_counter() - start
+    return dict(lazy=lazy, seconds=startup, rss=memory, first_lookup=first_lookup,
+                zones_loaded=len(story._zones), locations_loaded=len(story.locations))
+
+
+def format_results(results: Sequence[dict]) -> str:
+    lines = ["%-8s %12s %14s %18s %14s" % ("mode", "startup (s)", "memory (Mb)", "first lookup (ms)", "zones loaded")]
+    for result in results:
+        lines.append("%-8s %12.3f %14.1f %18.2f %14d" % ("lazy" if result["lazy"] else "eager", result["seconds"],
+                                                       result["rss"] / 1000000, result["first_lookup"] * 1000,
+                                                       result["zones_loaded"]))
+    return "\n".join(lines)
+
+
+def run_from_cmdline(cmdline: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(description="Measure startup time and memory of a large json world, with and without lazy zone loading.")
+    parser.add_argument("--zones", type=int, default=200, help="number of zones")
+    parser.add_argument("--locations", type=int, default=50, help="locations per zone")
+    parser.add_argument("--npcs", type=int, default=5, help="npcs per zone")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)    # measure the story in this directory, in this process
+    parser.add_argument("--lazy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(cmdline)
+    if args.measure:
+        print(RESULT_MARKER + json.dumps(measure_startup(args.measure, args.lazy)))
+        return
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(pathlib.Path(__file__).parent.parent), env.get("PYTHONPATH")]))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        generate_world(directory, args.zones, args.locations, args.npcs)
+        print("%d zones, %d locations, %d npcs" % (args.zones, args.zones * args.locations, args.zones * args.npcs))
+        for lazy in (False, True):
+            process = subprocess.run([sys.executable, "-m", "tale.startup_benchmark", "--measure", directory] + (["--lazy"] if lazy else []),
+                                     env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            for line in process.stdout.splitlines():
+                if line.startswith(RESULT_MARKER):
+                    results.append(json.loads(line[len(RESULT_MARKER):]))
+                    break
+            else:
+                print("measuring failed:", process.stderr.strip().splitlines()[-1:])
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    run_from_cmdline(sys.argv[1:])
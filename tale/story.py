@@ -80,6 +80,12 @@ class StoryConfig:
         self.image_gen = None                # image generator to use for the story, or None
         self.day_night = False               # does this story have a day/night cycle?
         self.random_events = False           # does this story have random events?
+        self.autosave_interval = 0.0         # seconds between periodic saves of the changed parts of the world (0 = no autosave)
+        self.lazy_zones = False              # load the zones of a saved json story when they're first needed, instead of at startup
+        self.zone_idle_time = 0.0            # with lazy_zones: seconds without players before a zone is unloaded again (0 = never)
+        self.web_output_delay = 0.02         # seconds that browser output is held back, to send what follows it in the same frame (0 = send right away)
+        self.web_output_batch = 16384        # bytes of held back browser output after which it is sent anyway (0 = no limit)
+        self.web_compression = True          # let browsers negotiate permessage-deflate compression of the websocket frames
         
     def __eq__(self, other: Any) -> bool:
         return isinstance(other, StoryConfig) and vars(self) == vars(other)
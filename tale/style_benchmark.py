@@ -0,0 +1,147 @@
+"""
+Micro benchmark of rendering the style tags of the output (see tale.tio.style_renderer), for the
+browser (html with smartquotes), the console (ansi) and plain text. Compares the renderers with
+the conversions they replaced, on texts that repeat (like room descriptions) and on unique texts.
+
+Run it with:  python -m tale.style_benchmark [--texts 200] [--repeat 20]
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import re
+import sys
+import time
+from html import escape as html_escape
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import smartypants
+
+from .tio.console_io import ansi_renderer, style_words
+from .tio.if_browser_io import html_renderer, style_tags_html
+from .tio.style_renderer import ALL_STYLE_TAGS, StyleRenderer, plain_renderer
+
+SAMPLES = [
+    "<location>[The Prancing Llama]</> The common room is warm and smoky. A fire crackles in the hearth.",
+    "<bright>Welcome to the story!</> It's a \"dark\" and stormy night -- you'd better find shelter...",
+    "You see <dim>a rusty sword</>, <dim>a wooden shield</> and <it>a note</> here.",
+    "<monospaced>  +--------+\n  | <bright>MAP</> |\n  +--------+</monospaced>",
+    "The innkeeper says: 'What will it be, traveller?' She wipes the counter with a grey cloth.",
+    "<rev>*** The game has been saved. ***</>",
+]
+
+_legacy_tag_split_re = re.compile("(<[a-z/]+?>)")
+
+
+def legacy_smartquotes(text: str) -> str:
+    """Smartquotes as IoAdapterBase.smartquotes used to do it, smartypants for every text."""
+    return smartypants.smartypants(text, smartypants.Attr.q | smartypants.Attr.B |
+                                   smartypants.Attr.D | smartypants.Attr.e | smartypants.Attr.u)
+
+
+def legacy_html(line: str) -> str:
+    """The style tags to html, as IFBrowserIo.convert_to_html used to do it."""
+    chunks = _legacy_tag_split_re.split(line)
+    if len(chunks) == 1:
+        return html_escape(legacy_smartquotes(line), False)
+    result = []
+    close_tags_stack = []
+    chunks.append("</>")
+    for chunk in chunks:
+        html_tags = style_tags_html.get(chunk)
+        if html_tags:
+            chunk = html_tags[0]
+            close_tags_stack.append(html_tags[1])
+        elif chunk == "</>":
+            while close_tags_stack:
+                result.append(close_tags_stack.pop())
+            continue
+        elif chunk == "<clear>":
+            pass
+        elif chunk:
+            if chunk.startswith("</"):
+                chunk = "<" + chunk[2:]
+                html_tags = style_tags_html.get(chunk)
+                if html_tags:
+                    chunk = html_tags[1]
+                    if close_tags_stack:
+                        close_tags_stack.pop()
+            else:
+                chunk = html_escape(legacy_smartquotes(chunk), False)
+        result.append(chunk)
+    return "".join(result)
+
+
+def legacy_ansi(line: str) -> str:
+    """The style tags to ansi escape sequences, as ConsoleIo._apply_style used to do it."""
+    if "<" not in line:
+        return line
+    for tag, replacement in style_words.items():
+        line = line.replace("<%s>" % tag, replacement)
+    return line
+
+
+def legacy_plain(text: str) -> str:
+    """The style tags removed, as strip_text_styles used to do it."""
+    if "<" not in text:
+        return text
+    for tag in ALL_STYLE_TAGS:
+        text = text.replace("<%s>" % tag, "")
+    return text
+
+
+def make_texts(count: int, unique: bool) -> List[str]:
+    if unique:
+        return ["%s (%d)" % (SAMPLES[index % len(SAMPLES)], index) for index in range(count)]
+    return [SAMPLES[index % len(SAMPLES)] for index in range(count)]
+
+
+def _time(render: Callable[[str], str], texts: Sequence[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            render(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def run_benchmark(texts: int, repeat: int) -> List[Dict[str, float]]:
+    """ Microseconds per text for every target, with repeated texts and with unique texts."""
+    targets = [("html", legacy_html, html_renderer, True),
+               ("ansi", legacy_ansi, ansi_renderer, False),
+               ("plain", legacy_plain, plain_renderer, False)]   # type: List[Tuple[str, Callable[[str], str], StyleRenderer, bool]]
+    results = []
+    for name, legacy, renderer, quotes in targets:
+        for unique in (False, True):
+            sample = make_texts(texts, unique)
+            legacy_time = _time(legacy, sample, repeat)
+            single_pass_time = _time(lambda text: renderer._render(text, quotes), sample, repeat)
+            renderer.cache_clear()
+            if unique:
+                # every text is rendered once, so the cache only costs time
+                cached_time = _time(lambda text: renderer.render(text, quotes), make_texts(texts * repeat, True), 1)
+            else:
+                cached_time = _time(lambda text: renderer.render(text, quotes), sample, repeat)
+            results.append(dict(target=name, texts="unique" if unique else "repeated",
+                                legacy=legacy_time * 1e6, single_pass=single_pass_time * 1e6, cached=cached_time * 1e6))
+    return results
+
+
+def format_results(results: Sequence[Dict[str, float]]) -> str:
+    lines = ["%-7s %-9s %14s %14s %14s" % ("target", "texts", "legacy (us)", "1 pass (us)", "cached (us)")]
+    for result in results:
+        lines.append("%-7s %-9s %14.2f %14.2f %14.2f" % (result["target"], result["texts"], result["legacy"],
+                                                      result["single_pass"], result["cached"]))
+    return "\n".join(lines)
+
+
+def run_from_cmdline(cmdline: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(description="Compare the style tag renderers with the conversions they replaced.")
+    parser.add_argument("--texts", type=int, default=200, help="number of texts to render")
+    parser.add_argument("--repeat", type=int, default=20, help="times to render every text")
+    args = parser.parse_args(cmdline)
+    print(format_results(run_benchmark(args.texts, args.repeat)))
+
+
+if __name__ == "__main__":
+    run_from_cmdline(sys.argv[1:])
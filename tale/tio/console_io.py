@@ -17,6 +17,7 @@ except ImportError:
 
 from . import colorama_patched as colorama
 from . import styleaware_wrapper, iobase
+from .style_renderer import StyleRenderer
 from ..driver import Driver
 from ..player import PlayerConnection, Player
 from .. import mud_context
@@ -46,6 +47,9 @@ if os.name == "nt":
     if not hasattr(colorama, "win32") or colorama.win32.windll is None:
         style_words.clear()  # running on windows without colorama ansi support
 
+ansi_renderer = StyleRenderer({"<%s>" % word: (code, "") for word, code in style_words.items() if not word.startswith("/")},
+                              reset=style_words.get("/", ""))
+
 
 class ConsoleIo(iobase.IoAdapterBase):
     """
@@ -210,9 +214,7 @@ class ConsoleIo(iobase.IoAdapterBase):
         if "<" not in line:
             return line
         elif style_words and do_styles:
-            for tag, replacement in style_words.items():
-                line = line.replace("<%s>" % tag, replacement)
-            return line
+            return ansi_renderer.render(line)
         else:
             return iobase.strip_text_styles(line)       # type: ignore
 
@@ -0,0 +1,55 @@
+"""
+Headless I/O adapter, for benchmarks and simulated players.
+Nothing is shown anywhere, output is counted (and optionally kept) and input is put in by the caller.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import threading
+from typing import Any, List, Sequence, Tuple
+
+from . import iobase
+
+
+class HeadlessIo(iobase.IoAdapterBase):
+    """
+    I/O adapter without a screen. The prompted event is set whenever the driver writes
+    an input prompt, which means the previous command has been handled.
+    """
+    def __init__(self, player_connection, keep_output: bool=False) -> None:
+        super().__init__(player_connection)
+        self.do_prompt_toolkit = False
+        self.supports_smartquotes = False
+        self.keep_output = keep_output
+        self.lines = []     # type: List[str]
+        self.output_chars = 0
+        self.prompted = threading.Event()
+
+    def singleplayer_mainloop(self, player_connection) -> None:
+        raise RuntimeError("this I/O adapter is for multiplayer (mud) mode")
+
+    def render_output(self, paragraphs: Sequence[Tuple[str, bool]], **params: Any) -> str:
+        return "\n".join(iobase.strip_text_styles(text) for text, _ in paragraphs)
+
+    def output(self, *lines: str) -> None:
+        super().output(*lines)
+        self._store(lines)
+
+    def output_no_newline(self, text: str, new_paragraph=True) -> None:
+        super().output_no_newline(text, new_paragraph)
+        self._store([text])
+
+    def write_input_prompt(self) -> None:
+        self.prompted.set()
+
+    def pause(self, unpause: bool=False) -> None:
+        pass
+
+    def send_data(self, data: str) -> None:
+        self.output_chars += len(data)
+
+    def _store(self, lines: Sequence[str]) -> None:
+        self.output_chars += sum(len(line) for line in lines)
+        if self.keep_output:
+            self.lines.extend(lines)
@@ -8,19 +8,20 @@ import json
 import time
 import asyncio
 from html import escape as html_escape
+from collections import Counter
 from threading import Lock, Event, Thread
-from typing import Sequence, Tuple, Any, Optional, Dict, List
+from typing import Sequence, Tuple, Any, Optional, Dict, List, Callable
 
 from tale.web.web_utils import create_chat_container, dialogue_splitter
 
 from . import iobase
 from .. import mud_context, vfs, lang
-from .styleaware_wrapper import tag_split_re
+from .style_renderer import StyleRenderer
 from .. import __version__ as tale_version_str
 from ..driver import Driver
 from ..player import PlayerConnection
 
-__all__ = ["HttpIo", "TaleFastAPIApp"]
+__all__ = ["HttpIo", "TaleFastAPIApp", "OutputStats", "RoomState", "serve_websocket"]
 
 # Try to import FastAPI-related dependencies
 try:
@@ -45,6 +46,29 @@ style_tags_html = {
     "<location>": ("<span class='txt-location'>", "</span>"),
     "<monospaced>": ("<span class='txt-monospaced'>", "</span>")
 }
+html_renderer = StyleRenderer({tag: html for tag, html in style_tags_html.items() if tag != "</>"},
+                              escape=lambda text: html_escape(text, False))
+
+
+class OutputStats:
+    """The frames and bytes sent to the browser over the websocket of a connection (the bytes before compression)."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+        self.entries = 0    # output entries (lines, tokens, images) that went into those frames
+
+    def sent(self, text: str, entries: int = 1) -> None:
+        self.frames += 1
+        self.bytes += len(text.encode("utf-8"))
+        self.entries += entries
+
+    def rates(self) -> Dict[str, float]:
+        seconds = max(time.monotonic() - self.started, 0.001)
+        return dict(frames=self.frames, bytes=self.bytes, seconds=seconds,
+                    frames_per_second=self.frames / seconds, bytes_per_second=self.bytes / seconds,
+                    entries_per_frame=self.entries / self.frames if self.frames else 0.0)
 
 
 class HttpIo(iobase.IoAdapterBase):
@@ -60,25 +84,69 @@ class HttpIo(iobase.IoAdapterBase):
         self.__html_special = []       # type: List[str]   # special out of band commands (such as 'clear')
         self.__html_to_browser_lock = Lock()
         self.__new_html_available = Event()
-        self.__data_to_browser = []
+        self.__data_to_browser = []    # type: List[str]
+        self.__output_queue = None     # type: Optional[asyncio.Queue]  # output for the connected websocket, see connect_output
+        self.__output_loop = None      # type: Optional[asyncio.AbstractEventLoop]
+        self.__destroyed = False
+        self.output_stats = OutputStats()
 
     def destroy(self) -> None:
         self.__new_html_available.set()
+        with self.__html_to_browser_lock:
+            queue, loop = self.__output_queue, self.__output_loop
+            self.__destroyed = True
+        if queue is not None:
+            self._put_threadsafe(loop, queue, None)     # tells the websocket that there will be no more output
 
-    def append_html_to_browser(self, text: str) -> None:
+    def connect_output(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """
+        From now on, the output is put on an asyncio queue on the loop (of a websocket handler), instead of in the buffers.
+        The queue gets ("html", text), ("special", text) and ("data", data) entries, and None when the io is destroyed.
+        Output that was buffered before is put on the queue first.
+        """
+        queue = asyncio.Queue()   # type: asyncio.Queue
+        self.output_stats = OutputStats()
         with self.__html_to_browser_lock:
-            self.__html_to_browser.append(text)
-            self.__new_html_available.set()
+            for kind, buffer in (("html", self.__html_to_browser), ("special", self.__html_special), ("data", self.__data_to_browser)):
+                for text in buffer:
+                    queue.put_nowait((kind, text))
+                buffer.clear()
+            if self.__destroyed:
+                queue.put_nowait(None)
+            self.__output_queue, self.__output_loop = queue, loop
+        return queue
 
-    def append_html_special(self, text: str) -> None:
+    def disconnect_output(self) -> None:
+        """Output goes to the buffers again."""
         with self.__html_to_browser_lock:
-            self.__html_special.append(text)
-            self.__new_html_available.set()
+            self.__output_queue = self.__output_loop = None
 
-    def append_data_to_browser(self, data: str) -> None:
+    def _push(self, kind: str, *texts: str) -> None:
         with self.__html_to_browser_lock:
-            self.__data_to_browser.append(data)
-            self.__new_html_available.set()
+            queue, loop = self.__output_queue, self.__output_loop
+            if queue is None:
+                buffer = self.__data_to_browser if kind == "data" else self.__html_special if kind == "special" else self.__html_to_browser
+                buffer.extend(texts)
+                self.__new_html_available.set()
+                return
+        for text in texts:
+            self._put_threadsafe(loop, queue, (kind, text))
+
+    @staticmethod
+    def _put_threadsafe(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, entry: Optional[Tuple[str, str]]) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, entry)
+        except RuntimeError:
+            pass    # the event loop is closed, the browser is gone
+
+    def append_html_to_browser(self, text: str) -> None:
+        self._push("html", text)
+
+    def append_html_special(self, text: str) -> None:
+        self._push("special", text)
+
+    def append_data_to_browser(self, data: str) -> None:
+        self._push("data", data)
 
     def get_html_to_browser(self) -> List[str]:
         with self.__html_to_browser_lock:
@@ -135,27 +203,25 @@ class HttpIo(iobase.IoAdapterBase):
     def render_output(self, paragraphs: Sequence[Tuple[str, bool]], **params: Any) -> str:
         if not paragraphs:
             return ""
-        with self.__html_to_browser_lock:
-            for text, formatted in paragraphs:
-                text = self.convert_to_html(text)
-                if text == "\n":
-                    text = "<br>"
-                if dialogue_splitter in text:
-                    text = create_chat_container(text)
-                    self.__html_to_browser.append("<p>" + text + "</p>\n")
-                elif formatted:
-                    self.__html_to_browser.append("<p>" + text + "</p>\n")
-                else:
-                    self.__html_to_browser.append("<pre>" + text + "</pre>\n")
-            self.__new_html_available.set()
+        html = []
+        for text, formatted in paragraphs:
+            text = self.convert_to_html(text)
+            if text == "\n":
+                text = "<br>"
+            if dialogue_splitter in text:
+                text = create_chat_container(text)
+                html.append("<p>" + text + "</p>\n")
+            elif formatted:
+                html.append("<p>" + text + "</p>\n")
+            else:
+                html.append("<pre>" + text + "</pre>\n")
+        self._push("html", *html)
         return ""    # the output is pushed to the browser via a buffer, rather than printed to a screen
 
     def output(self, *lines: str) -> None:
         super().output(*lines)
-        with self.__html_to_browser_lock:
-            for line in lines:
-                self.output_no_newline(line)
-            self.__new_html_available.set()
+        for line in lines:
+            self.output_no_newline(line)
 
     def output_no_newline(self, text: str, new_paragraph = True) -> None:
         super().output_no_newline(text, new_paragraph)
@@ -163,49 +229,184 @@ class HttpIo(iobase.IoAdapterBase):
         if text == "\n":
             text = "<br>"
         if new_paragraph:
-            self.__html_to_browser.append("<p>" + text + "</p>\n")
+            self._push("html", "<p>" + text + "</p>\n")
         else:
-            self.__html_to_browser.append(text.replace("\\n", "<br>"))
-        self.__new_html_available.set()
+            self._push("html", text.replace("\\n", "<br>"))
 
     def convert_to_html(self, line: str) -> str:
         """Convert style tags to html"""
-        chunks = tag_split_re.split(line)
-        if len(chunks) == 1:
-            # optimization in case there are no markup tags in the text at all
-            return html_escape(self.smartquotes(line), False)
-        result = []
-        close_tags_stack = []
-        chunks.append("</>")   # add a reset-all-styles sentinel
-        for chunk in chunks:
-            html_tags = style_tags_html.get(chunk)
-            if html_tags:
-                chunk = html_tags[0]
-                close_tags_stack.append(html_tags[1])
-            elif chunk == "</>":
-                while close_tags_stack:
-                    result.append(close_tags_stack.pop())
-                continue
-            elif chunk == "<clear>":
-                self.append_html_special("clear")
-            elif chunk:
-                if chunk.startswith("</"):
-                    chunk = "<" + chunk[2:]
-                    html_tags = style_tags_html.get(chunk)
-                    if html_tags:
-                        chunk = html_tags[1]
-                        if close_tags_stack:
-                            close_tags_stack.pop()
-                else:
-                    # normal text (not a tag)
-                    chunk = html_escape(self.smartquotes(chunk), False)
-            result.append(chunk)
-        return "".join(result)
+        if "<clear>" in line:
+            self.append_html_special("clear")
+        return html_renderer.render(line, self.supports_smartquotes and self.do_smartquotes)
     
     def send_data(self, data: str) -> None:
         self.append_data_to_browser(data)
 
 
+class RoomState:
+    """
+    The npcs, items and exits of the room the player is in, as the browser last got them.
+    When the player enters a room the whole state is sent (a snapshot), after that only what was
+    added or removed (a delta), and only when the room changed (see Location.look_version).
+    Every update gets the next version number, so the browser can check that it didn't miss one.
+    """
+    KINDS = ("npcs", "items", "exits")
+
+    def __init__(self) -> None:
+        self.version = 0
+        self._location_vnum = None     # type: Optional[int]
+        self._look_version = -1
+        self._contents = {kind: Counter() for kind in self.KINDS}   # type: Dict[str, Counter]
+
+    @staticmethod
+    def contents(player: Any, location: Any) -> Dict[str, Counter]:
+        """The names of what the player can see in the location, with how many there are of each."""
+        if not location:
+            return {kind: Counter() for kind in RoomState.KINDS}
+        return {
+            "npcs": Counter(l.name for l in location.livings if l.alive and l.visible and l != player),
+            "items": Counter(i.name for i in location.items if i.visible),
+            "exits": Counter(set(e.name for e in location.exits.values() if e.visible)),
+        }
+
+    def update(self, player: Any, location: Any) -> Optional[Dict[str, Any]]:
+        """The update for the browser (snapshot or delta), or None if nothing changed since the last one."""
+        vnum = location.vnum if location else None
+        look_version = location.look_version if location else 0
+        if self.version and vnum == self._location_vnum and look_version == self._look_version:
+            return None
+        contents = self.contents(player, location)
+        if self.version and vnum == self._location_vnum:
+            added = {kind: sorted((contents[kind] - self._contents[kind]).elements()) for kind in self.KINDS}
+            removed = {kind: sorted((self._contents[kind] - contents[kind]).elements()) for kind in self.KINDS}
+            self._look_version = look_version
+            self._contents = contents
+            if not any(added.values()) and not any(removed.values()):
+                return None
+            self.version += 1
+            update = {"version": self.version}     # type: Dict[str, Any]
+            added = {kind: names for kind, names in added.items() if names}
+            removed = {kind: names for kind, names in removed.items() if names}
+            if added:
+                update["added"] = added
+            if removed:
+                update["removed"] = removed
+            return update
+        self._location_vnum = vnum
+        self._look_version = look_version
+        self._contents = contents
+        self.version += 1
+        update = {"version": self.version, "full": True}
+        for kind in self.KINDS:
+            update[kind] = sorted(contents[kind].elements())
+        return update
+
+
+def text_message(conn: PlayerConnection, io: HttpIo, html: List[str], special: List[str], room_state: RoomState) -> Dict[str, Any]:
+    """The websocket message with html output, and the changes in the room the player is in."""
+    player = conn.player
+    location = player.location if player else None
+    if io.dont_echo_next_cmd:
+        special.append("noecho")
+    message = {
+        "type": "text",
+        "text": "\n".join(html),
+        "special": special,
+        "turns": player.turns if player else 0,
+        "location": location.title if location else "???",
+        "location_image": location.avatar if location and location.avatar else "",
+    }
+    room = room_state.update(player, location)
+    if room:
+        message["room"] = room
+    return message
+
+
+async def serve_websocket(websocket: Any, conn: PlayerConnection, handle_input: Callable[[str], None], *,
+                          delay: float = 0.0, max_batch: int = 0) -> None:
+    """
+    Runs the websocket of a player connection, as two tasks: one sends the output to the browser as soon
+    as it is put on the output queue of the io (see HttpIo.connect_output), the other handles the input.
+    With a delay, the output that arrives within that many seconds (or until there are max_batch bytes of it)
+    is sent in one frame, so a streamed LLM answer isn't sent as a frame per token.
+    When the io is destroyed, the websocket is closed. If the browser disconnects, the WebSocketDisconnect is raised.
+    """
+    io = conn.io
+    queue = io.connect_output(asyncio.get_running_loop())
+    sender = asyncio.ensure_future(_send_output(websocket, conn, io, queue, delay, max_batch))
+    receiver = asyncio.ensure_future(_receive_input(websocket, handle_input))
+    try:
+        done, _ = await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        io.disconnect_output()
+        sender.cancel()
+        receiver.cancel()
+    for task in done:
+        task.result()
+    if sender in done:
+        await websocket.close()
+
+
+async def _next_output(queue: asyncio.Queue, delay: float, max_batch: int) -> List[Optional[Tuple[str, str]]]:
+    # waits for output, and then for the output that follows it within the delay
+    entries = [await queue.get()]   # type: List[Optional[Tuple[str, str]]]
+    if delay > 0 and entries[0] is not None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
+        size = len(entries[0][1])
+        while not max_batch or size < max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            entries.append(entry)
+            if entry is None:
+                return entries
+            size += len(entry[1])
+    while not queue.empty():
+        entries.append(queue.get_nowait())
+    return entries
+
+
+async def _send_output(websocket: Any, conn: PlayerConnection, io: HttpIo, queue: asyncio.Queue,
+                       delay: float = 0.0, max_batch: int = 0) -> None:
+    room_state = RoomState()
+    stats = io.output_stats
+    while True:
+        entries = await _next_output(queue, delay, max_batch)
+        html = []      # type: List[str]
+        special = []   # type: List[str]
+        data = []      # type: List[str]
+        for entry in entries:
+            if entry is None:
+                break
+            kind, text = entry
+            if kind == "html":
+                html.append(text)
+            elif kind == "special":
+                special.append(text)
+            else:
+                data.append(text)
+        if html or special:
+            text = json.dumps(text_message(conn, io, html, special, room_state))
+            await websocket.send_text(text)
+            stats.sent(text, len(html) + len(special))
+        for d in data:
+            text = json.dumps({"type": "data", "data": d})
+            await websocket.send_text(text)
+            stats.sent(text)
+        if None in entries:
+            return
+
+
+async def _receive_input(websocket: Any, handle_input: Callable[[str], None]) -> None:
+    while True:
+        handle_input(await websocket.receive_text())
+
+
 if FASTAPI_AVAILABLE:
     class TaleFastAPIApp:
         """
@@ -305,61 +506,10 @@ if FASTAPI_AVAILABLE:
                 await websocket.send_text(json.dumps({"type": "connected"}))
                 
                 try:
-                    while self.driver.is_running():
-                        # Check for server output first
-                        has_output = False
-                        if player.io:
-                            # Check for HTML output
-                            html = player.io.get_html_to_browser()
-                            special = player.io.get_html_special()
-                            data_items = player.io.get_data_to_browser()
-                            
-                            if html or special:
-                                location = player.player.location
-                                if player.io.dont_echo_next_cmd:
-                                    special.append("noecho")
-                                npc_names = ''
-                                items = ''
-                                exits = ''
-                                if location:
-                                    npc_names = ','.join([l.name for l in location.livings if l.alive and l.visible and l != player.player])
-                                    items = ','.join([i.name for i in location.items if i.visible])
-                                    exits = ','.join(list(set([e.name for e in location.exits.values() if e.visible])))
-                                
-                                response = {
-                                    "type": "text",
-                                    "text": "\n".join(html),
-                                    "special": special,
-                                    "turns": player.player.turns,
-                                    "location": location.title if location else "???",
-                                    "location_image": location.avatar if location and location.avatar else "",
-                                    "npcs": npc_names if location else '',
-                                    "items": items if location else '',
-                                    "exits": exits if location else '',
-                                }
-                                await websocket.send_text(json.dumps(response))
-                                has_output = True
-                            elif data_items:
-                                for d in data_items:
-                                    response = {"type": "data", "data": d}
-                                    await websocket.send_text(json.dumps(response))
-                                has_output = True
-                        else:
-                            break
-                        
-                        # Handle player input with adaptive timeout
-                        # Use shorter timeout if we just sent output (expecting response)
-                        # Use longer timeout if idle (reduce CPU usage)
-                        timeout = 0.1 if has_output else 0.5
-                        try:
-                            data = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
-                            self._handle_player_input(player, data)
-                        except asyncio.TimeoutError:
-                            # No input received, continue loop
-                            if not has_output:
-                                # Nothing happened, wait a bit longer to reduce CPU usage
-                                await asyncio.sleep(0.1)
-                            
+                    # output is pushed to the browser as soon as there is any, no polling
+                    config = self.driver.story.config
+                    await serve_websocket(websocket, player, lambda data: self._handle_player_input(player, data),
+                                          delay=config.web_output_delay, max_batch=config.web_output_batch)
                 except WebSocketDisconnect:
                     print(f"WebSocket disconnected for player {player.player.name if player and player.player else 'unknown'}")
                     self._cleanup_player(player)
@@ -438,7 +588,8 @@ if FASTAPI_AVAILABLE:
                 self.app,
                 host=host,
                 port=port,
-                log_level="warning"
+                log_level="warning",
+                ws_per_message_deflate=self.driver.story.config.web_compression
             )
             if self.use_ssl and self.ssl_certs:
                 config.ssl_certfile = self.ssl_certs[0]
@@ -7,27 +7,16 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 import sys
 from typing import Union, Sequence, Any, Tuple, Optional, List
 import smartypants
+from .style_renderer import ALL_STYLE_TAGS, plain_renderer, smartquotes
 from .. import verbdefs
 from ..util import format_traceback
 
 
-smartypants.process_escapes = lambda txt: txt  # disable the html escape processing
-smartypants.tags_to_skip = ["abcdefghijklmnopqrstuvwxyz@"]   # setting it to empty list doesn't have the required effect
-
-ALL_STYLE_TAGS = {"dim", "normal", "bright", "ul", "it", "rev", "clear", "location", "monospaced", "/monospaced", "/"}
-
-
 def strip_text_styles(text: Union[str, Sequence[str]]) -> Union[str, Sequence[str]]:
     """remove any special text styling tags from the text (you can pass a single string, and also a list of strings)"""
-    def strip(text: str) -> str:
-        if "<" not in text:
-            return text
-        for tag in ALL_STYLE_TAGS:
-            text = text.replace("<%s>" % tag, "")
-        return text
     if isinstance(text, str):
-        return strip(text)
-    return [strip(line) for line in text]
+        return plain_renderer.render(text)
+    return [plain_renderer.render(line) for line in text]
 
 
 class IoAdapterBase:
@@ -81,15 +70,7 @@ class IoAdapterBase:
     def smartquotes(self, text: str) -> str:
         """If enabled, apply 'smart quotes' to the text; replaces quotes and dashes by nicer looking symbols"""
         if self.supports_smartquotes and self.do_smartquotes:
-            if hasattr(smartypants.Attr, "u"):
-                return smartypants.smartypants(text, smartypants.Attr.q | smartypants.Attr.B |
-                                               smartypants.Attr.D | smartypants.Attr.e | smartypants.Attr.u)
-            else:
-                # older smartypants lack attribute 'u' for avoiding html entity creation
-                txt = smartypants.smartypants(text, smartypants.Attr.q | smartypants.Attr.B |
-                                              smartypants.Attr.D | smartypants.Attr.e)
-                import html.parser
-                return html.parser.unescape(txt)    # type: ignore
+            return smartquotes(text)
         return text
 
     def output(self, *lines: str) -> None:
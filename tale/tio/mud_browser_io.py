@@ -16,7 +16,7 @@ from threading import Lock
 from typing import Dict, Any, List, Tuple, Optional
 
 from .. import vfs
-from .if_browser_io import HttpIo
+from .if_browser_io import HttpIo, serve_websocket
 from .. import __version__ as tale_version_str
 from ..driver import Driver
 from ..player import PlayerConnection
@@ -28,10 +28,6 @@ import uvicorn
 
 __all__ = ["MudHttpIo", "TaleMudFastAPIApp"]
 
-# Timeout constants for WebSocket communication (in seconds)
-WEBSOCKET_TIMEOUT_ACTIVE = 0.1   # Timeout when there's active output
-WEBSOCKET_TIMEOUT_IDLE = 0.5     # Timeout when idle
-
 
 class MudHttpIo(HttpIo):
     """
@@ -184,58 +180,10 @@ class TaleMudFastAPIApp:
             await websocket.send_text(json.dumps({"type": "connected"}))
             
             try:
-                while self.driver.is_running():
-                    # Check for server output first
-                    has_output = False
-                    if conn.io and conn.player:
-                        # Check for HTML output
-                        html = conn.io.get_html_to_browser()
-                        special = conn.io.get_html_special()
-                        data_items = conn.io.get_data_to_browser()
-                        
-                        if html or special:
-                            location = conn.player.location
-                            if conn.io.dont_echo_next_cmd:
-                                special.append("noecho")
-                            npc_names = ''
-                            items = ''
-                            exits = ''
-                            if location:
-                                npc_names = ','.join([l.name for l in location.livings if l.alive and l.visible and l != conn.player])
-                                items = ','.join([i.name for i in location.items if i.visible])
-                                exits = ','.join(list(set([e.name for e in location.exits.values() if e.visible])))
-                            
-                            response = {
-                                "type": "text",
-                                "text": "\n".join(html),
-                                "special": special,
-                                "turns": conn.player.turns,
-                                "location": location.title if location else "???",
-                                "location_image": location.avatar if location and location.avatar else "",
-                                "npcs": npc_names if location else '',
-                                "items": items if location else '',
-                                "exits": exits if location else '',
-                            }
-                            await websocket.send_text(json.dumps(response))
-                            has_output = True
-                        elif data_items:
-                            for d in data_items:
-                                response = {"type": "data", "data": d}
-                                await websocket.send_text(json.dumps(response))
-                            has_output = True
-                    else:
-                        break
-                    
-                    # Handle player input with adaptive timeout
-                    timeout = WEBSOCKET_TIMEOUT_ACTIVE if has_output else WEBSOCKET_TIMEOUT_IDLE
-                    try:
-                        data = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
-                        self._handle_player_input(conn, data)
-                    except asyncio.TimeoutError:
-                        # No input received, continue loop
-                        if not has_output:
-                            await asyncio.sleep(WEBSOCKET_TIMEOUT_ACTIVE)
-                        
+                # output is pushed to the browser as soon as there is any, no polling
+                config = self.driver.story.config
+                await serve_websocket(websocket, conn, lambda data: self._handle_player_input(conn, data),
+                                      delay=config.web_output_delay, max_batch=config.web_output_batch)
             except WebSocketDisconnect:
                 print(f"WebSocket disconnected for player {conn.player.name if conn and conn.player else 'unknown'}")
                 self._cleanup_player(conn, sid)
@@ -300,7 +248,8 @@ class TaleMudFastAPIApp:
             self.app,
             host=host,
             port=port,
-            log_level="warning"
+            log_level="warning",
+            ws_per_message_deflate=self.driver.story.config.web_compression
         )
         if self.use_ssl and self.ssl_certs:
             config.ssl_certfile = self.ssl_certs[0]
@@ -0,0 +1,116 @@
+"""
+Renders text with Tale's style tags (<bright>, <dim>, </> etc.) for an output target: html for
+the browser, ansi escape sequences for the console, or plain text without the tags.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import functools
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import smartypants
+
+smartypants.process_escapes = lambda txt: txt  # disable the html escape processing
+smartypants.tags_to_skip = ["abcdefghijklmnopqrstuvwxyz@"]   # setting it to empty list doesn't have the required effect
+
+ALL_STYLE_TAGS = {"dim", "normal", "bright", "ul", "it", "rev", "clear", "location", "monospaced", "/monospaced", "/"}
+
+CACHE_SIZE = 2048       # rendered texts remembered per renderer
+MAX_CACHED_LENGTH = 4096    # longer texts are rendered every time, they are rarely repeated
+
+_OPEN, _CLOSE, _RESET = range(3)
+
+_smartquotes_chars_re = re.compile(r"['\"`]|--|\.\s?\.\s?\.|&#")
+
+
+def smartquotes(text: str) -> str:
+    """Replaces quotes and dashes by nicer looking symbols."""
+    if not _smartquotes_chars_re.search(text):
+        return text     # nothing to replace, and smartypants takes a while even for that
+    if hasattr(smartypants.Attr, "u"):
+        return smartypants.smartypants(text, smartypants.Attr.q | smartypants.Attr.B |
+                                       smartypants.Attr.D | smartypants.Attr.e | smartypants.Attr.u)
+    # older smartypants lack attribute 'u' for avoiding html entity creation
+    txt = smartypants.smartypants(text, smartypants.Attr.q | smartypants.Attr.B |
+                                  smartypants.Attr.D | smartypants.Attr.e)
+    import html.parser
+    return html.parser.unescape(txt)    # type: ignore
+
+
+class StyleRenderer:
+    """
+    Renders the style tags of a text for one output target, in a single pass over the text.
+    The tags maps every style tag ("<bright>") to the text that starts the style and the text that ends it,
+    or to None if the tag is simply left out. A style ends at its closing tag ("</bright>"), at the "</>" tag
+    (that ends all styles and is replaced by reset), or at the end of the text. Anything that isn't
+    one of the tags is text, it is passed through escape (and smartquotes, if asked for).
+    The rendered texts are remembered, because the same texts (room descriptions, banners) come by often.
+    """
+    def __init__(self, tags: Dict[str, Optional[Tuple[str, str]]], reset: str = "",
+                 escape: Callable[[str], str] = None, cache_size: int = CACHE_SIZE) -> None:
+        self.escape = escape
+        self.reset = reset
+        self._actions = {"</>": (_RESET, "", "")}   # type: Dict[str, Tuple[int, str, str]]
+        for tag, replacement in tags.items():
+            start, end = replacement or ("", "")
+            self._actions[tag] = (_OPEN, start, end)
+            self._actions.setdefault("</" + tag[1:], (_CLOSE, "", ""))
+        self._split = re.compile("(%s)" % "|".join(re.escape(tag) for tag in sorted(self._actions, key=len, reverse=True))).split
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._render)
+
+    def split(self, text: str) -> List[str]:
+        """The text split in text and tags: the even indexes are text (possibly empty), the odd ones are tags."""
+        return self._split(text)
+
+    def is_tag(self, chunk: str) -> bool:
+        return chunk in self._actions
+
+    def render(self, text: str, quotes: bool = False) -> str:
+        """The text with its style tags rendered, and with smartquotes if quotes is true."""
+        if len(text) > MAX_CACHED_LENGTH:
+            return self._render(text, quotes)
+        return self._cached(text, quotes)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def cache_clear(self) -> None:
+        self._cached.cache_clear()
+
+    def _text(self, text: str, quotes: bool) -> str:
+        if quotes:
+            text = smartquotes(text)
+        return self.escape(text) if self.escape else text
+
+    def _render(self, text: str, quotes: bool) -> str:
+        if "<" not in text:
+            return self._text(text, quotes)
+        chunks = self._split(text)
+        result = []     # type: List[str]
+        open_styles = []     # type: List[str]
+        actions = self._actions
+        for index, chunk in enumerate(chunks):
+            if index % 2 == 0:
+                # text between the tags
+                if chunk:
+                    result.append(self._text(chunk, quotes))
+                continue
+            action, start, end = actions[chunk]
+            if action == _OPEN:
+                result.append(start)
+                open_styles.append(end)
+            elif action == _CLOSE:
+                if open_styles:
+                    result.append(open_styles.pop())
+            else:
+                while open_styles:
+                    result.append(open_styles.pop())
+                result.append(self.reset)
+        while open_styles:
+            result.append(open_styles.pop())
+        return "".join(result)
+
+
+plain_renderer = StyleRenderer({"<%s>" % tag: None for tag in ALL_STYLE_TAGS if not tag.startswith("/")})
@@ -4,12 +4,10 @@ Textwrapper that doesn't count the length of the embedded formatting tags.
 'Tale' mud driver, mudlib and interactive fiction framework
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
-import re
 import textwrap
 from typing import List
 
-tag_split_re = re.compile("(<[a-z/]+?>)")
-tag_re = re.compile("<[a-z/]+?>$")
+from .style_renderer import plain_renderer
 
 
 class StyleTagsAwareTextWrapper(textwrap.TextWrapper):
@@ -27,7 +25,7 @@ class StyleTagsAwareTextWrapper(textwrap.TextWrapper):
         # split any style tags <abcde> or </> into separate chunks
         chunks2 = []
         for chunk in chunks:
-            chunks2.extend(tag_split_re.split(chunk))
+            chunks2.extend(plain_renderer.split(chunk))
         chunks = chunks2
         del chunks2
 
@@ -48,7 +46,7 @@ class StyleTagsAwareTextWrapper(textwrap.TextWrapper):
                 if not chunk:
                     chunks.pop()
                     continue
-                length = 0 if tag_re.match(chunk) else len(chunk)   # don't count length of any styling tags
+                length = 0 if plain_renderer.is_tag(chunk) else len(chunk)   # don't count length of any styling tags
                 if cur_len + length <= width:
                     cur_line.append(chunks.pop())
                     cur_len += length
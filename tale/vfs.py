@@ -221,6 +221,12 @@ class VirtualFileSystem:
         except IOError:
             pass
 
+    def replace(self, name: str, target: str) -> None:
+        """Renames the resource to target, replacing target (if it exists) in one step"""
+        if self.readonly:
+            raise VfsError("attempt to write a read-only vfs")
+        os.replace(self.validate_path(name), self.validate_path(target))
+
     def open_write(self, name: str, mimetype: str="", append: bool=False) -> IO[Any]:
         """returns a writable file io stream"""
         if self.readonly:
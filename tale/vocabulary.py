@@ -0,0 +1,161 @@
+"""
+Vocabularies for the command parser: the names of the objects in a location or an inventory.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import bisect
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+MAX_NAME_WORDS = 5     # names longer than this many words are not matched (the same bound as Soul.check_name_with_spaces)
+
+
+class _Node:
+    """A node in the trie of words. Counts the names that pass through it, so it can be pruned."""
+    __slots__ = ("count", "children")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.children = {}  # type: Dict[str, _Node]
+
+
+class Vocabulary:
+    """
+    The names and aliases of the objects in a collection (the livings or the items in a location,
+    or an inventory), so the parser can look up a name without going through all the objects.
+    It's updated when an object is added or removed, the names and aliases are read at that time,
+    and when an object in it is renamed or its aliases change (see MudObject.names_changed).
+    Names with several words are also stored in a trie of words, so a name can be matched word by word.
+    If objects were added to or removed from the collection without the vocabulary knowing about it,
+    the vocabulary is rebuilt. That is noticed when the number of objects differs, or when the object
+    found for a name is no longer in the collection.
+    """
+    def __init__(self, source: Collection[Any] = ()) -> None:
+        self.source = source
+        self._objects = {}     # type: Dict[str, List[Any]]  # name -> objects with that name, the last added is used
+        self._names = {}       # type: Dict[Any, Tuple[str, ...]]  # object -> the names it was added with
+        self._trie = _Node()
+        self._sorted = None    # type: Optional[List[str]]  # all names in order, for prefix searches
+        for obj in source:
+            self.add(obj)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __getitem__(self, name: str) -> Any:
+        obj = self.get(name)
+        if obj is None:
+            raise KeyError(name)
+        return obj
+
+    def add(self, obj: Any) -> None:
+        if obj in self._names:
+            self.remove(obj)
+        names = tuple({obj.name, *obj.aliases})
+        self._names[obj] = names
+        for name in names:
+            objects = self._objects.get(name)
+            if objects is None:
+                self._objects[name] = [obj]
+                self._add_words(name)
+            else:
+                objects.append(obj)
+
+    def remove(self, obj: Any) -> None:
+        for name in self._names.pop(obj, ()):
+            objects = self._objects[name]
+            objects.remove(obj)
+            if not objects:
+                del self._objects[name]
+                self._remove_words(name)
+
+    def refresh(self, obj: Any) -> None:
+        """Read the names and aliases of the object again, if it's in the vocabulary."""
+        if obj in self._names:
+            self.add(obj)
+
+    def clear(self) -> None:
+        self._objects.clear()
+        self._names.clear()
+        self._trie = _Node()
+        self._sorted = None
+
+    def rebuild(self) -> None:
+        self.clear()
+        for obj in self.source:
+            self.add(obj)
+
+    def get(self, name: str) -> Any:
+        """The object with this name or alias, None if there is none."""
+        self._check_size()
+        objects = self._objects.get(name)
+        if not objects:
+            return None
+        obj = objects[-1]
+        if obj not in self.source:
+            # the collection was changed behind our back
+            self.rebuild()
+            objects = self._objects.get(name)
+            return objects[-1] if objects else None
+        return obj
+
+    def match(self, words: Sequence[str], start: int) -> Tuple[Any, str, int]:
+        """
+        Match the shortest name that starts at words[start], following the trie word by word.
+        Returns (object, name, number of words), or (None, "", 0) if no name matches.
+        """
+        self._check_size()
+        node = self._trie
+        for index in range(start, min(len(words), start + MAX_NAME_WORDS)):
+            node = node.children.get(words[index])    # type: ignore
+            if node is None:
+                break
+            name = " ".join(words[start:index + 1])
+            if name in self._objects:
+                obj = self.get(name)
+                if obj is not None:
+                    return obj, name, index - start + 1
+                return self.match(words, start)     # the vocabulary was rebuilt, try again
+        return None, "", 0
+
+    def startswith(self, prefix: str) -> Optional[str]:
+        """A name that starts with the prefix, or None."""
+        self._check_size()
+        if self._sorted is None:
+            self._sorted = sorted(self._objects)
+        index = bisect.bisect_left(self._sorted, prefix)
+        if index < len(self._sorted) and self._sorted[index].startswith(prefix):
+            return self._sorted[index]
+        return None
+
+    def _check_size(self) -> None:
+        if len(self._names) != len(self.source):
+            # objects were added or removed behind our back
+            self.rebuild()
+
+    def _add_words(self, name: str) -> None:
+        self._sorted = None
+        node = self._trie
+        for word in name.split():
+            child = node.children.get(word)
+            if child is None:
+                child = node.children[word] = _Node()
+            child.count += 1
+            node = child
+
+    def _remove_words(self, name: str) -> None:
+        self._sorted = None
+        node = self._trie
+        for word in name.split():
+            child = node.children.get(word)
+            if child is None:
+                return
+            child.count -= 1
+            if child.count == 0:
+                del node.children[word]
+                return
+            node = child
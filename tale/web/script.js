@@ -111,30 +111,12 @@ function process_text(json)
             document.getElementById("player-location").innerHTML = json["location"];
             txtdiv.innerHTML += json["text"];
             if(!document.smoothscrolling_busy) smoothscroll(txtdiv, 0);
-            if (json.hasOwnProperty("npcs")) {
-                const npcs = json["npcs"];
-                populateNpcDropdown(npcs);
-                populateNpcImages(npcs);
-                
-                const npcsArray = npcs.split(',');
-                let npcConcat = '';
-                for (let i = 0; i < npcsArray.length; i++) {
-                    const npcContainer = document.createElement('div'); // Create a container div for each NPC
-                    const npcName = npcsArray[i].trim();
-                    npcContainer.appendChild(document.createTextNode(npcName));
-                    npcConcat += npcContainer.outerHTML;
-                }
-                document.getElementById('npcs-in-location').innerHTML = npcConcat;
-            }
-            if(json.hasOwnProperty("items")) {
-                document.getElementById('items-in-location').innerHTML = json["items"];
-            }
-            if(json.hasOwnProperty("exits")) {
-                document.getElementById('exits-in-location').innerHTML = json["exits"];
-            }
             setLocationImage(json["location"].toLowerCase().replace(/ /g, '_') + '.jpg');
             
         }
+        if(json.hasOwnProperty("room")) {
+            process_room(json["room"]);
+        }
         if(json.hasOwnProperty("data")) {
             id = json["id"]; // where to put the image
             data = json["data"];   // the image data
@@ -145,6 +127,53 @@ function process_text(json)
 }
 
 
+// The npcs, items and exits in the room the player is in. The server sends all of them when the
+// player enters a room, and after that only the names that were added or removed.
+var roomState = {version: 0, npcs: [], items: [], exits: []};
+const roomKinds = ["npcs", "items", "exits"];
+
+function process_room(room)
+{
+    if(room.full) {
+        roomKinds.forEach(function (kind) {
+            roomState[kind] = room[kind].slice();
+        });
+    } else {
+        if(room.version !== roomState.version + 1) {
+            console.warn("Room update " + room.version + " does not follow " + roomState.version);
+        }
+        roomKinds.forEach(function (kind) {
+            const removed = (room.removed && room.removed[kind]) || [];
+            removed.forEach(function (name) {
+                const index = roomState[kind].indexOf(name);
+                if(index >= 0) roomState[kind].splice(index, 1);
+            });
+            const added = (room.added && room.added[kind]) || [];
+            roomState[kind] = roomState[kind].concat(added);
+        });
+    }
+    roomState.version = room.version;
+    showRoomState();
+}
+
+function showRoomState()
+{
+    const npcs = roomState.npcs.join(',');
+    populateNpcDropdown(npcs);
+    populateNpcImages(npcs);
+
+    let npcConcat = '';
+    for (let i = 0; i < roomState.npcs.length; i++) {
+        const npcContainer = document.createElement('div'); // Create a container div for each NPC
+        npcContainer.appendChild(document.createTextNode(roomState.npcs[i]));
+        npcConcat += npcContainer.outerHTML;
+    }
+    document.getElementById('npcs-in-location').innerHTML = npcConcat;
+    document.getElementById('items-in-location').innerHTML = roomState.items.join(',');
+    document.getElementById('exits-in-location').innerHTML = roomState.exits.join(',');
+}
+
+
 function smoothscroll(div, previousTop)
 {
     document.smoothscrolling_busy = true;
@@ -1,6 +1,6 @@
 from tale.base import Location
 from tale.coord import Coord
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 
 if TYPE_CHECKING:
     from tale.dungeon.dungeon_config import DungeonConfig
@@ -24,12 +24,17 @@ class Zone():
         self.lore = ""
         self.dungeon_config = None  # type: DungeonConfig
         self.dungeon = None  # type: Dungeon
+        self.location_index = None  # type: LocationIndex # set when the zone is added to a story
+        self.dirty = True   # the zone itself changed since the world was saved (the locations keep track of their own changes)
 
     def add_location(self, location: Location) -> bool:
         """ Add a location to the zone. Skip if location already exists."""
         if location.name in self.locations:
             return False
         self.locations[location.name] = location
+        self.dirty = True
+        if self.location_index is not None:
+            self.location_index.add(location, self)
         return True
     
     def remove_location(self, name: str) -> bool:
@@ -37,6 +42,9 @@ class Zone():
         if name not in self.locations:
             return False
         self.locations[name] = None
+        self.dirty = True
+        if self.location_index is not None:
+            self.location_index.remove(name, self)
         return True
 
     def get_location(self, name: str) -> Location:
@@ -75,18 +83,78 @@ class Zone():
         return None
     
     def on_edge(self, coord: Coord, direction: Coord) -> bool:
-        """ Returns true if the coordinate is on the edge of the zone in the given direction. 
-        Higher likelihood the further away from the center of the zone.
+        """ Returns true if the coordinate is on the edge of the zone in the given direction:
+        the next coordinate in that direction is outside of the zone (see contains).
         """
-        zone_distance = self.center.xyz_distance(coord)
-        if (direction.x != 0 and zone_distance.x > self.size - 1):
+        center = self.center
+        if (direction.x != 0 and abs(coord.x + direction.x - center.x) > self.size):
             return True
-        if (direction.y != 0 and zone_distance.y > self.size - 1):
+        if (direction.y != 0 and abs(coord.y + direction.y - center.y) > self.size):
             return True
-        if (direction.z != 0 and zone_distance.z > self.size_z - 1):
+        if (direction.z != 0 and abs(coord.z + direction.z - center.z) > self.size_z):
             return True
         return False
-    
+
+    def contains(self, coord: Tuple[int, int, int]) -> bool:
+        """ Returns true if the coordinate tuple is within the size of the zone, measured from its center."""
+        center = self.center
+        return (abs(center.x - coord[0]) <= self.size and abs(center.y - coord[1]) <= self.size
+                and abs(center.z - coord[2]) <= self.size_z)
+
+
+class LocationIndex():
+    """ Maps location names to the location and the zone it's in, for all zones in a story.
+    Kept up to date by the zones, so lookups don't have to go through every zone.
+    When several zones have a location with the same name, the zone that was added first wins. """
+
+    def __init__(self) -> None:
+        self._zones = []  # type: list[Zone]
+        self._index = dict()  # type: Dict[str, Tuple[Location, Zone]]
+
+    def add_zone(self, zone: Zone) -> None:
+        self._zones.append(zone)
+        zone.location_index = self
+        for location in zone.locations.values():
+            if location:
+                self.add(location, zone)
+
+    def remove_zone(self, zone: Zone) -> None:
+        self._zones.remove(zone)
+        zone.location_index = None
+        for name in zone.locations:
+            self.remove(name, zone)
+
+    def add(self, location: Location, zone: Zone) -> None:
+        if location.name not in self._index:
+            self._index[location.name] = (location, zone)
+
+    def remove(self, name: str, zone: Zone) -> None:
+        entry = self._index.get(name, None)
+        if not entry or entry[1] is not zone:
+            return
+        del self._index[name]
+        # another zone might have a location with the same name
+        for other in self._zones:
+            location = other.get_location(name)
+            if location:
+                self._index[name] = (location, other)
+                return
+
+    def get(self, name: str) -> Tuple[Optional[Location], Optional[Zone]]:
+        return self._index.get(name, (None, None))
+
+    def rebuild(self) -> None:
+        """ Index all locations of the zones again, e.g. after loading a story."""
+        self._index.clear()
+        for zone in self._zones:
+            for location in zone.locations.values():
+                if location:
+                    self.add(location, zone)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
 def from_json(data: dict) -> 'Zone':
     from tale.dungeon.dungeon_config import DungeonConfig
     
@@ -69,8 +69,10 @@ class FakeIoUtil(IoUtil):
         self.backend = 'kobold_cpp'
         self.io_adapter = None
         self.stream = False
+        self.prompts = [] # type: List[str]
 
-    def synchronous_request(self, request_body: dict, prompt: str = None, context: str = '') -> str:
+    def synchronous_request(self, request_body: dict, prompt: str = None, context: str = '', request_type: str = '', slot_key: str = '') -> str:
+        self.prompts.append(prompt.replace('<context>{context}</context>', f'<context>{context}</context>') if prompt else prompt)
         return self.response.pop(0) if isinstance(self.response, list) > 0 and len(self.response) > 0 else self.response
     
     def asynchronous_request(self, request_body: dict, prompt: str = None, context: str = ''):
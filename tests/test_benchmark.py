@@ -0,0 +1,59 @@
+import pytest
+
+from tale.benchmark import format_results, percentiles, run_suite
+from tale.llm.stand_in_server import Cassette, StandInServer
+from tale.player import Player, PlayerConnection
+from tale.tio.headless_io import HeadlessIo
+
+
+class TestBenchmark():
+
+    def test_percentiles(self):
+        assert percentiles([]) == dict(p50=0.0, p95=0.0, p99=0.0, max=0.0)
+        result = percentiles([i / 1000 for i in range(1, 101)])
+        assert round(result['p50']) == 50
+        assert round(result['p95']) == 95
+        assert round(result['p99']) == 99
+        assert round(result['max']) == 100
+
+    def test_format_results(self):
+        result = dict(story='Test story', commands=3, timeouts=1, command_latency=percentiles([0.01, 0.02, 0.03]),
+                      ticks=2, overrun_ticks=0, tick_overrun=percentiles([0.0, 0.001]), llm=dict(replayed=2, missed=1))
+        text = format_results([result, dict(story='broken', error=['ValueError: oops'])])
+        assert 'Test story' in text
+        assert '3 (1 timed out)' in text
+        assert '20.0 / 30.0 / 30.0' in text
+        assert 'broken' in text and 'ValueError: oops' in text
+
+    def test_record_then_replay(self, tmp_path):
+        upstream = StandInServer(Cassette(), default_response='{"response": "Hello there", "sentiment": "friendly"}')
+        upstream_url = upstream.start()
+        cassette = str(tmp_path / 'session.jsonl')
+        commands = ['look', 'say hello', 'look']
+        try:
+            recorded = run_suite(['prancingllama'], 'stories', commands, cassette=cassette, record=True, upstream=upstream_url, command_timeout=20)
+        finally:
+            upstream.stop()
+        assert 'error' not in recorded[0]
+        assert recorded[0]['llm']['recorded'] > 0
+        replayed = run_suite(['prancingllama'], 'stories', commands, cassette=cassette, command_timeout=20)
+        assert 'error' not in replayed[0]
+        assert replayed[0]['llm']['replayed'] > 0
+        assert replayed[0]['llm']['missed'] == 0
+
+    def test_headless_io_no_mainloop(self):
+        conn = PlayerConnection(Player('test', 'f'))
+        with pytest.raises(RuntimeError):
+            HeadlessIo(conn).singleplayer_mainloop(conn)
+
+    def test_headless_io(self):
+        conn = PlayerConnection(Player('test', 'f'))
+        io = HeadlessIo(conn, keep_output=True)
+        conn.io = io
+        io.output('line one', 'line two')
+        assert io.lines == ['line one', 'line two']
+        assert io.output_chars == 16
+        assert io.render_output([('<bright>bold</> text', True)]) == 'bold text'
+        assert not io.prompted.is_set()
+        io.write_input_prompt()
+        assert io.prompted.is_set()
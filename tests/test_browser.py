@@ -1,11 +1,39 @@
 
 
+import asyncio
+import json
+import threading
+import time
 from os import getcwd
-from tale.player import PlayerConnection
-from tale.tio.if_browser_io import HttpIo
+
+from tale import mud_context
+from tale.base import Exit, Item, Living, Location
+from tale.player import Player, PlayerConnection
+from tale.story import StoryConfig
+from tale.room_state_benchmark import run_benchmark
+from tale.tio.if_browser_io import HttpIo, RoomState, serve_websocket
 from tests.supportstuff import FakeDriver
 
 
+class FakeWebSocket:
+
+    def __init__(self, commands):
+        self.commands = asyncio.Queue()
+        for command in commands:
+            self.commands.put_nowait(command)
+        self.sent = []
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def receive_text(self):
+        return await self.commands.get()
+
+
 class TestHttpIo:
 
     player_conn = PlayerConnection()
@@ -43,3 +71,127 @@ class TestHttpIo:
         assert http_io.get_data_to_browser()[0] == '{"test": "test"}'
         
 
+    def test_output_queue(self):
+        http_io = HttpIo(player_connection=self.player_conn, server=None)
+        http_io.append_html_special("clear")
+        loop = asyncio.new_event_loop()
+        try:
+            queue = http_io.connect_output(loop)
+            thread = threading.Thread(target=http_io.render_output, args=([("Hello", True), ("World", False)],))
+            thread.start()
+            thread.join()
+            entries = loop.run_until_complete(asyncio.wait_for(self._get(queue, 3), 1))
+            assert entries == [("special", "clear"), ("html", "<p>Hello</p>\n"), ("html", "<pre>World</pre>\n")]
+            assert http_io.get_html_to_browser() == []
+            http_io.destroy()
+            assert loop.run_until_complete(asyncio.wait_for(queue.get(), 1)) is None
+            http_io.disconnect_output()
+            http_io.send_data("data")
+            assert http_io.get_data_to_browser() == ["data"]
+        finally:
+            loop.close()
+
+    async def _get(self, queue, count):
+        return [await queue.get() for _ in range(count)]
+
+    def test_serve_websocket(self):
+        mud_context.driver = FakeDriver()
+        mud_context.config = StoryConfig()
+        player = Player("julie", "f")
+        player.move(Location("Hall"), silent=True)
+        player.location.insert(Item("lamp"), None)
+        conn = PlayerConnection(player)
+        conn.io = HttpIo(player_connection=conn, server=None)
+        websocket = FakeWebSocket(["look"])
+        received = []
+
+        def handle_input(data):
+            received.append(data)
+            conn.io.render_output([("You see a lamp.", True)])
+            conn.io.send_data('{"image": "lamp.jpg"}')
+            conn.io.destroy()
+
+        asyncio.run(asyncio.wait_for(serve_websocket(websocket, conn, handle_input), 2))
+        assert received == ["look"]
+        assert websocket.closed
+        assert websocket.sent[0]["type"] == "text"
+        assert websocket.sent[0]["text"] == "<p>You see a lamp.</p>\n"
+        assert websocket.sent[0]["room"] == {"version": 1, "full": True, "npcs": [], "items": ["lamp"], "exits": []}
+        assert websocket.sent[0]["location"] == "Hall"
+        assert websocket.sent[1] == {"type": "data", "data": '{"image": "lamp.jpg"}'}
+
+    def _streaming_connection(self):
+        mud_context.driver = FakeDriver()
+        mud_context.config = StoryConfig()
+        player = Player("julie", "f")
+        player.move(Location("Hall"), silent=True)
+        conn = PlayerConnection(player)
+        conn.io = HttpIo(player_connection=conn, server=None)
+        return conn
+
+    def test_batched_output(self):
+        conn = self._streaming_connection()
+        websocket = FakeWebSocket(["tell me a story"])
+
+        def stream():
+            for token in range(50):
+                conn.io.output_no_newline("token%d " % token, new_paragraph=False)
+                time.sleep(0.001)
+            conn.io.destroy()
+
+        def handle_input(data):
+            threading.Thread(target=stream).start()
+
+        asyncio.run(asyncio.wait_for(serve_websocket(websocket, conn, handle_input, delay=0.5), 5))
+        assert len(websocket.sent) < 5
+        assert "".join(message["text"] for message in websocket.sent).count("token") == 50
+        stats = conn.io.output_stats.rates()
+        assert stats["frames"] == len(websocket.sent)
+        assert stats["bytes"] == sum(len(json.dumps(message)) for message in websocket.sent)
+        assert stats["entries_per_frame"] >= 10
+
+    def test_batch_size(self):
+        conn = self._streaming_connection()
+        websocket = FakeWebSocket(["look"])
+
+        async def serve():
+            task = asyncio.ensure_future(serve_websocket(websocket, conn, lambda data: conn.io.output("x" * 20), delay=10, max_batch=10))
+            while not websocket.sent:
+                await asyncio.sleep(0.01)
+            conn.io.destroy()
+            await task
+
+        asyncio.run(asyncio.wait_for(serve(), 2))
+        assert "x" * 20 in websocket.sent[0]["text"]
+
+
+class TestRoomState:
+
+    def test_snapshot_and_deltas(self):
+        hall = Location("Hall")
+        hall.add_exits([Exit("north", Location("Garden"), "A door.")])
+        player = Living("julie", "f", race="human")
+        hall.insert(player, None)
+        hall.insert(Item("lamp"), None)
+        state = RoomState()
+        assert state.update(player, hall) == {"version": 1, "full": True, "npcs": [], "items": ["lamp"], "exits": ["north"]}
+        assert state.update(player, hall) is None
+        rat = Living("rat", "n", race="rat")
+        hall.insert(rat, None)
+        hall.insert(Living("rat", "n", race="rat"), None)
+        assert state.update(player, hall) == {"version": 2, "added": {"npcs": ["rat", "rat"]}}
+        hall.remove(rat, None)
+        hall.remove(next(item for item in hall.items), None)
+        assert state.update(player, hall) == {"version": 3, "removed": {"npcs": ["rat"], "items": ["lamp"]}}
+        hall.description = "A large hall."
+        assert state.update(player, hall) is None
+        cellar = Location("Cellar")
+        hall.remove(player, None)
+        cellar.insert(player, None)
+        assert state.update(player, cellar) == {"version": 4, "full": True, "npcs": [], "items": [], "exits": []}
+
+    def test_benchmark(self):
+        result = run_benchmark(npcs=5, items=5, rate=1, changes=0.5, move_every=20, minutes=1)
+        assert result["messages"] == 60
+        assert result["rooms"] == 3
+        assert 0 < result["delta_per_minute"] < result["full_per_minute"]
@@ -0,0 +1,41 @@
+import json
+from unittest.mock import patch
+
+import responses
+
+from tale.connection_pool import ConnectionPool, get_pool
+
+
+class TestConnectionPool():
+
+    def test_shared_pool(self):
+        assert get_pool() is get_pool()
+        assert get_pool().max_connections_per_host == 4
+
+    def test_session_reused(self):
+        pool = ConnectionPool()
+        assert pool.session is pool.session
+        pool.close()
+
+    @responses.activate
+    def test_request_stats(self):
+        responses.add(responses.POST, 'http://localhost:5001/api/v1/generate', json={'results':[{'text':'test'}]}, status=200)
+        responses.add(responses.GET, 'http://localhost:7860/queue', json={}, status=200)
+        pool = ConnectionPool()
+        response = pool.post('http://localhost:5001/api/v1/generate', data=json.dumps({}))
+        assert json.loads(response.text)['results'][0]['text'] == 'test'
+        pool.post('http://localhost:5001/api/v1/generate')
+        pool.get('http://localhost:7860/queue')
+        stats = pool.stats()
+        assert stats['requests'] == {'localhost:5001': 2, 'localhost:7860': 1}
+        assert stats['total_requests'] == 3
+        pool.close()
+
+    def test_default_timeout(self):
+        pool = ConnectionPool(connect_timeout=5, read_timeout=20)
+        with patch.object(pool.session, 'request') as request:
+            pool.get('http://localhost:7860/queue')
+            request.assert_called_with('GET', 'http://localhost:7860/queue', timeout=(5, 20))
+            pool.get('http://localhost:7860/queue', timeout=1)
+            request.assert_called_with('GET', 'http://localhost:7860/queue', timeout=1)
+        pool.close()
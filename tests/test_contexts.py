@@ -2,6 +2,7 @@
 
 from tale.base import Living, Location
 from tale.llm.contexts.ActionContext import ActionContext
+from tale.llm.contexts.DialogueContext import DialogueContext
 from tale.llm.contexts.DungeonLocationsContext import DungeonLocationsContext
 from tale.llm.contexts.EvokeContext import EvokeContext
 from tale.llm.contexts.FollowContext import FollowContext
@@ -78,6 +79,8 @@ class TestPromptContexts():
         assert character_name in result
         assert 'test_context' in result
         assert "say, take, wear" in result
+        # stable parts go first, so the backend can reuse the evaluated prompt
+        assert result.index(character_card) < result.index('test_context') < result.index('TestLocation') < result.index(history)
 
 
     def test_follow_context(self):
@@ -111,4 +114,10 @@ class TestPromptContexts():
         assert location.name in result
         assert location.description in result
         assert story_context in result
-        assert story_type in result
\ No newline at end of file
+        assert story_type in result
+        assert result.index(character_card) < result.index(story_context) < result.index(history)
+
+    def test_dialogue_context(self):
+        context = DialogueContext(story_context='story', location_description='location', speaker_card='{card}', speaker_name='speaker',
+                                  target_name='listener', target_description='description', conversation='hello')
+        assert(context.to_prompt_string() == 'Self:speaker:{card}; Listener:listener:description; Story context:story; Location:location;')
\ No newline at end of file
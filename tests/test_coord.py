@@ -1,4 +1,5 @@
-
+import copy
+import pickle
 
 from tale.coord import Coord
 
@@ -43,3 +44,14 @@ class TestCoord():
     def test_as_tuple(self):
         coord = Coord(1,2,3)
         assert(coord.as_tuple() == (1, 2, 3))
+
+    def test_hash(self):
+        assert(hash(Coord(1,2,3)) == hash(Coord(1,2,3)))
+        assert(len({Coord(1,2,3), Coord(1,2,3), Coord(3,2,1)}) == 2)
+        assert(tuple(Coord(1,2,3)) == (1, 2, 3))
+
+    def test_slots(self):
+        coord = Coord(1,2,3)
+        assert(not hasattr(coord, '__dict__'))
+        assert(copy.deepcopy(coord) == coord)
+        assert(pickle.loads(pickle.dumps(coord)) == coord)
@@ -23,6 +23,11 @@ from tale.story import GameMode, StoryBase
 from tests.supportstuff import Thing, FakeDriver
 
 
+class TickThing(Thing):
+    def append(self, value, ctx) -> None:
+        self.x.append(value)
+
+
 def module_level_func(ctx):
     assert ctx is not None
 
@@ -103,6 +108,17 @@ class TestDeferreds(unittest.TestCase):
         after = deferred.due_gametime - now
         self.assertEqual(3601, after.seconds)
 
+    def test_server_tick_one_shot_deferred(self):
+        thing = TickThing()
+        driver = tale.driver.Driver()
+        driver.story = StoryBase()
+        driver.game_clock = tale.util.GameDateTime(datetime.datetime.now())
+        driver.defer(datetime.datetime.now(), thing.append, 42)
+        driver._server_tick()
+        self.assertEqual([42], thing.x)
+        self.assertEqual(0, len(driver.deferreds))
+        self.assertEqual(1, tale.driver.profiler.histogram("deferred", "TickThing.append").count)
+
     def testHeapq(self):
         t1 = datetime.datetime(1995, 1, 1)
         t2 = datetime.datetime(1996, 1, 1)
@@ -121,6 +137,55 @@ class TestDeferreds(unittest.TestCase):
             dues.append(heapq.heappop(heap).due_gametime)
         self.assertEqual([t1, t2, t3, t4, t5], dues)
 
+    def testQueue(self):
+        t = [datetime.datetime(1995 + year, 1, 1) for year in range(5)]
+        thing = Thing()
+        other = Thing()
+        queue = tale.driver.DeferredQueue()
+        deferreds = [tale.driver.Deferred(t[4], thing.append, [], None),
+                     tale.driver.Deferred(t[1], other.append, [], None),
+                     tale.driver.Deferred(t[3], thing.append, [], None),
+                     tale.driver.Deferred(t[0], other.append, [], None),
+                     tale.driver.Deferred(t[2], thing.append, [], None)]
+        for d in deferreds:
+            queue.push(d)
+        self.assertEqual(5, len(queue))
+        self.assertIs(deferreds[3], queue[0])
+        self.assertEqual([t[0], t[1]], [d.due_gametime for d in queue.pop_due(t[1])])
+        self.assertEqual(3, len(queue))
+        self.assertEqual([], queue.pop_due(t[1]))
+        self.assertTrue(queue.remove(deferreds[2]))
+        self.assertFalse(queue.remove(deferreds[2]))
+        self.assertEqual([deferreds[4], deferreds[0]], queue.pop_due(t[4]))
+        self.assertFalse(queue)
+
+    def testQueueRemoveOwner(self):
+        due = datetime.datetime(2000, 1, 1)
+        thing = Thing()
+        other = Thing()
+        queue = tale.driver.DeferredQueue()
+        for minutes in range(10):
+            queue.push(tale.driver.Deferred(due + datetime.timedelta(minutes=minutes), thing.append, [], None))
+        kept = tale.driver.Deferred(due, other.append, [], None)
+        queue.push(kept)
+        self.assertEqual(10, queue.remove_owner(thing))
+        self.assertEqual(0, queue.remove_owner(thing))
+        self.assertEqual([kept], list(queue))
+        self.assertLessEqual(len(queue._heap), 6, "tombstones should have been compacted")
+        self.assertEqual([kept], queue.pop_due(due + datetime.timedelta(hours=1)))
+
+    def testRemoveDeferreds(self):
+        thing = tale.base.Item("thing")
+        other = tale.base.Item("other")
+        driver = tale.driver.Driver()
+        driver.game_clock = tale.util.GameDateTime(datetime.datetime.now(), 1)
+        driver.defer(10, thing.move)
+        driver.defer((10, 5, 6), thing.move)
+        driver.defer(20, other.move)
+        driver.remove_deferreds(thing)
+        self.assertEqual(1, len(driver.deferreds))
+        self.assertIs(other, driver.deferreds[0].owner)
+
     def testCallable(self):
         def scoped_function():
             pass
@@ -233,6 +298,12 @@ class TestCommands(unittest.TestCase):
     def testCommandsOverride(self):
         self.cmds.override("verb4", func2, "noob")
 
+    def testCommandsHas(self):
+        self.assertTrue(self.cmds.has("verb1", []))
+        self.assertTrue(self.cmds.has("verb3", ["wizard"]))
+        self.assertFalse(self.cmds.has("verb3", ["noob"]))
+        self.assertFalse(self.cmds.has("verbXYZ", ["wizard", None]))
+
     def testCommandsAdjust(self):
         wiz = self.cmds.get(["wizard"])
         self.assertEqual({"verb1", "verb2", "verb3"}, set(wiz.keys()))
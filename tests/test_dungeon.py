@@ -3,6 +3,8 @@ Tests for the reusable Dungeon class.
 """
 
 import datetime
+import json
+import time
 from mock import MagicMock
 
 from tale import parse_utils, util
@@ -14,7 +16,9 @@ from tale.dungeon.dungeon import Dungeon
 from tale.dungeon.dungeon_config import DungeonConfig
 from tale.dungeon.dungeon_generator import Cell, Connection, Layout, LayoutGenerator, MobPopulator, ItemPopulator
 from tale.json_story import JsonStory
+from tale.llm.llm_scheduler import LlmScheduler
 from tale.llm.llm_utils import LlmUtil
+from tale.llm.responses.LocationDescriptionResponse import LocationDescriptionResponse
 from tale.zone import Zone
 from tests.supportstuff import FakeIoUtil
 
@@ -222,3 +226,96 @@ class TestDungeon:
         assert dungeon.max_depth == 7
         assert dungeon.zones[0].dungeon_config is not None
         assert dungeon.zones[0].dungeon_config.name == "Custom Dungeon"
+
+
+class SlowLlmUtil:
+    """Answers the dungeon room requests on a scheduler, after a delay, like an LLM backend would."""
+
+    def __init__(self, delay: float, answer=None):
+        self.delay = delay
+        self.answer = answer or (lambda rooms, attempt: rooms)
+        self.scheduler = LlmScheduler(max_workers=4)
+        self.requests = []  # type: list[list[int]]
+
+    def request_dungeon_locations(self, zone_info: dict, locations: list, depth: int, max_depth: int):
+        indices = [json.loads(room)["index"] for room in locations]
+        attempt = sum(1 for request in self.requests if set(indices) & set(request)) + 1
+        self.requests.append(indices)
+
+        def describe():
+            time.sleep(self.delay)
+            rooms = [dict(index=i, name=f"Described room {i}", description=f"Room {i}, described.") for i in indices]
+            return LocationDescriptionResponse(self.answer(rooms, attempt))
+        return self.scheduler.submit(describe)
+
+
+class TestDungeonRoomDescriptions:
+    """Test describing the rooms of a level in slices at the same time."""
+
+    def setup_method(self):
+        driver = IFDriver(screen_delay=99, gui=False, web=True, wizard_override=True)
+        driver.game_clock = util.GameDateTime(datetime.datetime(year=2023, month=1, day=1), 1)
+        self.story = JsonStory(
+            'tests/files/empty_world/',
+            parse_utils.load_story_config(parse_utils.load_json('tests/files/empty_world/story_config.json'))
+        )
+        self.story.init(driver=driver)
+        self.zone = Zone("test_level_1", "Test Level 1")
+        self.story.add_zone(self.zone)
+
+    def get_layout(self, size: int = 30, entrance: int = 25) -> Layout:
+        layout = Layout(Coord(0, 0, 0))
+        for x in range(size):
+            cell = Cell(coord=Coord(x, 0, 0))
+            cell.is_room = True
+            layout.cells[cell.coord.as_tuple()] = cell
+        layout.cells[(entrance, 0, 0)].is_room = False
+        layout.cells[(entrance, 0, 0)].is_entrance = True
+        return layout
+
+    def describe(self, llm_util: SlowLlmUtil, layout: Layout) -> list:
+        dungeon = Dungeon(name="Test Dungeon", story=self.story, llm_util=llm_util)
+        return dungeon._describe_rooms(zone=self.zone, layout=layout, rooms=dungeon._prepare_locations(layout))
+
+    def test_slices_at_the_same_time(self):
+        llm_util = SlowLlmUtil(delay=0.3)
+        start = time.time()
+        described = self.describe(llm_util, self.get_layout())
+        duration = time.time() - start
+        assert len(described) == 30
+        assert len(llm_util.requests) == 3
+        assert duration < 0.6    # one round trip, not three
+        assert 25 in llm_util.requests[0]
+        assert list(self.zone.locations)[0] == "Described room 25"
+        assert len(self.zone.locations) == 30
+
+    def test_missing_rooms_asked_again(self):
+        # the first answer for a slice leaves out its last room, and has a room that wasn't asked for
+        def answer(rooms, attempt):
+            return rooms if attempt > 1 else rooms[:-1] + [dict(index=99, name="Stray", description="Not asked for")]
+        llm_util = SlowLlmUtil(delay=0.05, answer=answer)
+        described = self.describe(llm_util, self.get_layout())
+        assert len(described) == 30
+        assert sorted(request for request in llm_util.requests if len(request) == 1) == [[9], [19], [29]]
+        assert "Stray" not in self.zone.locations
+        assert "Described room 29" in self.zone.locations
+
+    def test_basic_description_after_attempts(self):
+        llm_util = SlowLlmUtil(delay=0.01, answer=lambda rooms, attempt: [room for room in rooms if room["index"] != 25])
+        described = self.describe(llm_util, self.get_layout())
+        assert len(described) == 29
+        assert len([request for request in llm_util.requests if request == [25]]) == 2
+        entrance = list(self.zone.locations.values())[0]
+        assert entrance.name == "Room with pathway leading up to this level."
+        assert entrance.world_location == Coord(25, 0, 0)
+        assert len(self.zone.locations) == 30
+
+    def test_failed_request(self):
+        def answer(rooms, attempt):
+            if attempt == 1 and rooms[0]["index"] == 0:
+                raise TimeoutError("no answer")
+            return rooms
+        llm_util = SlowLlmUtil(delay=0.01, answer=answer)
+        described = self.describe(llm_util, self.get_layout())
+        assert len(described) == 30
+        assert llm_util.requests.count(list(range(10))) == 2
@@ -1,3 +1,5 @@
+import pytest
+
 from tale.base import Location
 from tale.coord import Coord
 from tale.llm.dynamic_story import DynamicStory
@@ -35,6 +37,14 @@ class TestDynamicStory():
         assert(story._zones['zone'].locations['test'] == test_location)
         assert(story.get_location(zone='zone', name='test') == test_location)
 
+    def test_load_zone(self):
+        story = DynamicStory()
+        test_zone = Zone('zone')
+        story.add_zone(test_zone)
+        assert(story.load_zone('zone') == test_zone)
+        with pytest.raises(KeyError):
+            story.load_zone('nowhere')
+
     def test_find_location_in_zone(self):
         story = DynamicStory()
         test_location = Location('test')
@@ -44,6 +54,38 @@ class TestDynamicStory():
         story.add_location(test_location, 'zone')
         assert(story.find_location('test') == test_location)
 
+    def test_find_zone_index(self):
+        story = DynamicStory()
+        zone1 = Zone('zone1')
+        zone1.add_location(Location('existing'))
+        story.add_zone(zone1)
+        zone2 = Zone('zone2')
+        story.add_zone(zone2)
+        shared1 = Location('shared')
+        shared2 = Location('shared')
+        story.add_location(shared1, 'zone1')
+        zone2.add_location(shared2)
+        assert(story.find_zone('existing') == zone1)
+        assert(story.find_location('shared') == shared1)
+        assert(story.find_zone('shared') == zone1)
+        zone1.remove_location('shared')
+        assert(story.find_location('shared') == shared2)
+        assert(story.find_zone('shared') == zone2)
+        zone2.remove_location('shared')
+        assert(story.find_location('shared') == None)
+        assert(story.find_zone('shared') == None)
+
+    def test_rebuild_location_index(self):
+        story = DynamicStory()
+        zone = Zone('zone')
+        story.add_zone(zone)
+        location = Location('test')
+        zone.locations['test'] = location
+        assert(story.find_location('test') == None)
+        story.rebuild_location_index()
+        assert(story.find_location('test') == location)
+        assert(story.find_zone('test') == zone)
+
     def test_neighbors_for_location(self):
         story = DynamicStory()
         story._locations = dict()
@@ -70,6 +112,19 @@ class TestDynamicStory():
         assert(neighbors['east'] == east_location)
         assert(neighbors['west'] == west_location)
 
+    def test_zones_for(self):
+        story = DynamicStory()
+        zone = Zone('zone')
+        story.add_zone(zone)
+        far_zone = Zone('far zone')
+        far_zone.center = Coord(100, 0, 0)
+        story.add_zone(far_zone)
+        outpost = Location('outpost')
+        outpost.world_location = Coord(50, 0, 0)
+        story.add_location(outpost, 'far zone')
+        zones = story.zones_for([(0, 0, 0), (50, 0, 0), (100, 3, 0), (30, 30, 0)])
+        assert(zones == {(0, 0, 0): zone, (50, 0, 0): far_zone, (100, 3, 0): far_zone, (30, 30, 0): None})
+
     def test_check_setting(self):
         story = DynamicStory()
         assert(story.check_setting('fantasy') == 'fantasy')
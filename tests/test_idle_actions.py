@@ -0,0 +1,78 @@
+from concurrent.futures import Future
+
+from tale import pubsub
+from tale.llm.idle_actions import IdleActionBatch
+
+
+class FakeNpc():
+
+    def __init__(self) -> None:
+        self.futures = []
+        self.callbacks = []
+        self.planned = []
+
+    def _plan_idle_actions(self, callback=None):
+        future = Future()
+        self.futures.append(future)
+        self.callbacks.append(callback)
+        return future
+
+    def _idle_actions_planned(self, actions: list) -> None:
+        self.planned.append(actions)
+
+
+class BrokenNpc(FakeNpc):
+
+    def _plan_idle_actions(self, callback=None):
+        raise ValueError('no llm')
+
+
+class TestIdleActionBatch():
+
+    def setup_method(self):
+        self.topic = pubsub.topic("driver-pending-actions")
+        with self.topic.events_lock:
+            self.topic.events = []
+
+    def _pending_actions(self) -> list:
+        with self.topic.events_lock:
+            events, self.topic.events = self.topic.events, []
+        return events
+
+    def test_batch(self):
+        batch = IdleActionBatch()
+        npcs = [FakeNpc() for _ in range(3)]
+        for npc in npcs:
+            assert batch.add(npc)
+        assert not batch.add(npcs[0])
+        events = self._pending_actions()
+        assert len(events) == 1     # one flush for the whole tick
+        assert all(not npc.futures for npc in npcs)
+        events[0]()
+        assert all(len(npc.futures) == 1 for npc in npcs)
+        assert batch.stats() == dict(queued=0, waiting=3, batches=1, requests=3, largest_batch=3)
+        # still waiting for the actions, so not queued again
+        assert not batch.add(npcs[1])
+        npcs[1].callbacks[0](['sits down'])
+        assert npcs[1].planned == [['sits down']]
+        assert batch.stats()['waiting'] == 2
+        assert batch.add(npcs[1])
+
+    def test_failed_request(self):
+        batch = IdleActionBatch()
+        npc = FakeNpc()
+        batch.add(npc)
+        batch.flush()
+        npc.futures[0].set_exception(ValueError())
+        assert batch.stats()['waiting'] == 0
+        assert batch.add(npc)
+
+    def test_plan_raises(self):
+        batch = IdleActionBatch()
+        broken, npc = BrokenNpc(), FakeNpc()
+        batch.add(broken)
+        batch.add(npc)
+        assert batch.flush() == 1
+        assert len(npc.futures) == 1
+        assert batch.stats()['waiting'] == 1
+        assert batch.add(broken)
@@ -9,6 +9,7 @@ from tale import util, wearable
 from tale.base import Location
 from tale.driver_if import IFDriver
 from tale.json_story import JsonStory
+from tale.llm import world_shards
 from tale.mob_spawner import MobSpawner
 
 class TestJsonStory():
@@ -89,8 +90,14 @@ class TestJsonStory():
         assert(location)
         assert(location.name == 'Cave entrance')
 
-    def test_save_story(self):
+    def test_save_story(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
         self.story.save()
+        assert os.path.exists(tmp_path / 'world' / 'index.json')
+        assert os.path.exists(tmp_path / 'story_config.json')
+        world = world_shards.load_world(str(tmp_path))
+        assert world['zones']['Cave']['locations']
+        assert 'Kobbo' in world['world']['npcs']
 
     def test_save_story_as(self):
         old_dir = os.getcwd()
@@ -1,11 +1,12 @@
 import json
 
 import responses
-from tale import mud_context
+from tale import mud_context, pubsub
 
 from tale.llm import llm_cache
-from tale.base import Exit, Item, Living, Location, ParseResult, Weapon
+from tale.base import Exit, Item, Living, Location, MudObjRegistry, ParseResult, Weapon
 from tale.llm.LivingNpc import LivingNpc
+from tale.llm import npc_memory
 from tale.llm.item_handling_result import ItemHandlingResult
 from tale.llm.dynamic_story import DynamicStory
 from tale.llm.llm_io import IoUtil
@@ -100,6 +101,7 @@ class TestLivingNpc():
         
         npc._observed_events = [llm_cache.cache_event('test_event'), llm_cache.cache_event('test_event 2')]
         npc.sentiments = {'test': 'neutral'}
+        npc._memory.summary = 'Met a stranger.'
         memories_json = npc.dump_memory()
         memories = json.loads(json.dumps(memories_json))
 
@@ -110,9 +112,25 @@ class TestLivingNpc():
         assert(memories['known_locations'] == {})
         assert(memories['observed_events'] == list(npc_clean._observed_events))
         assert(memories['sentiments'] == npc_clean.sentiments)
+        assert(npc_clean._memory.summary == 'Met a stranger.')
 
         assert(llm_cache.get_events(npc_clean._observed_events) == 'test_event<break>test_event 2')
 
+    def test_events_keep_look(self):
+        location = Location("test_room")
+        npc = LivingNpc(name='test', gender='m', age=42, personality='')
+        location.insert(npc, None)
+        location.look()
+        version = location.look_version
+        MudObjRegistry.dirty_locations.clear()
+        npc._observed_events = [llm_cache.cache_event('test_event')]
+        npc._forget_events(1)
+        npc.stats.hp -= 1
+        npc.mark_dirty()
+        assert location.vnum in MudObjRegistry.dirty_locations
+        assert location.look_version == version
+        assert location._look_cache
+
     def test_avatar_not_exists(self):
         npc = LivingNpc(name='test', gender='m', age=42, personality='')
         has_avatar = npc.avatar == 'test'
@@ -222,6 +240,62 @@ class TestLivingNpcActions():
         assert(llm_cache.get_events(self.npc2._observed_events) == 'test : sits down on a chair\n\n')
         assert ["test : sits down on a chair\n\n"] == self.msg_trace_npc.messages
 
+    @responses.activate
+    def test_idle_action_background(self):
+        mud_context.config.server_tick_method = 'TIMER'
+        mud_context.driver = self.driver
+        self.npc.autonomous = False
+        responses.add(responses.POST, self.dummy_backend_config['URL'] + self.dummy_backend_config['ENDPOINT'],
+                  json={'results':[{'text':'"sits down on a chair"'}]}, status=200)
+        action = self.npc.idle_action(background=True)
+        assert action == None
+        assert self.npc.idle_action(background=True) == None  # already queued
+        self._run_pending_actions()     # end of tick, sends the batched requests
+        self.llm_util.io_util.scheduler.join()
+        assert self.msg_trace_npc.messages == []
+        self._run_pending_actions()
+        assert ["test : sits down on a chair\n\n"] == self.msg_trace_npc.messages
+        assert self.npc.action_history[-1] == 'sits down on a chair'
+        assert self.llm_util.idle_actions.stats()['requests'] >= 1
+
+    @responses.activate
+    def test_autonomous_idle_action_background(self):
+        mud_context.config.server_tick_method = 'TIMER'
+        mud_context.driver = self.driver
+        self.npc.autonomous = True
+        item = Item(name="test item", short_descr="test item", descr="A test item.")
+        self.location.insert(item)
+        responses.add(responses.POST, self.dummy_backend_config['URL'] + self.dummy_backend_config['ENDPOINT'],
+                  json={'results':[{'text':'{"action":"take", "item":"test item"}'}]}, status=200)
+        assert self.npc.idle_action(background=True) == None
+        self._run_pending_actions()
+        self.llm_util.io_util.scheduler.join()
+        self._run_pending_actions()
+        assert self.npc.search_item('test item', include_location=False)
+        self.npc.autonomous = False
+
+    @responses.activate
+    def test_event_history_summarized(self):
+        mud_context.driver = self.driver
+        responses.add(responses.POST, self.dummy_backend_config['URL'] + self.dummy_backend_config['ENDPOINT'],
+                  json={'results':[{'text':'Remembers a lot of talking.'}]}, status=200)
+        self.npc._observed_events = [llm_cache.cache_event(f'npc event {i}') for i in range(30)]
+        history = self.npc._event_history('dialogue')
+        assert history.startswith('npc event 0<break>')
+        self.llm_util.io_util.scheduler.join()
+        self._run_pending_actions()
+        assert len(self.npc._observed_events) == npc_memory.RECENT_EVENTS
+        assert self.npc._memory.summary == 'Remembers a lot of talking.'
+        history = self.npc._event_history('dialogue')
+        assert history.startswith('Earlier: Remembers a lot of talking.<break>npc event 22')
+
+    def _run_pending_actions(self):
+        topic = pubsub.topic("driver-pending-actions")
+        with topic.events_lock:
+            events, topic.events = topic.events, []
+        for event in events:
+            event()
+
     @responses.activate
     def test_do_react(self):
         mud_context.config.server_tick_method = 'TIMER'
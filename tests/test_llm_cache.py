@@ -1,6 +1,8 @@
 import json
 import os
+import time
 import tale.llm.llm_cache as llm_cache
+from tale.llm.LivingNpc import LivingNpc
 
 class TestLlmCache():
     """ Test LlmCache class"""
@@ -71,7 +73,108 @@ class TestLlmCache():
         hash = llm_cache.cache_event(True)
         assert llm_cache.get_events([hash]) == "True"
 
-    
-
-
-    
\ No newline at end of file
+    def test_lru_eviction(self):
+        """ Test that least recently used entries are evicted """
+        cache = llm_cache.CacheRegion('events', max_entries=2)
+        cache.put(1, "one")
+        cache.put(2, "two")
+        assert cache.get(1) == "one"
+        cache.put(3, "three")
+        assert len(cache) == 2
+        assert cache.get(2) == None
+        assert cache.get(1) == "one"
+        assert cache.get(3) == "three"
+        assert cache.stats()['evictions'] == 1
+
+    def test_max_bytes(self):
+        """ Test that the memory budget is respected """
+        cache = llm_cache.CacheRegion('looks', max_bytes=10)
+        cache.put(1, "12345")
+        cache.put(2, "67890")
+        cache.put(3, "abc")
+        assert cache.stats()['bytes'] <= 10
+        assert 1 not in cache
+        assert cache.get(3) == "abc"
+
+    def test_ttl(self):
+        """ Test that entries older than ttl are dropped """
+        cache = llm_cache.CacheRegion('looks', ttl=10)
+        cache.put(1, "old", created=time.time() - 20)
+        cache.put(2, "new")
+        assert cache.get(1) == None
+        assert cache.get(2) == "new"
+        assert cache.stats()['expirations'] == 1
+
+    def test_hits_and_misses(self):
+        """ Test hit and miss counts """
+        cache = llm_cache.CacheRegion('events')
+        cache.put(1, "one")
+        cache.get(1)
+        cache.get(2)
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_ratio'] == 0.5
+
+    def test_events_kept_without_store(self, monkeypatch):
+        """ Test that npc memories are not evicted when there's no store to read them back from """
+        llm_cache.close_store()
+        monkeypatch.setattr(llm_cache.event_cache, 'max_entries', 5)
+        npc = LivingNpc(name='test', gender='m', age=42, personality='')
+        npc._observed_events = [llm_cache.cache_event(f'kept event {i}') for i in range(8)]
+        assert npc.get_observed_events(8).startswith('kept event 0<break>')
+        assert llm_cache.json_dump()['events'][str(npc._observed_events[0])] == 'kept event 0'
+        looks = llm_cache.CacheRegion('looks', max_entries=1)
+        looks.put(1, "one")
+        looks.put(2, "two")
+        assert len(looks) == 1
+
+    def test_sqlite_store(self, tmp_path):
+        """ Test that evicted entries are read back from the disk store """
+        store = llm_cache.SqliteCacheStore(os.path.join(tmp_path, llm_cache.STORE_FILE))
+        cache = llm_cache.CacheRegion('events', max_entries=1, store=store)
+        cache.put(1, "one")
+        cache.put(2, "two")
+        assert len(cache) == 1
+        assert cache.get(1) == "one"
+        assert cache.to_json() == {"1": "one", "2": "two"}
+        store.close()
+
+        store = llm_cache.SqliteCacheStore(os.path.join(tmp_path, llm_cache.STORE_FILE))
+        cache = llm_cache.CacheRegion('events', store=store)
+        assert cache.get(2) == "two"
+        store.backup(os.path.join(tmp_path, 'copy.db'))
+        store.close()
+        copy = llm_cache.SqliteCacheStore(os.path.join(tmp_path, 'copy.db'))
+        assert copy.count('events') == 2
+        copy.close()
+
+    def test_stored_entries_expire(self, tmp_path):
+        """ Test that entries read from the store follow the same ttl as the ones in memory """
+        store = llm_cache.SqliteCacheStore(os.path.join(tmp_path, llm_cache.STORE_FILE))
+        cache = llm_cache.CacheRegion('looks', max_entries=1, ttl=10, store=store)
+        cache.put(1, "old", created=time.time() - 20)
+        cache.put(2, "new")
+        assert len(cache) == 1
+        assert 1 not in cache
+        assert 2 in cache
+        assert cache.get(1) == None
+        store.close()
+
+    def test_open_store(self, tmp_path, monkeypatch):
+        """ Test that the store is only opened when enabled in the config """
+        monkeypatch.setitem(llm_cache.cache_config, 'STORE', '')
+        assert not llm_cache.open_store(str(tmp_path))
+        assert not os.path.exists(os.path.join(tmp_path, llm_cache.STORE_FILE))
+        monkeypatch.setitem(llm_cache.cache_config, 'STORE', 'sqlite')
+        try:
+            assert llm_cache.open_store(str(tmp_path))
+            assert llm_cache.has_store()
+        finally:
+            llm_cache.close_store()
+        assert os.path.exists(os.path.join(tmp_path, llm_cache.STORE_FILE))
+
+    def test_load_converts_keys(self):
+        """ Test that hashes loaded from json can be looked up """
+        llm_cache.load({"events": {"1234": "loaded event"}, "looks": {}})
+        assert llm_cache.get_events([1234]) == "loaded event"
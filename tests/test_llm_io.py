@@ -7,6 +7,7 @@ import responses
 
 import yaml
 from tale.llm import llm_config
+from tale.llm.io_adapters import PromptCacheStats, SlotAffinity
 from tale.llm.llm_io import IoUtil
 from tale.player import Player, PlayerConnection
 from tale.tio.iobase import IoAdapterBase
@@ -198,3 +199,80 @@ class TestLlmIo():
                                  body='data: {"choices":[{"delta":{"content":"stream test"}}]}')
             result = io_util.stream_request(request_body=json.loads(backend_config['DEFAULT_BODY']), prompt='test evoke', context='', io = IoAdapterBase(conn))
             assert(result == 'stream test')
+
+    def test_stream_kobold_cpp_sse(self):
+        config = {'BACKEND':'kobold_cpp', 'USER_START':'', 'USER_END':''}
+        backend_config = self._load_backend_config('kobold_cpp')
+        io_util = IoUtil(config=config, backend_config=backend_config) # type: IoUtil
+        io_util.stream = True
+        conn = PlayerConnection(Player('test', 'm'))
+        io = IoAdapterBase(conn)
+        output = []
+        io.output_no_newline = lambda text, new_paragraph=True: output.append(text)
+
+        with aioresponses() as mocked_responses:
+            mocked_responses.post(backend_config['URL'] + backend_config['STREAM_ENDPOINT'],
+                                 status=200,
+                                 content_type='text/event-stream',
+                                 body='event: message\ndata: {"token": "stream"}\n\nevent: message\ndata: {"token": " test"}\n\n')
+            result = io_util.stream_request(request_body=json.loads(backend_config['DEFAULT_BODY']), prompt='test evoke', context='', io = io)
+            assert(result == 'stream test')
+            assert(output == ['stream', ' test'])
+
+    def test_stream_llama_cpp_done(self):
+        config = {'BACKEND':'llama_cpp', 'USER_START':'', 'USER_END':''}
+        backend_config = self._load_backend_config('llama_cpp')
+        io_util = IoUtil(config=config, backend_config=backend_config) # type: IoUtil
+        io_util.stream = True
+        conn = PlayerConnection(Player('test', 'm'))
+
+        with aioresponses() as mocked_responses:
+            mocked_responses.post(backend_config['URL'] + backend_config['STREAM_ENDPOINT'],
+                                 status=200,
+                                 content_type='text/event-stream',
+                                 body='data: {"choices":[{"delta":{"content":"stream"}}]}\n\ndata: {"choices":[{"delta":{"content":" test"}}]}\n\ndata: [DONE]\n\n')
+            result = io_util.stream_request(request_body=json.loads(backend_config['DEFAULT_BODY']), prompt='test evoke', context='', io = IoAdapterBase(conn))
+            assert(result == 'stream test')
+
+    @responses.activate
+    def test_llama_cpp_prompt_cache(self):
+        config = {'BACKEND':'llama_cpp', 'USER_START':'', 'USER_END':''}
+        backend_config = self._load_backend_config('llama_cpp')
+        backend_config['CACHE_PROMPT'] = True
+        backend_config['SLOTS'] = 2
+        backend_config['MEASURE_PROMPT_CACHE'] = True
+        responses.add(responses.POST, backend_config['URL'] + backend_config['ENDPOINT'],
+                    json={'choices':[{'message':{'content':'cached'}}], 'usage':{'prompt_tokens':100}, 'timings':{'prompt_n':10}}, status=200)
+        io_util = IoUtil(config=config, backend_config=backend_config)
+        assert io_util.synchronous_request(json.loads(backend_config['DEFAULT_BODY']), prompt='test', request_type='dialogue', slot_key='npc:player') == 'cached'
+        io_util.synchronous_request(json.loads(backend_config['DEFAULT_BODY']), prompt='test', request_type='dialogue', slot_key='npc2:player')
+        io_util.synchronous_request(json.loads(backend_config['DEFAULT_BODY']), prompt='test', request_type='dialogue', slot_key='npc:player')
+        sent = [json.loads(call.request.body) for call in responses.calls]
+        assert all(body['cache_prompt'] for body in sent)
+        assert [body['id_slot'] for body in sent] == [0, 1, 0]
+        assert io_util.prompt_cache_stats.requests['dialogue'] == dict(requests=3, prompt_tokens=300, saved_tokens=270)
+
+    def test_openai_no_prompt_cache(self):
+        config_file = self._load_config()
+        config_file['BACKEND'] = 'openai'
+        backend_config = self._load_backend_config('openai')
+        io_util = IoUtil(config=config_file, backend_config=backend_config)
+        result = io_util.io_adapter.set_prompt(json.loads(backend_config['DEFAULT_BODY']), prompt='test', slot_key='npc')
+        assert 'cache_prompt' not in result
+        assert 'id_slot' not in result
+        assert io_util.prompt_cache_stats == None
+
+    def test_slot_affinity(self):
+        affinity = SlotAffinity(2)
+        assert affinity.slot('a') == 0
+        assert affinity.slot('b') == 1
+        assert affinity.slot('a') == 0
+        assert affinity.slot('c') == 1     # 'b' was continued least recently
+        assert affinity.slot('a') == 0
+
+    def test_prompt_cache_stats(self):
+        stats = PromptCacheStats()
+        assert stats.record('idle', json.dumps({'usage':{'prompt_tokens':50}, 'timings':{'prompt_n':50, 'cache_n':0}})) == 0
+        assert stats.record('idle', json.dumps({'usage':{'prompt_tokens':50}, 'timings':{'prompt_n':5, 'cache_n':45}})) == 45
+        assert stats.record('idle', json.dumps({'choices':[]})) == None
+        assert stats.totals() == dict(requests=2, prompt_tokens=100, saved_tokens=45)
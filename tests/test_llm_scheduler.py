@@ -0,0 +1,84 @@
+import threading
+
+from tale import pubsub
+from tale.llm.llm_scheduler import LlmScheduler, RequestPriority
+from tests.supportstuff import FakeIoUtil
+
+
+class TestLlmScheduler():
+
+    def test_submit(self):
+        scheduler = LlmScheduler(max_workers=2)
+        future = scheduler.submit(lambda: 'result')
+        assert future.result(timeout=5) == 'result'
+        assert scheduler.stats()['submitted'] == 1
+
+    def test_priority(self):
+        scheduler = LlmScheduler(max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        scheduler.submit(blocking)
+        started.wait(5)
+        background = scheduler.submit(lambda: order.append('background'), priority=RequestPriority.BACKGROUND)
+        dialogue = scheduler.submit(lambda: order.append('dialogue'), priority=RequestPriority.DIALOGUE)
+        release.set()
+        background.result(timeout=5)
+        dialogue.result(timeout=5)
+        assert order == ['dialogue', 'background']
+
+    def test_coalesce(self):
+        scheduler = LlmScheduler(max_workers=1)
+        release = threading.Event()
+        calls = []
+
+        def request():
+            release.wait(5)
+            calls.append(1)
+            return 'text'
+
+        future = scheduler.submit(request, key='same prompt')
+        future2 = scheduler.submit(request, key='same prompt')
+        assert future is future2
+        release.set()
+        assert future.result(timeout=5) == 'text'
+        assert len(calls) == 1
+        assert scheduler.stats()['coalesced'] == 1
+
+    def test_failed_task(self):
+        scheduler = LlmScheduler(max_workers=1)
+        future = scheduler.submit(lambda: 1 / 0)
+        assert isinstance(future.exception(timeout=5), ZeroDivisionError)
+        assert scheduler.stats()['failed'] == 1
+
+    def test_in_worker(self):
+        scheduler = LlmScheduler(max_workers=1)
+        assert not scheduler.in_worker()
+        assert scheduler.submit(scheduler.in_worker).result(timeout=5)
+
+    def test_callback_in_pending_actions(self):
+        topic = pubsub.topic("driver-pending-actions")
+        topic.sync()
+        results = []
+        scheduler = LlmScheduler(max_workers=1)
+        delivered = threading.Event()
+        future = scheduler.submit(lambda: 'done', callback=lambda result: results.append(result))
+        future.add_done_callback(lambda _: delivered.set())
+        future.result(timeout=5)
+        delivered.wait(5)
+        assert results == []    # not until the tick loop runs the pending actions
+        with topic.events_lock:
+            events, topic.events = topic.events, []
+        for event in events:
+            event()
+        assert results == ['done']
+
+    def test_io_util_submit_request(self):
+        io_util = FakeIoUtil(response=['first response'])
+        future = io_util.submit_request(request_body={}, prompt='prompt', priority=RequestPriority.DIALOGUE)
+        assert future.result(timeout=5) == 'first response'
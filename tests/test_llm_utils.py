@@ -9,7 +9,7 @@ import tale.llm.llm_cache as llm_cache
 from tale import mud_context
 from tale import zone
 from tale import util
-from tale.base import Location
+from tale.base import Exit, Location
 from tale.coord import Coord
 from tale.json_story import JsonStory
 from tale.llm.llm_utils import LlmUtil
@@ -111,6 +111,31 @@ class TestLlmUtils():
         assert(item == None)
         assert(sentiment == None)
 
+    def test_dialogue_prompt_prefix_stable(self):
+        io_util = FakeIoUtil(response=['{"response":"Hello there"}', '{"response":"Goodbye"}'])
+        llm_util = LlmUtil(io_util)
+        llm_util.generate_dialogue(conversation='Arto says: "Hello"', character_card='{}', character_name='Norhardt', target='Arto',
+                                   target_description='{}', sentiment='cheerful', location_description='A tavern')
+        llm_util.generate_dialogue(conversation='Arto says: "Where is the map?"', character_card='{}', character_name='Norhardt', target='Arto',
+                                   target_description='{}', sentiment='suspicious', location_description='A dark forest')
+        first, second = io_util.prompts
+        prefix = first[:first.index('Story context:')]
+        # everything up to the first volatile field can be reused by the backend
+        assert second.startswith(prefix)
+        assert llm_util._character.dialogue_template in prefix
+        assert 'Hello' not in prefix and 'cheerful' not in prefix
+
+    def test_action_prompt_prefix_stable(self):
+        io_util = FakeIoUtil(response=['{"action":"wait"}', '{"action":"wait"}'])
+        llm_util = LlmUtil(io_util)
+        llm_util.set_story(self.story)
+        llm_util.free_form_action(location=Location(name='Tavern'), character_name='Norhardt', character_card='{}', event_history='Arto enters.')
+        llm_util.free_form_action(location=Location(name='Forest'), character_name='Norhardt', character_card='{}', event_history='Arto leaves.')
+        first, second = io_util.prompts
+        prefix = first[:first.index('Location:')]
+        assert second.startswith(prefix)
+        assert llm_util._character.action_template in prefix
+
     def test_free_form_action(self):
         self.llm_util._character.io_util.response = '{"action":"test_action", "text":"test response", "target":"test target", "item":"test item"}'
         location = Location(name='Test Location')
@@ -381,6 +406,24 @@ class TestWorldBuilding():
         assert spawner
         assert spawner.mob_type.name == 'wolf'
 
+    def test_build_location_prebuilt(self):
+        location = Location(name='Outside')
+        location.world_location = Coord(0, 1, 0)
+        location.built = False
+        exit_location = Location(name='Prebuilt cave')
+        exit_location.add_exits([Exit('north', location, 'to the outside')])
+        zone = Zone('Prebuilt zone')
+        zone.add_location(exit_location)
+        zone.add_location(location)
+        self.story.add_zone(zone)
+        self.llm_util._world_building.io_util.response = [self.generated_location]
+        self.llm_util.set_story(self.story)
+
+        assert self.llm_util.prebuild_locations(exit_location) == 1
+        response, _ = self.llm_util.build_location(location, exit_location.name, zone_info=zone.get_info(), zone=zone)
+        assert(len(response.new_locations) == 2)
+        assert self.llm_util.location_prebuilder.stats()['used'] == 1
+
     def test_build_location_extra_json(self):
         location = Location(name='Outside')
         exit_location_name = 'Cave entrance'
@@ -595,6 +638,16 @@ class TestWorldBuilding():
         result = self.llm_util.generate_dungeon_locations(zone_info="", locations= [], depth= 1, max_depth=2) # type LocationDescriptionResponse
         assert len(result.location_descriptions) == 19
 
+    def test_request_dungeon_locations(self):
+        self.llm_util._world_building.io_util.response = '{"rooms": [{"index": 0, "name": "Entrance to dungeon", "description": "A dark entrance."}]}'
+        self.llm_util.set_story(self.story)
+        future = self.llm_util.request_dungeon_locations(zone_info="", locations=[], depth=1, max_depth=2)
+        assert future.result(timeout=5).location_descriptions[0].name == 'Entrance to dungeon'
+        # from a scheduler worker it runs right away, instead of waiting for another worker
+        scheduler = self.llm_util.io_util.scheduler
+        inline = scheduler.submit(lambda: self.llm_util.request_dungeon_locations(zone_info="", locations=[], depth=1, max_depth=2))
+        assert inline.result(timeout=5).done()
+
     def test_generate_dungeon_entrance(self):
         """Test generating a dungeon entrance."""
         self.llm_util._world_building.io_util.response = '{"direction": "down", "name": "Dark Cave Entrance", "short_descr": "A dark cave entrance descending into the depths", "long_descr": "A foreboding entrance to a dark cave system. The air is cold and damp."}'
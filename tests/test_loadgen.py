@@ -0,0 +1,54 @@
+import random
+
+from tale.base import Exit, Living, Location
+from tale.benchmark import percentiles
+from tale.loadgen import COMMAND_MIX, EMOTES, SAYINGS, SimulatedPlayer, format_report, rss_bytes
+from tale.player import Player, PlayerConnection
+
+
+class TestLoadGenerator():
+
+    def _simulated(self, script=()) -> SimulatedPlayer:
+        hall = Location('hall')
+        kitchen = Location('kitchen')
+        hall.add_exits([Exit('north', kitchen, 'The kitchen is north.')])
+        player = Player('load0', 'f')
+        player.move(hall, silent=True)
+        hall.insert(Living('rat', 'n', race='rat'), None)
+        return SimulatedPlayer(PlayerConnection(player), script, random.Random(1))
+
+    def test_script(self):
+        simulated = self._simulated(['look', 'north'])
+        assert [simulated.command() for _ in range(5)] == ['look', 'north', 'look', 'north', 'look']
+        assert simulated.turn == 5
+
+    def test_random_mix(self):
+        simulated = self._simulated()
+        commands = {simulated.command() for _ in range(300)}
+        expected = {'north', 'look', 'inventory', 'attack rat', 'examine rat'} | {'say ' + saying for saying in SAYINGS} | set(EMOTES)
+        assert commands <= expected
+        assert {'north', 'look', 'inventory', 'attack rat'} <= commands
+        assert 'movement' in COMMAND_MIX
+
+    def test_random_mix_alone(self):
+        simulated = self._simulated()
+        hall = simulated.conn.player.location
+        hall.remove(hall.search_living('rat'), None)
+        commands = {simulated.command() for _ in range(200)}
+        assert not any(command.startswith(('attack', 'examine')) for command in commands)
+
+    def test_rss(self):
+        assert rss_bytes() > 1000000
+
+    def test_format_report(self):
+        report = dict(story='Test story', players=10, seconds=5.0, commands_sent=50, commands_handled=48, commands_per_second=9.6,
+                      command_duration=percentiles([0.001, 0.002]), ticks=10, tick_duration=percentiles([0.01, 0.02]),
+                      tick_overrun=percentiles([0.0, 0.3]), overrun_ticks=1, memory_growth=2000000,
+                      memory=[dict(seconds=0.0, rss=80000000, objects=1000), dict(seconds=5.0, rss=82000000, objects=1200)],
+                      llm=dict(requests=5, replayed=3, missed=2))
+        text = format_report(report)
+        assert 'Test story: 10 players for 5 seconds' in text
+        assert '50 sent, 48 handled, 9.6 per second' in text
+        assert '(1 ticks late)' in text
+        assert '80.0 Mb -> 82.0 Mb (+2.0 Mb)' in text
+        assert '5 requests, 3 replayed, 2 missed' in text
@@ -0,0 +1,87 @@
+from concurrent.futures import Future
+
+from tale.base import Exit, Location
+from tale.coord import Coord
+from tale.llm.dynamic_story import DynamicStory
+from tale.llm.location_prebuilder import LocationPrebuilder
+from tale.zone import Zone
+
+
+class TestLocationPrebuilder():
+
+    def setup_method(self):
+        self.story = DynamicStory()
+        self.zone = Zone('zone')
+        self.zone.size = 5
+        self.story.add_zone(self.zone)
+        self.start = Location('start')
+        self.start.world_location = Coord(0, 0, 0)
+        self.start.built = True
+        self.story.add_location(self.start, 'zone')
+        self.north = self._add_unbuilt('north', Coord(0, 1, 0))
+        self.south = self._add_unbuilt('south', Coord(0, -1, 0))
+        self.requests = []
+
+    def _add_unbuilt(self, name: str, coord: Coord) -> Location:
+        location = Location(name)
+        location.world_location = coord
+        location.built = False
+        self.story.add_location(location, 'zone')
+        self.start.add_exits([Exit(name, location, 'exit to ' + name)])
+        return location
+
+    def _request_location(self, location: Location, exit_location_name: str, zone_info: dict, context) -> Future:
+        future = Future()
+        self.requests.append((location.name, exit_location_name, future))
+        return future
+
+    def test_prebuild_and_take(self):
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=2)
+        assert prebuilder.prebuild(self.start, self.story, None) == 2
+        assert [(name, exit_name) for name, exit_name, _ in self.requests] == [('north', 'start'), ('south', 'start')]
+        # already queued, so not requested again
+        assert prebuilder.prebuild(self.start, self.story, None) == 0
+        self.requests[0][2].set_result('{"description": "north"}')
+        assert prebuilder.take(self.north, 'start', self.zone) == '{"description": "north"}'
+        assert prebuilder.take(self.north, 'start', self.zone) == ''
+        assert prebuilder.stats()['used'] == 1
+
+    def test_unbuilt_neighbors_from_grid(self):
+        # locations next to the start without an exit to them, and one further away
+        for name, coord in (('east', Coord(1, 0, 0)), ('far east', Coord(2, 0, 0))):
+            location = Location(name)
+            location.world_location = coord
+            location.built = False
+            self.story.add_location(location, 'zone')
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=5)
+        assert prebuilder.prebuild(self.start, self.story, None) == 3
+        assert sorted(name for name, _, _ in self.requests) == ['east', 'north', 'south']
+
+    def test_take_other_exit(self):
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=2)
+        prebuilder.prebuild(self.start, self.story, None)
+        assert prebuilder.take(self.north, 'elsewhere', self.zone) == ''
+        assert prebuilder.stats()['used'] == 0
+
+    def test_budget(self):
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=1)
+        assert prebuilder.prebuild(self.start, self.story, None) == 1
+        self.north.built = True
+        assert prebuilder.prebuild(self.start, self.story, None) == 1
+        # the first build was dropped before it ran
+        assert self.requests[0][2].cancelled()
+        assert prebuilder.stats() == dict(pending=1, requested=2, used=0, wasted=0, cancelled=1)
+
+    def test_disabled(self):
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=0)
+        assert prebuilder.prebuild(self.start, self.story, None) == 0
+        assert self.requests == []
+
+    def test_clear(self):
+        prebuilder = LocationPrebuilder(self._request_location, max_pending=2)
+        prebuilder.prebuild(self.start, self.story, None)
+        self.requests[0][2].set_running_or_notify_cancel()
+        self.requests[0][2].set_result('done')
+        prebuilder.clear()
+        assert prebuilder.stats()['wasted'] == 1
+        assert prebuilder.stats()['cancelled'] == 1
@@ -85,6 +85,35 @@ class TestLocations(unittest.TestCase):
         expected = ["[Main hall]", "Exits: door, east, up", "You see: key, two magazines, and table", "Present here: fly, julie, and two rats"]
         self.assertEqual(expected, strip_text_styles(self.hall.look(exclude_living=self.player, short=True)))
 
+    def test_look_cache(self):
+        look = self.hall.look()
+        self.assertEqual(look, self.hall.look())
+        self.assertIsNot(self.hall.look(), self.hall.look())
+        version = self.hall.look_version
+        self.hall.look(short=True)
+        self.assertEqual(version, self.hall.look_version)
+        self.hall.remove(self.rat2, None)
+        self.assertGreater(self.hall.look_version, version)
+        self.assertIn("Player, attractive Julie, and rat are here.", strip_text_styles(self.hall.look())[3])
+        version = self.hall.look_version
+        self.julie.hidden = True
+        self.assertGreater(self.hall.look_version, version)
+        self.assertNotIn("julie", self.hall.look(short=True)[3])
+        self.julie.hidden = False
+        self.key.short_description = "A key lies here."
+        self.assertIn("rusty key: A key lies here.", strip_text_styles(self.hall.look())[3])
+        self.key.clear_roleplay_prompt()
+        self.assertIn("rusty key: A key lies here. You see", strip_text_styles(self.hall.look())[3])
+        self.hall.description = "A small hall."
+        self.assertEqual("A small hall.", self.hall.look()[1])
+        self.hall.add_exits([Exit("down", self.attic, "A trapdoor leads down.")])
+        self.assertEqual("Exits: door, down, east, up", self.hall.look(short=True)[1])
+        mud_context.config.show_exits_in_look = False
+        try:
+            self.assertEqual("You see: key, two magazines, and table", strip_text_styles(self.hall.look(short=True))[1])
+        finally:
+            mud_context.config.show_exits_in_look = True
+
     def test_search_living(self):
         self.assertEqual(None, self.hall.search_living("<notexisting>"))
         self.assertEqual(None, self.attic.search_living("<notexisting>"))
@@ -0,0 +1,79 @@
+from concurrent.futures import Future
+
+from tale.llm import llm_cache
+from tale.llm import npc_memory
+from tale.llm.npc_memory import NpcMemory, estimate_tokens
+
+
+class TestNpcMemory():
+
+    def _events(self, amount: int, prefix: str = 'event') -> list:
+        return [llm_cache.cache_event(f'{prefix} {i}') for i in range(amount)]
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens('') == 0
+        assert estimate_tokens('abcd') == 1
+        assert estimate_tokens('abcde') == 2
+
+    def test_history_all_fit(self):
+        memory = NpcMemory()
+        events = self._events(3, 'fits')
+        assert memory.history(events, 'dialogue') == 'fits 0<break>fits 1<break>fits 2'
+
+    def test_history_keeps_newest_within_budget(self):
+        memory = NpcMemory()
+        events = [llm_cache.cache_event(f'long event {i} ' + 'x' * 400) for i in range(10)]
+        history = memory.history(events, 'follow')
+        parts = history.split('<break>')
+        assert len(parts) < 10
+        assert parts[-1].startswith('long event 9 ')
+        assert sum(estimate_tokens(part) for part in parts) <= npc_memory.TOKEN_BUDGETS.get('follow', npc_memory.DEFAULT_TOKEN_BUDGET)
+
+    def test_history_newest_event_always_included(self):
+        memory = NpcMemory()
+        events = [llm_cache.cache_event('huge event ' + 'y' * 10000)]
+        assert memory.history(events, 'follow').startswith('huge event ')
+
+    def test_history_with_summary(self):
+        memory = NpcMemory()
+        memory.summary = 'Met the blacksmith.'
+        events = self._events(2, 'summary')
+        assert memory.history(events) == 'Earlier: Met the blacksmith.<break>summary 0<break>summary 1'
+
+    def test_needs_summary(self):
+        memory = NpcMemory()
+        amount = npc_memory.RECENT_EVENTS + npc_memory.SUMMARIZE_AFTER
+        assert not memory.needs_summary(self._events(amount - 1))
+        assert memory.needs_summary(self._events(amount))
+
+    def test_summarize(self):
+        memory = NpcMemory()
+        events = self._events(npc_memory.RECENT_EVENTS + npc_memory.SUMMARIZE_AFTER, 'fold')
+        requests = []
+        forgotten = []
+
+        def request_summary(summary, older, callback):
+            requests.append((summary, older, callback))
+            return Future()
+
+        memory.summarize(events, request_summary, forgotten.append)
+        assert len(requests) == 1
+        assert requests[0][1].startswith('fold 0\nfold 1\n')
+        assert 'fold %d' % npc_memory.SUMMARIZE_AFTER not in requests[0][1]
+        assert not memory.needs_summary(events)     # already summarizing
+        memory.summarize(events, request_summary, forgotten.append)
+        assert len(requests) == 1
+        requests[0][2](' Saw some events. ')
+        assert memory.summary == 'Saw some events.'
+        assert forgotten == [npc_memory.SUMMARIZE_AFTER]
+        assert memory.needs_summary(events)
+
+    def test_summarize_failed(self):
+        memory = NpcMemory()
+        events = self._events(npc_memory.RECENT_EVENTS + npc_memory.SUMMARIZE_AFTER)
+        future = Future()
+        memory.summarize(events, lambda summary, older, callback: future, lambda amount: None)
+        assert not memory.needs_summary(events)
+        future.set_exception(ValueError())
+        assert memory.needs_summary(events)
+        assert memory.summary == ''
@@ -16,10 +16,12 @@ import tale
 from tale import races, pubsub, mud_context
 from tale.accounts import MudAccounts
 from tale.base import Location, Exit, Item, Stats, Living, ParseResult
+from tale.llm import llm_cache
 from tale.charbuilder import IFCharacterBuilder, MudCharacterBuilder, ValidRaceValidator, PlayerNaming
 from tale.demo.story import Story as DemoStory
 from tale.errors import ActionRefused, ParseError, NonSoulVerb
 from tale.player import Player, TextBuffer, PlayerConnection
+from tale.player_utils import InputNotifier
 from tale.skills.skills import Skills
 from tale.story import *
 from tale.tio.console_io import ConsoleIo
@@ -216,6 +218,19 @@ class TestPlayer(unittest.TestCase):
         player.look(short=True, evoke=False)
         self.assertEqual(self._concat_list(["[Attic]", "Present here: julie\n"]), player.test_get_output_paragraphs())
 
+    def test_look_hash(self):
+        player = Player("fritz", "m")
+        attic = Location("Attic", "A dark attic.")
+        player.move(attic, silent=True)
+        text = "\n".join(attic.look(exclude_living=player))
+        text_hash = player._look_hash(text, False)
+        self.assertEqual(llm_cache.generate_hash(text), text_hash)
+        self.assertEqual(text_hash, player._look_hash("not rehashed", False))
+        julie = Living("julie", "f", title="Fritz's sister")
+        julie.move(attic, silent=True)
+        text = "\n".join(attic.look(exclude_living=player))
+        self.assertEqual(llm_cache.generate_hash(text.replace("Fritz", "you")), player._look_hash(text, False))
+
     def test_look_brief(self):
         player = Player("fritz", "m")
         attic = Location("Attic", "A dark attic.")
@@ -589,6 +604,31 @@ class TestTextbuffer(unittest.TestCase):
         self.assertEqual([("   1   \n", False)], output.get_paragraphs())
 
 
+class TestInputNotifier(unittest.TestCase):
+    def test_notify(self):
+        notifier = InputNotifier()
+        player = Player("fritz", "m")
+        player.input_notifier = notifier
+        player.store_input_line("look")
+        start = time.time()
+        self.assertEqual({player}, notifier.wait(5))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(set(), notifier.wait(0.01))
+
+    def test_timeout(self):
+        notifier = InputNotifier()
+        start = time.time()
+        self.assertEqual(set(), notifier.wait(0.05))
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+    def test_wake(self):
+        notifier = InputNotifier()
+        notifier.wake()
+        start = time.time()
+        self.assertEqual(set(), notifier.wait(5))
+        self.assertLess(time.time() - start, 1)
+
+
 class TestCharacterBuilders(unittest.TestCase):
     def setUp(self):
         mud_context.driver = FakeDriver()
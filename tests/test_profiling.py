@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+
+from tale.profiling import BUCKETS, Histogram, Profiler
+
+
+class TestProfiling():
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in (0.00005, 0.002, 0.002, 0.3, 100):
+            histogram.observe(seconds)
+        assert histogram.count == 5
+        assert histogram.max == 100
+        assert histogram.counts[0] == 1
+        assert histogram.counts[BUCKETS.index(0.0025)] == 2
+        assert histogram.counts[-1] == 1
+        assert histogram.quantile(0.5) == 0.0025
+        assert histogram.quantile(1.0) == 100
+
+    def test_timer(self):
+        profiler = Profiler()
+        with profiler.timer("command", "look"):
+            pass
+        with profiler.timer("command", "look"):
+            pass
+        assert profiler.histogram("command", "look").count == 2
+        assert profiler.categories() == ["command"]
+
+    def test_disabled(self):
+        profiler = Profiler()
+        profiler.enabled = False
+        profiler.observe("tick", "total", 0.1)
+        assert profiler.histogram("tick", "total") is None
+
+    def test_top(self):
+        profiler = Profiler()
+        profiler.observe("llm", "build_location", 3.0)
+        profiler.observe("llm", "generate_dialogue", 1.0)
+        profiler.observe("llm", "generate_dialogue", 1.0)
+        profiler.observe("tick", "total", 5.0)
+        assert [name for name, _ in profiler.top("llm")] == ["build_location", "generate_dialogue"]
+        profiler.reset()
+        assert profiler.top("llm") == []
+
+    def test_prometheus(self):
+        profiler = Profiler()
+        profiler.observe("deferred", 'module:zones "town".tick', 0.004)
+        text = profiler.to_prometheus()
+        labels = 'category="deferred",name="module:zones \\"town\\".tick"'
+        assert 'tale_duration_seconds_bucket{%s,le="0.0025"} 0' % labels in text
+        assert 'tale_duration_seconds_bucket{%s,le="0.005"} 1' % labels in text
+        assert 'tale_duration_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+        assert 'tale_duration_seconds_count{%s} 1' % labels in text
+
+    def test_export(self):
+        profiler = Profiler()
+        profiler.observe("tick", "pubsub", 0.001)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            profiler.export(path)
+            with open(path) as file:
+                data = json.load(file)
+            assert data["histograms"]["tick"]["pubsub"]["count"] == 1
+            path = os.path.join(directory, "profile.prom")
+            profiler.export(path)
+            with open(path) as file:
+                assert file.read().startswith("# HELP tale_duration_seconds")
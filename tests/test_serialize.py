@@ -4,11 +4,16 @@ Unit tests for serialization
 'Tale' mud driver, mudlib and interactive fiction framework
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
+import gzip
+import io
 import os
+import pickle
+import tempfile
 import unittest
+from unittest import mock
 import datetime
 
-from tale import mud_context, races, base, player, util, driver
+from tale import mud_context, races, base, player, util, driver, driver_if, vfs
 from tale.items import basic, bank, board
 from tale.story import *
 from tale.savegames import TaleSerializer, TaleDeserializer
@@ -49,6 +54,7 @@ class TestSerializing(unittest.TestCase):
         o.value = 88
         o.story_data["data"] = 42
         o.weight = 123.0
+        o.visible = False
         loc = base.Location("location")
         loc.insert(o, None)
         x = serializecycle(o)
@@ -68,6 +74,8 @@ class TestSerializing(unittest.TestCase):
         assert x["title"] == "title"
         assert x["vnum"] > 0
         assert x["weight"] == 123.0
+        assert x["visible"] == False
+        assert x["hidden"] == False
         assert "inventory" not in x
         assert "location" not in x and "contained_in" not in x, "item is referenced from its location instead"
 
@@ -363,6 +371,79 @@ class TestSerializing(unittest.TestCase):
         assert "posts" not in x, "default serpent doesn't serialize properties"
         assert x["dummy"] == "dummyvalue"
 
+    def test_savegame_versions(self):
+        conf = StoryConfig()
+        conf.name = "test"
+        clock = util.GameDateTime(datetime.datetime(2020, 1, 2, 3, 4, 5), 2)
+        hall = base.Location("hall", "a great hall")
+        kitchen = base.Location("kitchen")
+        exit = base.Exit("north", kitchen, "the kitchen is to the north")
+        hall.add_exits([exit])
+        coin = base.Item("coin", descr="a shiny coin")
+        coin.story_data = {"value": float("nan"), "tags": set(), "seen": {"hall", "kitchen"}}
+        hall.insert(coin, None)
+        dragon = base.Living("dragon", "f", race="dragon")
+        dragon.move(hall)
+        p = player.Player("julie", "f")
+        p.move(hall)
+        deferreds = [driver.Deferred(datetime.datetime(2020, 1, 2, 4, 0, 0), coin.init, [], None, periodical=(11.1, 22.2))]
+        ser = TaleSerializer()
+        deser = TaleDeserializer()
+        args = (conf, p, [coin], [dragon, p], [hall, kitchen], [exit], deferreds, clock)
+        data1 = ser.serialize(*args, version=1)
+        data2 = ser.serialize(*args)
+        assert data1.startswith(b"TALESAVE1")
+        assert data2.startswith(b"TALESAVE2")
+        assert len(data2) < len(data1)
+        state1 = deser.deserialize(data1)
+        state2 = deser.deserialize(data2)
+        value1 = state1["items"][0]["story_data"].pop("value")
+        value2 = state2["items"][0]["story_data"].pop("value")
+        assert value1 == {"__class__": "float", "value": "nan"}, "serpent encodes nan as a class dict"
+        assert value2 != value2
+        assert state1 == state2
+        assert state2["clock"] == {"__class__": "tale.util.GameDateTime", "clock": "2020-01-02T03:04:05", "times_realtime": 2}
+        assert state2["items"][0]["story_data"]["tags"] == ()
+        assert state2["player"]["location"][1] == "hall"
+
+    def test_savegame_streaming(self):
+        ser = TaleSerializer()
+        p = player.Player("julie", "f")
+        literal = ser.literal(ser.game_state(None, p, [], [], [], [], [], None))
+        stream = io.BytesIO()
+        ser.dump(literal, stream)
+        assert stream.getvalue() == ser.serialize(None, p, [], [], [], [], [], None)
+        assert TaleDeserializer().deserialize(stream.getvalue())["player"]["name"] == "julie"
+
+    def test_failed_save_keeps_savegame(self):
+        d = driver_if.IFDriver(screen_delay=99, gui=False, web=True, wizard_override=True)
+        d.story = StoryBase()
+        d.story.config = StoryConfig()
+        d.story.config.name = "Save Test"
+        d.story.config.savegames_enabled = True
+        d.game_clock = util.GameDateTime(datetime.datetime(2020, 1, 2, 3, 4, 5))
+        p = player.Player("julie", "f")
+        registry = base.MudObjRegistry
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(registry.all_items, clear=True), \
+                mock.patch.dict(registry.all_livings, clear=True), mock.patch.dict(registry.all_locations, clear=True), \
+                mock.patch.dict(registry.all_exits, clear=True):
+            d.user_resources = vfs.VirtualFileSystem(root_path=directory, readonly=False)
+            d.user_resources["save_test.savegame"] = b"previous"
+            with mock.patch.object(TaleSerializer, "dump", side_effect=IOError("disk full")):
+                with self.assertRaises(IOError):
+                    d.do_save(p)
+            assert d.user_resources["save_test.savegame"].data == b"previous"
+            d.do_save(p)
+            assert TaleDeserializer().deserialize(d.user_resources["save_test.savegame"].data)["player"]["name"] == "julie"
+            assert os.listdir(directory) == ["save_test.savegame"]
+
+    def test_savegame_refuses_classes(self):
+        data = b"TALESAVE2" + gzip.compress(pickle.dumps({"clock": datetime.datetime.now()}, protocol=5)).translate(
+            bytes(b ^ TaleSerializer.xor_key for b in range(256)))
+        with self.assertRaises(ValueError) as x:
+            TaleDeserializer().deserialize(data)
+        assert "datetime" in str(x.exception)
+
 
 if __name__ == '__main__':
     unittest.main()
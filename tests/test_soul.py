@@ -13,6 +13,7 @@ import tale.base
 import tale.errors
 import tale.player
 import tale.verbdefs
+import tale.vocabulary
 from tale.story import StoryConfig
 from tests.supportstuff import FakeDriver
 
@@ -482,6 +483,62 @@ class TestSoul(unittest.TestCase):
         result = soul.check_name_with_spaces(["go", "south", "bound", "somewhere", "yes"], 1, livings, items, exits)
         self.assertEqual((exit_south, "south bound somewhere", 3), result)
 
+    def testMatchName(self):
+        blue_gem = tale.base.Item("BLUE GEM")
+        dark_crystal = tale.base.Item("DARK RED CRYSTAL")
+        brown_bird = tale.base.Living("BROWN BIRD", "n")
+        brown = tale.base.Item("brown")
+        livings = tale.vocabulary.Vocabulary([tale.base.Living("RAT", "n"), brown_bird])
+        items = tale.vocabulary.Vocabulary([tale.base.Item("PAPER"), blue_gem, dark_crystal, brown])
+        soul = tale.base.Soul()
+        result = soul.match_name(["give", "the", "blue", "gem", "to", "rat"], 1, [livings, items])
+        self.assertEqual((None, "", 0), result)
+        result = soul.match_name(["give", "the", "blue", "gem", "to", "rat"], 2, [livings, items])
+        self.assertEqual((blue_gem, "blue gem", 2), result)
+        result = soul.match_name(["give", "the", "dark", "red", "crystal", "to", "rat"], 2, [livings, items])
+        self.assertEqual((dark_crystal, "dark red crystal", 3), result)
+        result = soul.match_name(["give", "paper", "to", "brown", "bird"], 3, [livings, items])
+        self.assertEqual((brown, "brown", 1), result)
+        result = soul.match_name(["give", "paper", "to", "brown", "bird"], 3, [livings])
+        self.assertEqual((brown_bird, "brown bird", 2), result)
+
+    def testParseCrowdedRoom(self):
+        soul = tale.base.Soul()
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("market")
+        player.move(room)
+        for number in range(200):
+            tale.base.Living("merchant%d" % number, "m").move(room)
+            room.insert(tale.base.Item("crate%d" % number), None)
+        bird = tale.base.Living("brown bird", "f")
+        bird.move(room)
+        gem = tale.base.Item("blue gem")
+        player.insert(gem, player)
+        parsed = soul.parse(player, "give blue gem to brown bird", external_verbs={"give"})
+        self.assertEqual([gem, bird], list(parsed.who_info))
+        parsed = soul.parse(player, "poke merchant150")
+        self.assertEqual(["merchant150"], [who.name for who in parsed.who_info])
+        with self.assertRaises(tale.errors.ParseError) as x:
+            soul.parse(player, "poke brown")
+        self.assertEqual("Perhaps you meant brown bird?", str(x.exception))
+        bird.move(tale.base.Location("elsewhere"))
+        with self.assertRaises(tale.errors.ParseError):
+            soul.parse(player, "poke brown bird")
+
+    def testParseAfterRenames(self):
+        soul = tale.base.Soul()
+        player = tale.player.Player("<connecting_1>", "f")
+        room = tale.base.Location("hall")
+        player.move(room)
+        player.init_names("julie", None, None, None)
+        cat = tale.base.Living("cat", "f")
+        cat.move(room)
+        cat.aliases.add("kitty")
+        parsed = soul.parse(player, "pat kitty")
+        self.assertEqual([cat], list(parsed.who_info))
+        parsed = soul.parse(cat, "pat julie")
+        self.assertEqual([player], list(parsed.who_info))
+
     def testCheckNamesWithSpacesParsing(self):
         soul = tale.base.Soul()
         player = tale.player.Player("julie", "f")
@@ -0,0 +1,68 @@
+""" Tests spatial.py """
+
+import copy
+
+from tale.base import Location
+from tale.spatial import CHUNK_SIZE, SpatialIndex
+
+
+class TestSpatialIndex():
+
+    def _index(self) -> SpatialIndex:
+        index = SpatialIndex()
+        for x in range(-20, 21):
+            index[(x, 0, 0)] = Location('Road %d' % x)
+        index[(0, 5, 1)] = Location('Tower')
+        return index
+
+    def test_mapping(self):
+        index = SpatialIndex()
+        location = Location('Square')
+        index[[1, 2, 3]] = location
+        assert (1, 2, 3) in index
+        assert index[(1, 2, 3)] is location
+        assert index.get((3, 2, 1)) is None
+        assert len(index) == 1
+        assert list(index.items()) == [((1, 2, 3), location)]
+        del index[(1, 2, 3)]
+        assert len(index) == 0
+        assert index._chunks == {}
+        assert index.setdefault((0, 0, 0), location) is location
+
+    def test_within(self):
+        index = self._index()
+        found = index.within((0, 0, 0), 2)
+        assert [cell for cell, _ in found][:1] == [(0, 0, 0)]
+        assert sorted(cell for cell, _ in found) == [(-2, 0, 0), (-1, 0, 0), (0, 0, 0), (1, 0, 0), (2, 0, 0)]
+        assert len(index.within((0, 0, 0), 6)) == 14   # 13 on the road, and the tower
+        assert [location.name for _, location in index.within((0, 5, 1), 0)] == ['Tower']
+        assert index.within((100, 100, 100), 3) == []
+        assert len(index.within((0, 0, 0), 1000)) == len(index)
+
+    def test_in_box(self):
+        index = self._index()
+        box = index.in_box((-CHUNK_SIZE, -1, 0), (3, 5, 1))
+        assert len(box) == CHUNK_SIZE + 5
+        assert box[(0, 5, 1)].name == 'Tower'
+
+    def test_nearest(self):
+        index = self._index()
+        assert index.nearest((0, 3, 1)) == ((0, 5, 1), index[(0, 5, 1)])
+        assert index.nearest((40, 0, 0))[0] == (20, 0, 0)
+        assert index.nearest((40, 0, 0), max_distance=10) == (None, None)
+        index[(-18, 0, 0)].built = False
+        assert index.nearest_unbuilt((0, 0, 0))[1].name == 'Road -18'
+        assert index.nearest_unbuilt((0, 0, 0), max_distance=10) == (None, None)
+
+    def test_nearest_free(self):
+        index = self._index()
+        assert index.nearest_free((50, 50, 0), 3) == (50, 50, 0)
+        assert index.nearest_free((0, 0, 0), 1) in {(0, 1, 0), (0, -1, 0)}
+        index[(0, 1, 0)] = index[(0, -1, 0)] = Location('Ditch')
+        assert index.nearest_free((0, 0, 0), 1) is None
+        assert index.nearest_free((0, 0, 0), 1, same_level=False) in {(0, 0, 1), (0, 0, -1)}
+
+    def test_copy(self):
+        index = self._index()
+        duplicate = copy.deepcopy(index)
+        assert len(duplicate.within((0, 0, 0), 2)) == 5
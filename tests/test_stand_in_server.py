@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import time
+
+from tale.llm.io_adapters import PromptCacheStats
+from tale.llm.llm_io import IoUtil
+from tale.llm.stand_in_server import Cassette, StandInServer, request_prompt, split_tokens
+from tale.player import Player, PlayerConnection
+from tale.tio.iobase import IoAdapterBase
+
+
+class TestStandInServer():
+
+    kobold_config = {'BACKEND': 'kobold_cpp', 'USER_START': '', 'USER_END': ''}
+    llama_config = {'BACKEND': 'llama_cpp', 'USER_START': '', 'USER_END': ''}
+
+    def setup_method(self):
+        self.cassette_dir = tempfile.TemporaryDirectory()
+        self.cassette_path = os.path.join(self.cassette_dir.name, 'session.jsonl')
+        self.servers = []
+
+    def teardown_method(self):
+        for server in self.servers:
+            server.stop()
+        self.cassette_dir.cleanup()
+
+    def _start(self, cassette: Cassette, **kwargs) -> StandInServer:
+        server = StandInServer(cassette, **kwargs)
+        server.start()
+        self.servers.append(server)
+        return server
+
+    def _kobold_io(self, url: str) -> IoUtil:
+        return IoUtil(config=self.kobold_config, backend_config={'URL': url, 'ENDPOINT': '/api/v1/generate', 'STREAM': False,
+                                                                 'STREAM_ENDPOINT': '/api/extra/generate/stream',
+                                                                 'DATA_ENDPOINT': '/api/extra/generate/check'})
+
+    def _llama_io(self, url: str) -> IoUtil:
+        return IoUtil(config=self.llama_config, backend_config={'URL': url, 'ENDPOINT': '/v1/chat/completions', 'STREAM': False,
+                                                                'STREAM_ENDPOINT': '/v1/chat/completions', 'OPENAI_HEADERS': '{}',
+                                                                'OPENAI_API_KEY': '', 'OPENAI_JSON_FORMAT': '{}',
+                                                                'CACHE_PROMPT': True, 'SLOTS': 1, 'MEASURE_PROMPT_CACHE': True})
+
+    def _chat_body(self) -> dict:
+        return {'messages': [{'role': 'system', 'content': 'system'}, {'role': 'user', 'content': ''}]}
+
+    def test_split_tokens(self):
+        assert split_tokens('Hello there,  friend') == ['Hello', ' there,', '  friend']
+        assert ''.join(split_tokens(' a b \n')) == ' a b \n'
+
+    def test_request_prompt(self):
+        assert request_prompt({'prompt': 'test'}) == 'test'
+        assert request_prompt({'messages': [{'content': 'a'}, {'content': 'b'}]}) == 'a\nb'
+
+    def test_cassette(self):
+        cassette = Cassette(self.cassette_path)
+        assert cassette.lookup('prompt') == None
+        cassette.record('prompt', 'first')
+        cassette.record('prompt', 'second')
+        replay = Cassette(self.cassette_path)
+        assert len(replay) == 2
+        assert replay.lookup('prompt') == 'first'
+        assert replay.lookup('prompt') == 'second'
+        assert replay.lookup('prompt') == 'first'
+
+    def test_kobold_replay(self):
+        cassette = Cassette()
+        cassette.record('a prompt', 'replayed answer')
+        server = self._start(cassette)
+        io_util = self._kobold_io(server.url)
+        assert io_util.synchronous_request({}, prompt='a prompt') == 'replayed answer'
+        assert io_util.synchronous_request({}, prompt='unknown prompt') == '...'
+        assert server.stats == dict(requests=2, replayed=1, recorded=0, missed=1)
+
+    def test_kobold_stream(self):
+        cassette = Cassette()
+        cassette.record('stream prompt', 'streamed answer here')
+        server = self._start(cassette)
+        io_util = self._kobold_io(server.url)
+        output = []
+        io = IoAdapterBase(PlayerConnection(Player('test', 'm')))
+        io.output_no_newline = lambda text, new_paragraph=True: output.append(text)
+        assert io_util.stream_request({}, prompt='stream prompt', io=io) == 'streamed answer here'
+        assert output == ['streamed', ' answer', ' here']
+
+    def test_chat_and_prompt_cache(self):
+        server = self._start(Cassette(), default_response='chat answer')
+        io_util = self._llama_io(server.url)
+        assert io_util.synchronous_request(self._chat_body(), prompt='the same start, then one', request_type='dialogue', slot_key='npc') == 'chat answer'
+        io_util.synchronous_request(self._chat_body(), prompt='the same start, then two', request_type='dialogue', slot_key='npc')
+        stats = io_util.prompt_cache_stats.requests['dialogue']
+        assert stats['requests'] == 2
+        assert stats['saved_tokens'] == 5   # 'system', '\nthe', ' same', ' start,', ' then'
+
+    def test_chat_stream(self):
+        server = self._start(Cassette(), default_response='chat stream')
+        io_util = self._llama_io(server.url)
+        output = []
+        io = IoAdapterBase(PlayerConnection(Player('test', 'm')))
+        io.output_no_newline = lambda text, new_paragraph=True: output.append(text)
+        assert io_util.stream_request(self._chat_body(), prompt='test', io=io) == 'chat stream'
+        assert output == ['chat', ' stream']
+
+    def test_record(self):
+        upstream = self._start(Cassette(), default_response='from upstream')
+        recorder = self._start(Cassette(self.cassette_path), record=True, upstream=upstream.url)
+        io_util = self._kobold_io(recorder.url)
+        assert io_util.synchronous_request({}, prompt='record this') == 'from upstream'
+        assert recorder.stats['recorded'] == 1
+        with open(self.cassette_path) as file:
+            entry = json.loads(file.readline())
+        assert entry['prompt'] == 'record this'
+        assert entry['response'] == 'from upstream'
+        replay = self._start(Cassette(self.cassette_path))
+        assert self._kobold_io(replay.url).synchronous_request({}, prompt='record this') == 'from upstream'
+        assert replay.stats['replayed'] == 1
+
+    def test_latency(self):
+        server = self._start(Cassette(), default_response='one two three', prompt_latency=0.05, token_latency=0.02)
+        io_util = self._kobold_io(server.url)
+        start = time.perf_counter()
+        io_util.synchronous_request({}, prompt='slow')
+        assert time.perf_counter() - start >= 0.1
@@ -0,0 +1,67 @@
+import smartypants
+
+from tale.player import PlayerConnection
+from tale.style_benchmark import SAMPLES, legacy_ansi, legacy_html, legacy_plain, legacy_smartquotes, run_benchmark
+from tale.tio import style_renderer
+from tale.tio.console_io import ansi_renderer
+from tale.tio.if_browser_io import HttpIo, html_renderer
+from tale.tio.style_renderer import StyleRenderer, plain_renderer, smartquotes
+
+
+class TestStyleRenderer:
+
+    def test_html(self):
+        assert html_renderer.render("<bright>bright</>text") == "<span class='txt-bright'>bright</span>text"
+        assert html_renderer.render("<dim>a <it>b</it> c") == "<span class='txt-dim'>a <span class='txt-it'>b</span> c</span>"
+        assert html_renderer.render("x < y & <foo> </foo>") == "x &lt; y &amp; &lt;foo&gt; &lt;/foo&gt;"
+        assert html_renderer.render("no style</bright>") == "no style"
+        assert html_renderer.render('say "hi" -- <it>twice</>', True) == "say “hi” – <span class='txt-it'>twice</span>"
+        assert html_renderer.render('say "hi" -- twice', False) == 'say "hi" -- twice'
+
+    def test_same_as_before(self):
+        for sample in SAMPLES:
+            if "</monospaced>" not in sample:
+                assert html_renderer.render(sample, True) == legacy_html(sample)
+            assert ansi_renderer.render(sample) == legacy_ansi(sample)
+            assert plain_renderer.render(sample) == legacy_plain(sample)
+
+    def test_closed_styles(self):
+        # the </> already closed the monospaced style, the old conversion closed it again
+        text = "<monospaced>a <bright>b</> c</monospaced>"
+        assert html_renderer.render(text) == "<span class='txt-monospaced'>a <span class='txt-bright'>b</span></span> c"
+        assert legacy_html(text).count("</span>") == 3
+
+    def test_plain(self):
+        assert plain_renderer.render("<bright>Hello</> <monospaced>world</monospaced><clear>") == "Hello world"
+        assert plain_renderer.render("say <quit> to quit") == "say <quit> to quit"
+
+    def test_split(self):
+        assert plain_renderer.split("a<dim>b</>") == ["a", "<dim>", "b", "</>", ""]
+        assert plain_renderer.is_tag("</dim>")
+        assert not plain_renderer.is_tag("<foo>")
+
+    def test_cache(self):
+        renderer = StyleRenderer({"<bright>": ("[", "]")}, cache_size=2)
+        assert renderer.render("<bright>one") == "[one]"
+        assert renderer.render("<bright>one") == "[one]"
+        assert renderer.cache_info().hits == 1
+        renderer.render("two")
+        renderer.render("three")
+        assert renderer.cache_info().currsize == 2
+        renderer.render("x" * (style_renderer.MAX_CACHED_LENGTH + 1))
+        assert renderer.cache_info().currsize == 2
+
+    def test_smartquotes(self):
+        for text in ["plain text, nothing to do", "a - b . c", "'q' \"q\" `q' -- --- ... . . . &#8216;"]:
+            assert smartquotes(text) == legacy_smartquotes(text)
+        assert smartypants.smartypants(r"slashes\\slashes") == r"slashes\\slashes"
+
+    def test_clear(self):
+        http_io = HttpIo(player_connection=PlayerConnection(), server=None)
+        assert http_io.convert_to_html("<clear>Hello") == "Hello"
+        assert http_io.get_html_special() == ["clear"]
+
+    def test_benchmark(self):
+        results = run_benchmark(texts=6, repeat=2)
+        assert len(results) == 6
+        assert all(result["cached"] > 0 for result in results)
@@ -453,6 +453,11 @@ class TestVfs(unittest.TestCase):
         with vfs.open_write("unittest.txt", append=True) as f:
             f.write("appended")
         self.assertEqual("overwrittenappended", vfs["unittest.txt"].text)
+        with vfs.open_write("unittest.txt.tmp", mimetype="text/plain") as f:
+            f.write("replaced")
+        vfs.replace("unittest.txt.tmp", "unittest.txt")
+        self.assertEqual("replaced", vfs["unittest.txt"].text)
+        self.assertFalse(os.path.exists("unittest.txt.tmp"))
         del vfs["unittest.txt"]
 
     def test_vfs_read_files(self):
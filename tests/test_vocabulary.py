@@ -0,0 +1,111 @@
+import tale
+from tale.base import Item, Living, Location
+from tale.player import Player
+from tale.story import StoryConfig
+from tale.vocabulary import Vocabulary
+from tests.supportstuff import FakeDriver
+
+
+class TestVocabulary():
+
+    def setup_method(self):
+        tale.mud_context.driver = FakeDriver()
+        tale.mud_context.config = StoryConfig()
+
+    def test_add_remove(self):
+        gem = Item("blue gem")
+        gem.aliases = {"gem", "jewel"}
+        crystal = Item("dark red crystal")
+        items = {gem, crystal}
+        vocabulary = Vocabulary(items)
+        assert len(vocabulary) == 2
+        assert vocabulary.get("gem") is gem
+        assert vocabulary["jewel"] is gem
+        assert "dark red crystal" in vocabulary
+        assert vocabulary.get("crystal") is None
+        items.remove(gem)
+        vocabulary.remove(gem)
+        assert "gem" not in vocabulary
+        assert vocabulary.match(["take", "blue", "gem"], 1) == (None, "", 0)
+
+    def test_same_names(self):
+        rat1 = Living("rat", "n")
+        rat2 = Living("rat", "n")
+        livings = [rat1, rat2]
+        vocabulary = Vocabulary(livings)
+        assert vocabulary.get("rat") is rat2
+        livings.remove(rat2)
+        vocabulary.remove(rat2)
+        assert vocabulary.get("rat") is rat1
+
+    def test_match(self):
+        crystal = Item("dark red crystal")
+        red = Item("dark red")
+        vocabulary = Vocabulary([crystal, red])
+        words = ["give", "the", "dark", "red", "crystal", "to", "rat"]
+        assert vocabulary.match(words, 2) == (red, "dark red", 2)
+        vocabulary = Vocabulary([crystal])
+        assert vocabulary.match(words, 2) == (crystal, "dark red crystal", 3)
+        assert vocabulary.match(["dark", "red"], 0) == (None, "", 0)
+        assert vocabulary.match(words, 3) == (None, "", 0)
+
+    def test_startswith(self):
+        items = [Item("brown bird"), Item("bread")]
+        vocabulary = Vocabulary(items)
+        assert vocabulary.startswith("bro") == "brown bird"
+        assert vocabulary.startswith("bre") == "bread"
+        assert vocabulary.startswith("x") is None
+        items.append(Item("xylophone"))
+        vocabulary.add(items[-1])
+        assert vocabulary.startswith("x") == "xylophone"
+
+    def test_changed_behind_its_back(self):
+        rock = Item("rock")
+        items = {rock}
+        vocabulary = Vocabulary(items)
+        items.clear()
+        assert vocabulary.get("rock") is None
+        assert len(vocabulary) == 0
+        items.add(Item("pebble"))
+        assert vocabulary.get("pebble") is not None
+
+    def test_names_changed_after_placement(self):
+        room = Location("hall")
+        player = Player("<connecting_1>", "f")
+        room.insert(player, None)
+        player.init_names("julie", None, None, None)
+        assert room.livings_vocabulary.get("<connecting_1>") is None
+        assert room.livings_vocabulary.get("julie") is player
+        cat = Living("cat", "f")
+        room.insert(cat, None)
+        cat.aliases.add("kitty")
+        assert room.livings_vocabulary.get("kitty") is cat
+        cat.aliases = {"puss"}
+        assert room.livings_vocabulary.get("kitty") is None
+        assert room.livings_vocabulary.get("puss") is cat
+        coin = Item("coin")
+        player.insert(coin, player)
+        coin.aliases |= {"money"}
+        assert player.inventory_vocabulary.get("money") is coin
+        dog = Living("dog", "m")
+        room.livings.add(dog)
+        assert room.livings_vocabulary.get("dog") is dog
+
+    def test_location_and_inventory(self):
+        room = Location("hall")
+        rat = Living("rat", "n")
+        rat.aliases.add("rodent")
+        room.insert(rat, None)
+        coin = Item("gold coin")
+        room.insert(coin, None)
+        assert room.livings_vocabulary.get("rodent") is rat
+        assert room.items_vocabulary.match(["gold", "coin"], 0)[0] is coin
+        room.remove(coin, None)
+        assert room.items_vocabulary.get("gold coin") is None
+        rat.insert(coin, rat)
+        assert rat.inventory_vocabulary.get("gold coin") is coin
+        rat.remove(coin, rat)
+        assert len(rat.inventory_vocabulary) == 0
+        room.livings = {Living("cat", "f")}
+        assert room.livings_vocabulary.get("rat") is None
+        assert room.livings_vocabulary.get("cat").name == "cat"
@@ -5,13 +5,15 @@ import pytest
 import tale
 from tale.base import Item, Location, ParseResult, Weapon
 from tale.cmds import wizard, wizcmd
-from tale.errors import ParseError
+from tale.errors import ActionRefused, ParseError
 from tale.items.basic import Food
 from tale.llm.LivingNpc import LivingNpc
 from tale.llm.dynamic_story import DynamicStory
 from tale.llm.llm_utils import LlmUtil
 from tale.player import Player
+from tale.profiling import profiler
 from tale.story import StoryConfig
+from tale.vfs import VirtualFileSystem
 from tale.wearable import WearLocation
 from tests.supportstuff import FakeDriver, FakeIoUtil
 
@@ -40,6 +42,26 @@ class TestWizardCommands():
         assert(npc.age == 99)
         assert(npc.get_wearable(WearLocation.TORSO) is not None)
 
+    def test_profile(self):
+        profiler.observe("command", "look", 0.01)
+        self.test_player.test_get_output_paragraphs()
+        wizard.do_profile(self.test_player, ParseResult(verb='profile', args=['command']), self.context)
+        output = ''.join(self.test_player.test_get_output_paragraphs())
+        assert 'command' in output
+        assert 'look' in output
+        wizard.do_profile(self.test_player, ParseResult(verb='profile', args=['reset']), self.context)
+        assert profiler.histogram("command", "look") is None
+
+    def test_profile_export(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(self.context.driver, 'user_resources', VirtualFileSystem(root_path=tmp_path, readonly=False), raising=False)
+        profiler.observe("command", "look", 0.01)
+        wizard.do_profile(self.test_player, ParseResult(verb='profile', args=['export', 'profile.json'], unparsed='export profile.json'), self.context)
+        assert '"look"' in (tmp_path / 'profile.json').read_text()
+        for filename in ['../profile.prom', '/tmp/profile.prom', '.profile']:
+            with pytest.raises(ActionRefused):
+                wizard.do_profile(self.test_player, ParseResult(verb='profile', args=['export', filename], unparsed='export ' + filename), self.context)
+        profiler.reset()
+
     def test_set_visible(self):
         location = Location('test')
         player = Player('test', 'f')
@@ -0,0 +1,188 @@
+import datetime
+import json
+import os
+
+import tale.parse_utils as parse_utils
+from tale import util
+from tale.base import Item, Location, MudObjRegistry
+from tale.driver_if import IFDriver
+from tale.json_story import JsonStory
+from tale.llm import world_shards
+from tale.llm.dynamic_story import AUTOSAVE_ZONES, DynamicStory
+from tale.llm.world_shards import WorldShards
+from tale.player import Player
+from tale.startup_benchmark import generate_world
+from tale.zone import Zone
+
+
+class TestWorldShards():
+    driver = IFDriver(screen_delay=99, gui=False, web=True, wizard_override=True)
+    driver.game_clock = util.GameDateTime(datetime.datetime(year=2023, month=1, day=1), 1)
+    story = JsonStory('tests/files/world_story/', parse_utils.load_story_config(parse_utils.load_json('tests/files/world_story/story_config.json')))
+    story.init(driver)
+
+    def _story(self, zone_count: int) -> DynamicStory:
+        story = DynamicStory()
+        for index in range(zone_count):
+            zone = Zone('Zone %d' % index)
+            story.add_zone(zone)
+            story.add_location(Location('Room %d' % index, 'A room.'), zone.name)
+        return story
+
+    def test_zone_filename(self):
+        assert world_shards.zone_filename('The Cursed Swamp').startswith('the_cursed_swamp-')
+        assert world_shards.zone_filename('Cave') != world_shards.zone_filename('cave')
+        assert world_shards.zone_filename('../..').startswith('zone-')
+
+    def test_round_trip(self, tmp_path):
+        shards = WorldShards()
+        shards.save(self.story, str(tmp_path))
+        world = world_shards.load_world(str(tmp_path))
+        story_json = json.loads(json.dumps(self.story.to_json()))
+        assert world['zones'] == story_json['zones']
+        assert world['catalogue'] == story_json['catalogue']
+        assert world['world']['npcs'] == story_json['world']['npcs']
+        assert world['world']['mob_spawners'] == story_json['world']['mob_spawners']
+        assert world['world']['item_spawners'] == story_json['world']['item_spawners']
+        assert not os.path.exists(tmp_path / 'world.json')
+
+    def test_only_dirty_zones_are_written(self, tmp_path):
+        story = self._story(3)
+        shards = WorldShards()
+        assert shards.save(story, str(tmp_path)) == 4
+        assert shards.save(story, str(tmp_path)) == 0
+        story.find_location('Room 1').description = 'A dusty room.'
+        assert shards.dirty_zones(story) == [story.get_zone('Zone 1')]
+        assert shards.save(story, str(tmp_path)) == 1
+        assert shards.save(story, str(tmp_path)) == 0
+        story.find_location('Room 2').insert(Item('torch'), None)
+        story.catalogue.add_item(dict(name='torch'))
+        assert shards.save(story, str(tmp_path)) == 2
+        world = world_shards.load_world(str(tmp_path))
+        assert world['zones']['Zone 1']['locations'][0]['descr'] == 'A dusty room.'
+        assert world['zones']['Zone 2']['locations'][0]['items'][0]['name'] == 'torch'
+        assert world['catalogue']['items'] == [dict(name='torch')]
+
+    def test_save_copy(self, tmp_path):
+        story = self._story(2)
+        shards = WorldShards()
+        shards.save(story, str(tmp_path / 'live'))
+        story.find_location('Room 0').description = 'Changed.'
+        assert shards.save(story, str(tmp_path / 'copy')) == 3
+        assert shards.dirty_zones(story) == [story.get_zone('Zone 0')]
+        assert shards.save(story, str(tmp_path / 'live')) == 1
+
+    def test_autosave_is_bounded(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        story = self._story(AUTOSAVE_ZONES + 2)
+        story.autosave(None)
+        assert len(os.listdir(tmp_path / 'world' / 'zones')) == AUTOSAVE_ZONES + 2
+        assert os.path.exists(tmp_path / 'story_config.json')
+        for location in story.locations.values():
+            location.description = 'Changed.'
+        assert len(story._shards.dirty_zones(story)) == AUTOSAVE_ZONES + 2
+        story.autosave(None)
+        assert len(story._shards.dirty_zones(story)) == 2
+        story.autosave(None)
+        assert story._shards.dirty_zones(story) == []
+
+    def test_mark_dirty(self):
+        location = Location('Dirty room')
+        MudObjRegistry.dirty_locations.clear()
+        item = Item('coin')
+        location.insert(item, None)
+        assert location.vnum in MudObjRegistry.dirty_locations
+        MudObjRegistry.dirty_locations.clear()
+        item.description = 'A shiny coin.'
+        assert location.vnum in MudObjRegistry.dirty_locations
+
+
+class TestLazyZones():
+    driver = IFDriver(screen_delay=99, gui=False, web=True, wizard_override=True)
+    driver.game_clock = util.GameDateTime(datetime.datetime(year=2023, month=1, day=1), 1)
+
+    def _story(self, path) -> JsonStory:
+        generate_world(str(path), zones=3, locations=3, npcs=1)
+        config = parse_utils.load_story_config(parse_utils.load_json(os.path.join(str(path), 'story_config.json')))
+        config.lazy_zones = True
+        story = JsonStory(str(path) + '/', config)
+        story.init(self.driver)
+        return story
+
+    def test_load_on_demand(self, tmp_path):
+        story = self._story(tmp_path)
+        assert story._zones == {}
+        assert len(story._unloaded_zones) == 3
+        location = story.find_location('Zone 2 room 1')
+        assert location.name == 'Zone 2 room 1'
+        assert location.exits['west'].target is story.find_location('Zone 2 room 0')
+        assert list(story._zones) == ['Zone 2']
+        assert story.get_npc('Villager 2-0').location.name == 'Zone 2 room 0'
+        assert story.get_zone('Zone 0').name == 'Zone 0'
+        assert story.find_location('Nowhere') is None
+        assert story._shards.dirty_zones(story) == []
+
+    def test_load_neighbors(self, tmp_path):
+        story = self._story(tmp_path)
+        neighbors = story.neighbors_for_location(story.find_location('Zone 1 room 0'))
+        assert neighbors['east'].name == 'Zone 1 room 1'
+        assert sorted(story._zones) == ['Zone 0', 'Zone 1', 'Zone 2']
+
+    def test_load_within(self, tmp_path):
+        story = self._story(tmp_path)
+        location = story.find_location('Zone 1 room 0')
+        names = [neighbor.name for _, neighbor in story.locations_within(location.world_location.as_tuple(), 1)]
+        assert names[0] == 'Zone 1 room 0'
+        assert 'Zone 1 room 1' in names
+        assert sorted(story._zones) == ['Zone 0', 'Zone 1', 'Zone 2']
+
+    def test_save_keeps_unloaded_zones(self, tmp_path):
+        story = self._story(tmp_path)
+        story.find_location('Zone 1 room 2').description = 'Changed.'
+        story._shards.save(story, str(tmp_path))
+        index = world_shards.load_index(str(tmp_path))
+        assert len(index['zones']) == 3
+        assert len(index['locations']) == 9
+        world = world_shards.load_world(str(tmp_path))
+        assert world['zones']['Zone 1']['locations'][2]['descr'] == 'Changed.'
+        assert len(world['world']['npcs']) == 3
+        story._shards.save(story, str(tmp_path / 'copy'))
+        assert len(os.listdir(tmp_path / 'copy' / 'world' / 'zones')) == 3
+
+    def test_unload_zone(self, tmp_path):
+        story = self._story(tmp_path)
+        location = story.find_location('Zone 1 room 0')
+        npc = story.get_npc('Villager 1-0')
+        assert story.unload_zone('Zone 1')
+        assert 'Zone 1' not in story._zones
+        assert 'Villager 1-0' not in story.world.npcs
+        assert npc.location is not location
+        reloaded = story.find_location('Zone 1 room 0')
+        assert reloaded is not location
+        assert story.get_npc('Villager 1-0').location is reloaded
+
+    def test_unload_zone_refused(self, tmp_path):
+        story = self._story(tmp_path)
+        story.find_location('Zone 1 room 1').description = 'Changed.'
+        assert not story.unload_zone('Zone 1')
+        story._shards.save(story, str(tmp_path))
+        player = Player('player', 'f')
+        player.move(story.find_location('Zone 1 room 1'), silent=True)
+        story._shards.save(story, str(tmp_path))
+        assert not story.unload_zone('Zone 1')
+        player.move(Location('Elsewhere'), silent=True)
+        story._shards.save(story, str(tmp_path))
+        assert story.unload_zone('Zone 1')
+        assert not story.unload_zone('Zone 1')
+
+    def test_unload_idle_zones(self, tmp_path):
+        story = self._story(tmp_path)
+        story.config.zone_idle_time = 60
+        story.find_location('Zone 0 room 0')
+        story.find_location('Zone 1 room 0')
+        player = Player('player', 'f')
+        player.move(story.find_location('Zone 0 room 0'), silent=True)
+        story._zone_used['Zone 0'] -= 100
+        story._zone_used['Zone 1'] -= 100
+        story.unload_idle_zones(None)
+        assert list(story._zones) == ['Zone 0']
@@ -81,6 +81,24 @@ class TestZone():
         assert zone.on_edge(distance_long, Coord(1, 0, 0)) == True
         assert zone.on_edge(distance_long, Coord(-1, 0, 0)) == True
 
+    def test_contains(self):
+        zone = Zone('test')
+        zone.center = Coord(10, 0, 0)
+        assert zone.contains((10, 0, 0))
+        assert zone.contains((15, -5, 3))
+        assert not zone.contains((16, 0, 0))
+        assert not zone.contains((10, 0, 4))
+
+    def test_on_edge_agrees_with_contains(self):
+        zone = Zone('test')
+        zone.center = Coord(10, 0, 0)
+        for x in range(0, 21):
+            for direction in (Coord(1, 0, 0), Coord(-1, 0, 0)):
+                next_cell = (x + direction.x, 0, 0)
+                assert zone.on_edge(Coord(x, 0, 0), direction) == (not zone.contains(next_cell))
+        assert zone.on_edge(Coord(10, 0, 3), Coord(0, 0, 1))
+        assert not zone.on_edge(Coord(10, 0, 3), Coord(0, 0, -1))
+
     def test_from_json(self):
         zone_info = '{ "name": "Whispering Woods", "description": "A dense, misty forest teeming with life. The trees whisper secrets to those who listen, and the creatures here are said to possess ancient wisdom. Friendly creatures roam the area, and the air is filled with the sweet scent of enchanted flowers.", "races": [], "items": [], "mood": 5, "level": 1} \n'
         z = zone.from_json(json.loads(zone_info))